@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Compare cache-affinity routing with random routing across embeddings replicas.
+
+For each routing policy, starts `--replicas` embeddings services (stub model
+by default) with a small result cache each, then drives a Zipf-distributed
+workload over a fixed corpus through `EmbeddingsClient` routing between
+them. Reports throughput, latency, the replicas' combined cache hit rate and
+the cache entries they hold between them. With random routing every replica
+ends up caching the same hot texts; with consistent hashing each caches its
+own share, so the fleet holds more distinct texts and hits more often.
+
+Examples:
+    python -m benchmarks.affinity
+    python -m benchmarks.affinity --replicas 8 --cache-size 500 --zipf 0.8
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+import httpx
+import numpy as np
+
+from benchmarks.run import REPO_ROOT, git_commit, print_summary, wait_until_healthy
+from benchmarks.workload import generate_texts, zipf_indices
+from src.user_input_service.client import EmbeddingsClient
+
+BASE_PORT = 8101
+
+
+@contextmanager
+def replicas(count: int, env: Dict[str, str], startup_timeout: float) -> Iterator[List[str]]:
+    """Start ``count`` embeddings services on consecutive ports and stop them afterwards."""
+    urls = [f"http://localhost:{BASE_PORT + i}" for i in range(count)]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.embeddings_service.app:app",
+             "--port", str(BASE_PORT + i), "--log-level", "warning"],
+            cwd=REPO_ROOT, env={**os.environ, "PYTHONPATH": REPO_ROOT, **env}
+        )
+        for i in range(count)
+    ]
+    try:
+        for url in urls:
+            wait_until_healthy(f"{url}/ready", startup_timeout)
+        yield urls
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def cache_totals(urls: List[str]) -> Dict[str, Any]:
+    """Sum the replicas' result cache counters."""
+    stats = [httpx.get(f"{url}/cache/stats", timeout=5.0).json()["data"] for url in urls]
+    hits = sum(item["hits"] for item in stats)
+    misses = sum(item["misses"] for item in stats)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "entries": sum(item["entries"] for item in stats),
+        "entries_per_replica": [item["entries"] for item in stats],
+    }
+
+
+async def drive(client: EmbeddingsClient, texts: List[str], concurrency: int) -> Dict[str, Any]:
+    """Embed every text with ``concurrency`` calls in flight and summarize the results."""
+    latencies: List[float] = []
+    errors = 0
+    cursor = iter(texts)
+
+    async def worker() -> None:
+        nonlocal errors
+        for text in cursor:
+            start = time.perf_counter()
+            if await client.get_embeddings_array(text) is None:
+                errors += 1
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    summary: Dict[str, Any] = {
+        "concurrency": concurrency,
+        "requests": len(texts),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary["latency_ms"] = {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+    return summary
+
+
+async def measure(policy: str, urls: List[str], texts: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    """Route the workload between the replicas with one policy."""
+    # No client-side cache or coalescing, so every text reaches a replica
+    client = EmbeddingsClient(
+        cache=None,
+        coalesce=False,
+        max_connections=args.concurrency,
+        max_keepalive_connections=args.concurrency,
+        replica_urls=urls,
+        routing=policy,
+        routing_load_factor=args.load_factor
+    )
+    await client.start()
+    try:
+        summary = await drive(client, texts, args.concurrency)
+    finally:
+        await client.close()
+    summary.update(policy=policy, cache=cache_totals(urls), routing=client.transport.get_stats())
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policies", default="random,hash", help="Comma-separated routing policies to compare")
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--cache-size", type=int, default=1000, help="Result cache entries per replica")
+    parser.add_argument("--corpus", type=int, default=10000, help="Distinct texts the workload draws from")
+    parser.add_argument("--zipf", type=float, default=1.0, help="Zipf exponent of text popularity")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--load-factor", type=float, default=1.25, help="Bounded-load factor for hash routing")
+    parser.add_argument("--length", default="uniform:5:40",
+                        help="Text length in words: fixed:N, uniform:LOW:HIGH or lognormal:MU:SIGMA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-model", action="store_true", help="Load the real model instead of the stub")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the replicas (repeatable)")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/affinity-<time>.json)")
+    args = parser.parse_args()
+
+    service_env = dict(item.split("=", 1) for item in args.env)
+    service_env.setdefault("EMBEDDINGS_CACHE_SIZE", str(args.cache_size))
+    if not args.real_model:
+        service_env.setdefault("EMBEDDINGS_STUB_MODEL", "true")
+
+    corpus = generate_texts(args.corpus, args.length, 0.0, seed=args.seed)
+    texts = [corpus[i] for i in zipf_indices(args.requests, args.corpus, args.zipf, seed=args.seed + 1)]
+    print(f"{args.requests} requests over {len(set(texts))} distinct texts, {args.replicas} replicas "
+          f"with {args.cache_size} cache entries each")
+
+    results = []
+    for policy in args.policies.split(","):
+        # Fresh replicas per policy, so each starts with empty caches
+        with replicas(args.replicas, service_env, args.startup_timeout) as urls:
+            summary = asyncio.run(measure(policy, urls, texts, args))
+        print(f"{policy}")
+        print_summary(summary)
+        print(f"  cache: hit rate {summary['cache']['hit_rate']:.1%}   entries {summary['cache']['entries']}   "
+              f"spilled {summary['routing']['spilled']}")
+        results.append(summary)
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": started.isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "workload": {
+            "replicas": args.replicas,
+            "cache_size": args.cache_size,
+            "corpus": args.corpus,
+            "zipf": args.zipf,
+            "requests": args.requests,
+            "distinct_texts": len(set(texts)),
+            "concurrency": args.concurrency,
+            "load_factor": args.load_factor,
+            "length": args.length,
+            "seed": args.seed,
+            "stub_model": not args.real_model,
+            "service_env": service_env,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"affinity-{started.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Compare inference backends on latency, memory and parity with torch.
+
+Each backend is loaded in its own process, so resident memory reflects
+that backend alone, then encodes a synthetic workload at each batch size.
+Embeddings of every backend are compared against the torch backend's
+(min and mean cosine similarity). Loads the real model; the onnx
+backends need `onnxruntime` installed.
+
+Examples:
+    python -m benchmarks.backends
+    python -m benchmarks.backends --backends torch,torch-int8 --batch-sizes 1,32
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.run import REPO_ROOT, git_commit
+from benchmarks.workload import generate_texts
+
+
+def resident_mb() -> float:
+    """Get this process's resident set size in MiB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def measure(backend: str, model_name: str, texts: List[str], batch_sizes: List[int], repeats: int) -> Dict[str, Any]:
+    """Load one backend and time it; runs in a fresh process."""
+    from src.embeddings_service.generator import EmbeddingGenerator
+
+    baseline_mb = resident_mb()
+    started = time.perf_counter()
+    generator = EmbeddingGenerator(model_name, backend=backend)
+    load_seconds = time.perf_counter() - started
+    loaded_mb = resident_mb()
+
+    # Warm up allocator and kernels before timing
+    generator.generate_embeddings_batch(texts[:max(batch_sizes)])
+
+    latencies = {}
+    for batch_size in batch_sizes:
+        samples = []
+        for _ in range(repeats):
+            for start in range(0, len(texts), batch_size):
+                chunk = texts[start:start + batch_size]
+                began = time.perf_counter()
+                generator.generate_embeddings_batch(chunk)
+                samples.append((time.perf_counter() - began) * 1000)
+        latencies[str(batch_size)] = {
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)),
+            "texts_per_s": len(texts) * repeats / (sum(samples) / 1000),
+        }
+
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "weights_mb": generator.get_memory_bytes() / 2**20,
+        "rss_mb": loaded_mb,
+        "rss_delta_mb": loaded_mb - baseline_mb,
+        "peak_rss_mb": resident_mb(),
+        "latency": latencies,
+        "embeddings": generator.generate_embeddings_batch(texts).tolist(),
+    }
+
+
+def run_isolated(backend: str, *args) -> Dict[str, Any]:
+    """Run ``measure`` for one backend in a spawned process."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(measure, (backend, *args))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--batch-sizes", type=lambda value: [int(v) for v in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--length", default="uniform:5:40",
+                        help="Text length in words: fixed:N, uniform:LOW:HIGH or lognormal:MU:SIGMA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/backends-<time>.json)")
+    args = parser.parse_args()
+
+    texts = generate_texts(args.texts, args.length, 0.0, seed=args.seed)
+    backends = args.backends.split(",")
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+
+    results = []
+    reference = None
+    for backend in backends:
+        try:
+            result = run_isolated(backend, args.model, texts, args.batch_sizes, args.repeats)
+        except Exception as e:
+            print(f"{backend:<11} failed: {e}")
+            results.append({"backend": backend, "error": str(e)})
+            continue
+
+        embeddings = np.asarray(result.pop("embeddings"), dtype=np.float32)
+        if backend == "torch":
+            reference = embeddings
+        if reference is not None:
+            similarity = (reference * embeddings).sum(axis=1) / (
+                np.linalg.norm(reference, axis=1) * np.linalg.norm(embeddings, axis=1)
+            )
+            result["parity"] = {"min_cosine": float(similarity.min()), "mean_cosine": float(similarity.mean())}
+        results.append(result)
+
+        print(f"{backend:<11} weights {result['weights_mb']:7.1f} MiB   rss {result['rss_mb']:7.1f} MiB   "
+              f"min cosine {result.get('parity', {}).get('min_cosine', float('nan')):.5f}")
+        for batch_size, latency in result["latency"].items():
+            print(f"  batch {batch_size:<4} p50 {latency['p50_ms']:8.2f} ms   p95 {latency['p95_ms']:8.2f} ms   "
+                  f"{latency['texts_per_s']:9.1f} texts/s")
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": started.isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "model": args.model,
+        "workload": {"texts": args.texts, "length": args.length, "seed": args.seed, "repeats": args.repeats},
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"backends-{started.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
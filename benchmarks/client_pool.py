@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compare per-call HTTP clients with the pooled EmbeddingsClient.
+
+Requires a running embeddings service (e.g. `make run-local`).
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, List
+
+import httpx
+import numpy as np
+
+from src.user_input_service.client import EmbeddingsClient
+
+
+async def fresh_client_call(url: str, text: str) -> None:
+    """Mimic the old behaviour: one AsyncClient (and TCP connection) per call."""
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{url}/embed", json={"text": text}, timeout=30.0)
+        response.raise_for_status()
+
+
+async def run(call: Callable[[str], Awaitable[None]], requests: int, concurrency: int) -> List[float]:
+    """Issue `requests` calls with at most `concurrency` in flight, returning latencies in ms."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            # Unique texts so neither caching nor coalescing skews the comparison
+            text = f"benchmark {uuid.uuid4()}"
+            start = time.perf_counter()
+            await call(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    """Print throughput and latency percentiles."""
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name:<8} {len(latencies) / elapsed:8.1f} req/s   "
+          f"p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   p99 {p99:7.2f} ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8001", help="Embeddings service URL")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    latencies = await run(lambda text: fresh_client_call(args.url, text), args.requests, args.concurrency)
+    report("fresh", latencies, time.perf_counter() - start)
+
+    client = EmbeddingsClient(args.url, max_keepalive_connections=args.concurrency)
+    await client.start()
+
+    async def pooled_call(text: str) -> None:
+        if await client.get_embeddings_array(text) is None:
+            raise RuntimeError("Embeddings request failed")
+
+    try:
+        start = time.perf_counter()
+        latencies = await run(pooled_call, args.requests, args.concurrency)
+        report("pooled", latencies, time.perf_counter() - start)
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
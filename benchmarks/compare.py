@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files produced by `python -m benchmarks.run`.
+
+Example:
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+from typing import Any, Dict, Optional
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before: Optional[float], after: Optional[float]) -> str:
+    """Format the relative change between two values."""
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f"baseline:  {baseline.get('git_commit')}  ({baseline['mode']}/{baseline['target']})")
+    print(f"candidate: {candidate.get('git_commit')}  ({candidate['mode']}/{candidate['target']})")
+    if baseline.get("workload") != candidate.get("workload"):
+        print("warning: workloads differ, results may not be comparable")
+
+    candidate_levels = {level["concurrency"]: level for level in candidate["results"]}
+    print(f"\n{'conc':>5} {'throughput':>22} {'p50':>22} {'p95':>22} {'p99':>22}")
+    for before in baseline["results"]:
+        after = candidate_levels.get(before["concurrency"])
+        if after is None:
+            continue
+        cells = [f"{before['throughput_rps']:.1f}->{after['throughput_rps']:.1f} "
+                 f"({change(before['throughput_rps'], after['throughput_rps'])})"]
+        for key in ("p50", "p95", "p99"):
+            b = before.get("latency_ms", {}).get(key)
+            a = after.get("latency_ms", {}).get(key)
+            cells.append(f"{b}->{a} ({change(b, a)})")
+        print(f"{before['concurrency']:>5} " + " ".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
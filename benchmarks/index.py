@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Measure vector index search latency and recall, exact vs IVF.
+
+Fills an in-memory VectorIndex with clustered synthetic vectors (so the
+neighbourhoods look like real embeddings rather than uniform noise),
+trains the IVF lists, then searches with perturbed copies of stored
+vectors. Recall@k is measured against exact search for each nprobe.
+
+Examples:
+    python -m benchmarks.index
+    python -m benchmarks.index --vectors 300000 --nprobe 8,16,32,64
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.run import REPO_ROOT, git_commit
+from src.shared.index import VectorIndex
+
+
+def clustered_vectors(count: int, dimension: int, clusters: int, spread: float, seed: int) -> np.ndarray:
+    """Generate vectors scattered around random cluster centers."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = np.empty((count, dimension), dtype=np.float32)
+    for start in range(0, count, 65536):
+        end = min(start + 65536, count)
+        vectors[start:end] = centers[rng.integers(0, clusters, end - start)]
+        vectors[start:end] += spread * rng.standard_normal((end - start, dimension)).astype(np.float32)
+    return vectors
+
+
+def time_searches(index: VectorIndex, queries: np.ndarray, k: int, exact: bool) -> Dict[str, Any]:
+    """Run every query once and return latency percentiles and the results."""
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([item_id for item_id, _ in index.search(query, k, exact=exact)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "results": results}
+
+
+def recall(expected: List[List[str]], found: List[List[str]]) -> float:
+    """Mean fraction of the exact top-k found by the approximate search."""
+    return float(np.mean([len(set(e) & set(f)) / len(e) for e, f in zip(expected, found)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=300000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000, help="Synthetic cluster centers")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=lambda value: [int(v) for v in value.split(",")], default=[4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/index-<time>.json)")
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.vectors, args.dimension, args.clusters, 0.5, args.seed)
+    ids = [f"v{i}" for i in range(args.vectors)]
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    index = VectorIndex(ann="ivf", train_threshold=args.vectors, initial_capacity=args.vectors)
+    start = time.perf_counter()
+    index.upsert(ids, vectors)
+    upsert_s = time.perf_counter() - start
+    print(f"upsert {args.vectors} x {args.dimension} in {upsert_s:.2f}s")
+    while not index.get_stats()["ann_ready"]:
+        time.sleep(0.1)
+    train_s = time.perf_counter() - start - upsert_s
+    print(f"trained {index.get_stats()['ann_lists']} IVF lists in {train_s:.2f}s")
+
+    exact = time_searches(index, queries, args.k, exact=True)
+    expected = exact.pop("results")
+    print(f"exact        p50 {exact['p50_ms']:7.3f} ms   p99 {exact['p99_ms']:7.3f} ms")
+    results: List[Dict[str, Any]] = [{"mode": "exact", **exact, "recall": 1.0}]
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        ivf = time_searches(index, queries, args.k, exact=False)
+        ivf["recall"] = recall(expected, ivf.pop("results"))
+        print(f"ivf nprobe {nprobe:<3} p50 {ivf['p50_ms']:7.3f} ms   p99 {ivf['p99_ms']:7.3f} ms   "
+              f"recall@{args.k} {ivf['recall']:.3f}")
+        results.append({"mode": "ivf", "nprobe": nprobe, **ivf})
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": started.isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "workload": {
+            "vectors": args.vectors, "dimension": args.dimension, "clusters": args.clusters,
+            "queries": args.queries, "k": args.k, "seed": args.seed
+        },
+        "upsert_s": upsert_s,
+        "train_s": train_s,
+        "ann_lists": index.get_stats()["ann_lists"],
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"index-{started.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
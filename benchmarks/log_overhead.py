@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Measure the per-request cost of logging on the request path.
+
+Replays the log calls one `/process` request makes across both services
+(user input app, client, embeddings app and generator) against a log
+file, timing only the caller's side: the time the request handler spends
+in logging calls. Modes:
+
+- `before`: f-string messages built in the caller and a synchronous
+  StreamHandler, as `logging.basicConfig` set up before `src.shared.logs`
+- `sync`: lazy %-style calls, still written synchronously
+- `async-text`, `async-json`: lazy calls through the non-blocking queue
+  handler, formatted and written by the background writer
+- `async-json-sampled`: as `async-json`, with `--sample-rate` of requests
+  keeping their INFO records
+
+The writer's backlog at the end (drain time) and records dropped because
+the queue was full are reported too.
+
+Examples:
+    python -m benchmarks.log_overhead
+    python -m benchmarks.log_overhead --requests 200000 --threads 4 --sample-rate 0.05
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.run import REPO_ROOT, git_commit
+from benchmarks.workload import generate_texts
+from src.shared.logs import (
+    LOG_RECORDS_DROPPED, TEXT_FORMAT, LogSampler, SampledLogger, build_handlers, reset_request_context,
+    set_request_context
+)
+
+MODES = ("before", "sync", "async-text", "async-json", "async-json-sampled")
+
+
+def eager_request(logger: logging.Logger, text: str) -> None:
+    """The request path's log calls as they were: messages formatted before the call."""
+    logger.info(f"Processing user input: {text[:50]}...")
+    logger.info("Generating embeddings for user input")
+    logger.info(f"Requesting embeddings for {1} texts")
+    logger.info(f"Received interactive embedding request for text: {text[:50]}...")
+    logger.info(f"Generating embeddings for batch of {1} texts")
+    logger.info(f"Successfully generated embeddings with dimension: {384}")
+    logger.info("Successfully received embeddings from service")
+    logger.info("Successfully processed user input")
+
+
+def lazy_request(logger: logging.Logger, text: str) -> None:
+    """The request path's log calls now: formatted only if and when the record is written."""
+    logger.info("Processing user input: %.50s...", text)
+    logger.info("Generating embeddings for user input")
+    logger.info("Requesting embeddings for %d texts", 1, extra={"texts": 1})
+    logger.info("Received %s embedding request for text: %.50s...", "interactive", text,
+                extra={"priority": "interactive"})
+    logger.info("Generating embeddings for batch of %d texts", 1, extra={"texts": 1})
+    logger.info("Successfully generated embeddings with dimension: %d", 384)
+    logger.info("Successfully received embeddings from service")
+    logger.info("Successfully processed user input")
+
+
+def run_mode(mode: str, texts: List[str], threads: int, sample_rate: float, queue_size: int,
+             sink: str) -> Dict[str, Any]:
+    """Log every text's request with ``threads`` callers and summarize the caller-side cost."""
+    stream = open(os.devnull, "w") if sink == "devnull" else tempfile.TemporaryFile("w+")
+    if mode == "before":
+        logger: logging.Logger = logging.Logger(f"bench.{mode}")
+        handler: logging.Handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        listener = None
+    else:
+        logger = SampledLogger(f"bench.{mode}")
+        handler, listener = build_handlers(
+            stream,
+            fmt="json" if "json" in mode else "text",
+            asynchronous=mode.startswith("async"),
+            queue_size=queue_size
+        )
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    log_request: Callable[[logging.Logger, str], None] = eager_request if mode == "before" else lazy_request
+    sampler = LogSampler(sample_rate if mode.endswith("sampled") else 1.0)
+    if listener is not None:
+        listener.start()
+    dropped_before = LOG_RECORDS_DROPPED.labels().value
+
+    durations = np.empty(len(texts), dtype=np.float64)
+
+    def caller(offset: int) -> None:
+        for i in range(offset, len(texts), threads):
+            tokens = set_request_context(uuid.uuid4().hex[:16], sampler.sample("/process"))
+            start = time.perf_counter_ns()
+            log_request(logger, texts[i])
+            durations[i] = time.perf_counter_ns() - start
+            reset_request_context(tokens)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=caller, args=(offset,)) for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    drain_started = time.perf_counter()
+    if listener is not None:
+        listener.stop()
+    handler.flush()
+    drain_s = time.perf_counter() - drain_started
+    stream.close()
+
+    micros = durations / 1000
+    p50, p99, p999 = np.percentile(micros, [50, 99, 99.9])
+    return {
+        "mode": mode,
+        "requests": len(texts),
+        "threads": threads,
+        "mean_us": round(float(micros.mean()), 2),
+        "p50_us": round(float(p50), 2),
+        "p99_us": round(float(p99), 2),
+        "p999_us": round(float(p999), 2),
+        "requests_per_second": round(len(texts) / elapsed, 1),
+        "drain_s": round(drain_s, 3),
+        "dropped_records": int(LOG_RECORDS_DROPPED.labels().value - dropped_before),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes to compare")
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent callers (e.g. executor threads)")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="Requests keeping INFO logs when sampled")
+    parser.add_argument("--queue-size", type=int, default=100000, help="Log queue capacity for the async modes")
+    parser.add_argument("--sink", choices=("file", "devnull"), default="file", help="Where records are written")
+    parser.add_argument("--length", default="uniform:5:40",
+                        help="Text length in words: fixed:N, uniform:LOW:HIGH or lognormal:MU:SIGMA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/log-overhead-<time>.json)")
+    args = parser.parse_args()
+
+    texts = generate_texts(args.requests, args.length, 0.0, seed=args.seed)
+    print(f"{args.requests} requests, {args.threads} callers, writing to {args.sink}")
+
+    results = []
+    for mode in args.modes.split(","):
+        summary = run_mode(mode, texts, args.threads, args.sample_rate, args.queue_size, args.sink)
+        print(f"{mode:<20} mean {summary['mean_us']:7.2f} us   p50 {summary['p50_us']:7.2f} us   "
+              f"p99 {summary['p99_us']:7.2f} us   drain {summary['drain_s']:.2f}s   "
+              f"dropped {summary['dropped_records']}")
+        results.append(summary)
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": started.isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "workload": {
+            "requests": args.requests,
+            "threads": args.threads,
+            "sample_rate": args.sample_rate,
+            "queue_size": args.queue_size,
+            "sink": args.sink,
+            "length": args.length,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"log-overhead-{started.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Reproducible load benchmark for the embeddings app.
+
+Starts the services itself (local uvicorn processes or a Ray Serve
+deployment, with the stub model by default), replays a synthetic workload
+at each requested concurrency level and writes throughput and latency
+percentiles as JSON so runs can be compared across commits with
+`python -m benchmarks.compare`.
+
+Examples:
+    python -m benchmarks.run --mode local --concurrency 1,8,32
+    python -m benchmarks.run --mode ray --target embed --duplicate-ratio 0.5
+    python -m benchmarks.run --mode external --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.workload import generate_texts
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Route prefixes per deployment mode
+URLS = {
+    "local": {"process": "http://localhost:8000/process", "embed": "http://localhost:8001/embed",
+              "health": "http://localhost:8000/health", "ready": "http://localhost:8001/ready"},
+    "ray": {"process": "http://localhost:8000/api/process", "embed": "http://localhost:8000/embeddings/embed",
+            "health": "http://localhost:8000/api/health", "ready": "http://localhost:8000/embeddings/ready"},
+}
+
+
+def git_commit() -> Optional[str]:
+    """Get the current commit hash, marking uncommitted changes."""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=REPO_ROOT) != 0
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_until_healthy(url: str, timeout: float) -> None:
+    """Poll a health endpoint until it reports the embeddings service healthy."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(url, timeout=2.0)
+            if response.status_code == 200 and "unhealthy" not in response.text:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Services did not become healthy at {url} within {timeout}s")
+
+
+@contextmanager
+def services(mode: str, env: Dict[str, str], startup_timeout: float) -> Iterator[None]:
+    """Start the services for `mode` and stop them afterwards."""
+    if mode == "external":
+        yield
+        return
+
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT, **env}
+    if mode == "local":
+        commands = [
+            [sys.executable, "-m", "uvicorn", "src.embeddings_service.app:app", "--port", "8001", "--log-level", "warning"],
+            [sys.executable, "-m", "uvicorn", "src.user_input_service.app:app", "--port", "8000", "--log-level", "warning"],
+        ]
+    else:
+        commands = [[sys.executable, os.path.join(REPO_ROOT, "deployment", "ray_deploy.py")]]
+
+    processes = [subprocess.Popen(command, cwd=REPO_ROOT, env=env) for command in commands]
+    try:
+        wait_until_healthy(URLS[mode]["ready"], startup_timeout)
+        wait_until_healthy(URLS[mode]["health"], startup_timeout)
+        yield
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_level(url: str, target: str, texts: List[str], concurrency: int) -> Dict[str, Any]:
+    """Send every text with `concurrency` requests in flight and summarize the results."""
+    latencies: List[float] = []
+    errors = 0
+    cursor = iter(texts)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        for text in cursor:
+            payload = {"text": text, "process_embeddings": True} if target == "process" else {"text": text}
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload, timeout=60.0)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    summary: Dict[str, Any] = {
+        "concurrency": concurrency,
+        "requests": len(texts),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary["latency_ms"] = {
+            "mean": round(float(np.mean(latencies)), 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(np.max(latencies)), 2),
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    """Print one concurrency level's results."""
+    latency = summary.get("latency_ms", {})
+    print(f"  c={summary['concurrency']:<4} {summary['throughput_rps']:9.1f} req/s   "
+          f"p50 {latency.get('p50', float('nan')):8.2f} ms   p95 {latency.get('p95', float('nan')):8.2f} ms   "
+          f"p99 {latency.get('p99', float('nan')):8.2f} ms   errors {summary['errors']}")
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the warm-up and every concurrency level."""
+    if args.mode == "external":
+        prefix = {"process": "/api", "embed": "/embeddings"}[args.target] if args.ray_routes else ""
+        url = f"{args.base_url}{prefix}/{args.target}"
+    else:
+        url = URLS[args.mode][args.target]
+
+    # Warm-up texts never repeat measured ones, so they do not pre-fill caches
+    warmup = generate_texts(args.warmup, args.length, 0.0, seed=args.seed + 1)
+    warmup = [f"warmup {text}" for text in warmup]
+    await run_level(url, args.target, warmup, max(args.concurrency))
+
+    results = []
+    for level, concurrency in enumerate(args.concurrency):
+        texts = generate_texts(args.requests, args.length, args.duplicate_ratio, seed=args.seed + 100 + level)
+        summary = await run_level(url, args.target, texts, concurrency)
+        print_summary(summary)
+        results.append(summary)
+    return {"url": url, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["local", "ray", "external"], default="local")
+    parser.add_argument("--target", choices=["process", "embed"], default="process")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Service URL for --mode external")
+    parser.add_argument("--ray-routes", action="store_true", help="Use Ray Serve route prefixes with --mode external")
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--length", default="uniform:5:40",
+                        help="Text length in words: fixed:N, uniform:LOW:HIGH or lognormal:MU:SIGMA")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-model", action="store_true", help="Load the real model instead of the stub")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the services (repeatable)")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<mode>-<target>-<time>.json)")
+    args = parser.parse_args()
+
+    service_env = dict(item.split("=", 1) for item in args.env)
+    if not args.real_model:
+        service_env.setdefault("EMBEDDINGS_STUB_MODEL", "true")
+
+    print(f"Benchmarking {args.target} in {args.mode} mode")
+    with services(args.mode, service_env, args.startup_timeout):
+        run = asyncio.run(run_benchmark(args))
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": started.isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "mode": args.mode,
+        "target": args.target,
+        "workload": {
+            "requests": args.requests,
+            "length": args.length,
+            "duplicate_ratio": args.duplicate_ratio,
+            "seed": args.seed,
+            "stub_model": not args.real_model,
+            "service_env": service_env,
+        },
+        **run,
+    }
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"{args.mode}-{args.target}-{started.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
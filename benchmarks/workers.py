@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Measure embeddings service throughput as the number of pre-fork workers grows.
+
+For each worker count, starts `deployment/local_deploy.py --prod` with only
+the embeddings service (stub model by default), drives `/embed` at a fixed
+concurrency and records throughput, latency and memory. Memory is reported
+as the summed RSS of the master and workers and as their summed PSS, which
+splits shared pages between the processes sharing them: when the weights
+are shared copy-on-write, PSS grows far more slowly than RSS.
+
+Examples:
+    python -m benchmarks.workers
+    python -m benchmarks.workers --workers 1,2,4,8 --real-model --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.run import REPO_ROOT, git_commit, print_summary, run_level
+from benchmarks.workload import generate_texts
+
+EMBED_URL = "http://localhost:8001/embed"
+READY_URL = "http://localhost:8001/ready"
+
+
+def process_tree(pid: int) -> List[int]:
+    """Get a process and all of its descendants."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def memory_mb(pids: List[int]) -> Dict[str, float]:
+    """Sum RSS and PSS over processes (Linux only)."""
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in ("Rss", "Pss"):
+                        totals[f"{key.lower()}_mb"] += int(value.split()[0]) / 1024
+        except OSError:
+            pass
+    return {key: round(value, 1) for key, value in totals.items()}
+
+
+def wait_until_ready(workers: int, timeout: float) -> None:
+    """Wait until several consecutive readiness checks pass, so every worker is likely warm."""
+    deadline = time.monotonic() + timeout
+    passes = 0
+    while time.monotonic() < deadline and passes < 4 * workers:
+        try:
+            passes = passes + 1 if httpx.get(READY_URL, timeout=2.0).status_code == 200 else 0
+        except httpx.HTTPError:
+            passes = 0
+        time.sleep(0.1)
+    if passes < 4 * workers:
+        raise TimeoutError(f"Embeddings service did not become ready within {timeout}s")
+
+
+def measure(workers: int, args: argparse.Namespace, env: Dict[str, str]) -> Dict[str, Any]:
+    """Start the service with ``workers`` workers and drive load against it."""
+    command = [
+        sys.executable, os.path.join(REPO_ROOT, "deployment", "local_deploy.py"),
+        "--prod", "--services", "embeddings", "--workers", str(workers)
+    ]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env={**os.environ, "PYTHONPATH": REPO_ROOT, **env},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(workers, args.startup_timeout)
+        memory_idle = memory_mb(process_tree(process.pid))
+        warmup = [f"warmup {text}" for text in generate_texts(args.warmup, args.length, 0.0, seed=args.seed + 1)]
+        asyncio.run(run_level(EMBED_URL, "embed", warmup, args.concurrency))
+        texts = generate_texts(args.requests, args.length, 0.0, seed=args.seed + 100)
+        summary = asyncio.run(run_level(EMBED_URL, "embed", texts, args.concurrency))
+        summary.update(workers=workers, memory_idle=memory_idle, memory_loaded=memory_mb(process_tree(process.pid)))
+        return summary
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            for pid in reversed(process_tree(process.pid)):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=lambda value: [int(v) for v in value.split(",")], default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--length", default="uniform:5:40",
+                        help="Text length in words: fixed:N, uniform:LOW:HIGH or lognormal:MU:SIGMA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-model", action="store_true", help="Load the real model instead of the stub")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the service (repeatable)")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/workers-<time>.json)")
+    args = parser.parse_args()
+
+    service_env = dict(item.split("=", 1) for item in args.env)
+    # Unique texts per run, so the cache does not answer for the model
+    service_env.setdefault("EMBEDDINGS_CACHE_SIZE", "0")
+    if not args.real_model:
+        service_env.setdefault("EMBEDDINGS_STUB_MODEL", "true")
+
+    results = []
+    for workers in args.workers:
+        print(f"{workers} workers")
+        summary = measure(workers, args, service_env)
+        print_summary(summary)
+        print(f"  memory: rss {summary['memory_loaded']['rss_mb']:.0f} MiB   "
+              f"pss {summary['memory_loaded']['pss_mb']:.0f} MiB")
+        results.append(summary)
+
+    base = results[0]["throughput_rps"] / results[0]["workers"] if results and results[0]["throughput_rps"] else 0.0
+    for result in results:
+        result["scaling_efficiency"] = round(result["throughput_rps"] / (base * result["workers"]), 3) if base else None
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": started.isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "workload": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "length": args.length,
+            "seed": args.seed,
+            "stub_model": not args.real_model,
+            "service_env": service_env,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"workers-{started.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
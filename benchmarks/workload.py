@@ -0,0 +1,53 @@
+"""
+Synthetic text workloads for the benchmark suite.
+"""
+import random
+from typing import List
+
+# Small fixed vocabulary so generated texts look like prose to a tokenizer
+VOCABULARY = (
+    "the of and to in is for on that with as by this be are from at or an it "
+    "model data service request embedding vector text batch latency throughput "
+    "replica queue cache network serve ray deploy cluster query document search "
+    "index memory thread worker process client server response token length"
+).split()
+
+
+def parse_length_distribution(spec: str):
+    """Parse a length spec into a sampler of word counts.
+
+    Supported specs: ``fixed:N``, ``uniform:LOW:HIGH`` and
+    ``lognormal:MU:SIGMA`` (in words, clamped to at least one word).
+    """
+    kind, *params = spec.split(":")
+    if kind == "fixed":
+        length = int(params[0])
+        return lambda rng: length
+    if kind == "uniform":
+        low, high = int(params[0]), int(params[1])
+        return lambda rng: rng.randint(low, high)
+    if kind == "lognormal":
+        mu, sigma = float(params[0]), float(params[1])
+        return lambda rng: max(1, int(rng.lognormvariate(mu, sigma)))
+    raise ValueError(f"Unknown length distribution: {spec}")
+
+
+def generate_texts(count: int, length_spec: str = "uniform:5:40", duplicate_ratio: float = 0.0, seed: int = 0) -> List[str]:
+    """Generate `count` texts where roughly `duplicate_ratio` repeat earlier ones."""
+    rng = random.Random(seed)
+    sample_length = parse_length_distribution(length_spec)
+    texts: List[str] = []
+    for i in range(count):
+        if texts and rng.random() < duplicate_ratio:
+            texts.append(rng.choice(texts))
+        else:
+            words = rng.choices(VOCABULARY, k=sample_length(rng))
+            texts.append(f"{i} " + " ".join(words))
+    return texts
+
+
+def zipf_indices(count: int, population: int, exponent: float = 1.0, seed: int = 0) -> List[int]:
+    """Sample `count` ranks in [0, population) with Zipf-distributed popularity."""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) ** exponent for rank in range(population)]
+    return rng.choices(range(population), weights=weights, k=count)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Bake embedding models into a local artifact directory.
+
+Each model is downloaded once and saved as safetensors under
+`<output>/<model name>`, which the embeddings service loads (memory-mapped)
+when `EMBEDDINGS_MODEL_DIR` points at `<output>`. Run it at image build
+time so replicas start without touching the network.
+
+Examples:
+    python deployment/bake_model.py
+    python deployment/bake_model.py --output /models all-MiniLM-L6-v2 all-mpnet-base-v2
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from sentence_transformers import SentenceTransformer
+
+
+def bake(model_name: str, output: str) -> str:
+    """Download a model and save it as safetensors under ``output``."""
+    path = os.path.join(output, model_name.replace("/", "__"))
+    started = time.perf_counter()
+    SentenceTransformer(model_name).save(path, safe_serialization=True)
+    print(f"Baked {model_name} into {path} in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="*", default=["all-MiniLM-L6-v2"])
+    parser.add_argument("--output", default=os.getenv("EMBEDDINGS_MODEL_DIR", "models"),
+                        help="Artifact directory (default: $EMBEDDINGS_MODEL_DIR or ./models)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for model_name in args.models:
+        bake(model_name, args.output)
+    print(f"Set EMBEDDINGS_MODEL_DIR={os.path.abspath(args.output)} to load from these artifacts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Embed a corpus offline with Ray Data.
+
+Reads Parquet or JSONL shards, embeds a text column with `map_batches` over
+an autoscaling pool of actors that each hold one EmbeddingGenerator, and
+writes `[id,] source, embedding` rows as Parquet (the embedding is a
+fixed-size list of float32; `id` only with `--id-column`).
+
+Shards are processed in groups of `--checkpoint-every`. Each group is
+written to a staging directory, renamed into place once complete and then
+recorded in `<output>/_checkpoint.jsonl`, so a rerun after a crash skips
+finished shards and redoes only the group that was in flight. Part
+directories the checkpoint does not record (e.g. from an interrupted run
+with another `--checkpoint-every`) are removed first. A throughput
+report (rows/sec overall and per CPU core) is printed and saved as
+`<output>/_report.json`.
+
+Needs Ray Data (`pip install 'ray[data]'`, which brings pyarrow). Uses the
+local Ray cluster, or the one at `RAY_ADDRESS`. The `src` package is shipped
+to the actors, and `EMBEDDINGS_*` settings (e.g. `EMBEDDINGS_BACKEND`,
+`EMBEDDINGS_STUB_MODEL`) are passed to them.
+
+Examples:
+    python deployment/embed_corpus.py data/shards/ --output data/embeddings --id-column id
+    python deployment/embed_corpus.py 'data/*.jsonl' --output out --text-column body --max-actors 8
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SHARD_SUFFIXES = (".parquet", ".jsonl", ".json")
+CHECKPOINT_FILE = "_checkpoint.jsonl"
+REPORT_FILE = "_report.json"
+
+
+class CorpusEmbedder:
+    """Ray Data actor holding one loaded model; embeds one batch of rows per call."""
+
+    def __init__(self, model_name: str, text_column: str, id_column: Optional[str], threads: int):
+        from src.embeddings_service.generator import EmbeddingGenerator, configure_torch_threads
+
+        if os.getenv("EMBEDDINGS_STUB_MODEL", "false").lower() != "true":
+            configure_torch_threads(threads)
+        self.generator = EmbeddingGenerator(model_name)
+        self.text_column = text_column
+        self.id_column = id_column
+
+    def __call__(self, batch: Dict[str, np.ndarray]):
+        import pyarrow as pa
+
+        texts = [str(text) for text in batch[self.text_column]]
+        vectors = np.ascontiguousarray(self.generator.generate_embeddings_batch(texts), dtype=np.float32)
+        columns = {}
+        if self.id_column:
+            columns["id"] = pa.array(batch[self.id_column].tolist())
+        columns["source"] = pa.array([os.path.basename(str(path)) for path in batch["path"]])
+        columns["embedding"] = pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), vectors.shape[1])
+        return pa.table(columns)
+
+
+def find_shards(inputs: List[str]) -> List[str]:
+    """Expand files, directories and globs into a sorted list of shard files."""
+    shards: Set[str] = set()
+    for pattern in inputs:
+        for path in glob.glob(pattern) or [pattern]:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    shards.update(os.path.join(root, name) for name in files if name.endswith(SHARD_SUFFIXES))
+            elif path.endswith(SHARD_SUFFIXES) and os.path.exists(path):
+                shards.add(path)
+    return sorted(os.path.abspath(path) for path in shards)
+
+
+def load_checkpoint(output: str) -> Tuple[Set[str], Set[str]]:
+    """Get the shards already embedded by earlier runs and the part directories holding them."""
+    done: Set[str] = set()
+    parts: Set[str] = set()
+    path = os.path.join(output, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    done.update(entry["shards"])
+                    parts.add(os.path.basename(entry["output"]))
+    return done, parts
+
+
+def remove_orphaned_parts(output: str, parts: Set[str]) -> None:
+    """Delete part directories no checkpoint entry records, so their rows are not counted twice.
+
+    A run interrupted mid-rename, or resumed with a different
+    ``--checkpoint-every``, leaves parts whose shards will be embedded again
+    into differently named groups.
+    """
+    for name in sorted(os.listdir(output)):
+        if name.startswith("part-") and name not in parts:
+            print(f"Removing {name}, which no checkpoint records")
+            shutil.rmtree(os.path.join(output, name), ignore_errors=True)
+
+
+def check_columns(shards: List[str], columns: List[str]) -> None:
+    """Fail early, naming the shards, when Parquet shards lack a requested column."""
+    import pyarrow.parquet as pq
+
+    for column in columns:
+        missing = [shard for shard in shards if shard.endswith(".parquet")
+                   and column not in pq.read_schema(shard).names]
+        if missing:
+            raise SystemExit(
+                f"Column {column!r} is missing from {len(missing)} shards, e.g. {missing[0]} "
+                f"(see --text-column and --id-column)"
+            )
+
+
+def plan_groups(shards: List[str], size: int) -> List[List[str]]:
+    """Split shards into checkpoint groups, keeping Parquet and JSON shards apart."""
+    groups = []
+    for is_parquet in (True, False):
+        kind = [shard for shard in shards if shard.endswith(".parquet") == is_parquet]
+        groups.extend(kind[start:start + size] for start in range(0, len(kind), size))
+    return groups
+
+
+def group_id(shards: List[str]) -> str:
+    return hashlib.blake2b("\n".join(shards).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def count_rows(directory: str) -> int:
+    """Count rows in the Parquet files written to a directory."""
+    import pyarrow.parquet as pq
+
+    return sum(
+        pq.ParquetFile(os.path.join(directory, name)).metadata.num_rows
+        for name in os.listdir(directory) if name.endswith(".parquet")
+    )
+
+
+def embed_group(shards: List[str], destination: str, args: argparse.Namespace) -> int:
+    """Embed one group of shards into ``destination``; returns the number of rows written."""
+    import ray
+
+    columns = [args.text_column] + ([args.id_column] if args.id_column else [])
+    if shards[0].endswith(".parquet"):
+        dataset = ray.data.read_parquet(shards, columns=columns, include_paths=True)
+    else:
+        dataset = ray.data.read_json(shards, include_paths=True)
+
+    embedded = dataset.map_batches(
+        CorpusEmbedder,
+        fn_constructor_kwargs={
+            "model_name": args.model,
+            "text_column": args.text_column,
+            "id_column": args.id_column,
+            "threads": args.cpus_per_actor,
+        },
+        batch_size=args.batch_size,
+        batch_format="numpy",
+        # A (min, max) pair gives an autoscaling actor pool
+        concurrency=(args.min_actors, args.max_actors),
+        num_cpus=args.cpus_per_actor,
+    )
+
+    staging = destination + ".staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    embedded.write_parquet(staging)
+    os.replace(staging, destination)
+    return count_rows(destination)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Shard files, directories or globs (.parquet, .jsonl)")
+    parser.add_argument("--output", required=True, help="Output directory for Parquet vectors and checkpoints")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--id-column", default="", help="Column carried through to the output as id (default: none)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows per map_batches call")
+    parser.add_argument("--min-actors", type=int, default=1)
+    parser.add_argument("--max-actors", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--cpus-per-actor", type=int, default=2, help="CPUs reserved, and torch threads, per actor")
+    parser.add_argument("--checkpoint-every", type=int, default=16, help="Shards per checkpointed group")
+    args = parser.parse_args()
+    args.id_column = args.id_column or None
+
+    try:
+        import ray
+        import ray.data  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise SystemExit(f"The corpus job needs Ray Data: pip install 'ray[data]' ({e})")
+
+    shards = find_shards(args.inputs)
+    if not shards:
+        raise SystemExit(f"No {', '.join(SHARD_SUFFIXES)} shards found in {' '.join(args.inputs)}")
+    os.makedirs(args.output, exist_ok=True)
+    done, parts = load_checkpoint(args.output)
+    remove_orphaned_parts(args.output, parts)
+    pending = [shard for shard in shards if shard not in done]
+    print(f"{len(shards)} shards, {len(shards) - len(pending)} already embedded, {len(pending)} to go")
+    check_columns(pending, [args.text_column] + ([args.id_column] if args.id_column else []))
+
+    env_vars = {name: value for name, value in os.environ.items() if name.startswith("EMBEDDINGS_")}
+    # Ship the src package so actors on other nodes can import the generator
+    runtime_env = {"env_vars": env_vars, "py_modules": [os.path.join(REPO_ROOT, "src")]}
+    ray.init(address=os.getenv("RAY_ADDRESS"), runtime_env=runtime_env)
+    cores = ray.cluster_resources().get("CPU", 1.0)
+
+    started = time.perf_counter()
+    total_rows = 0
+    groups: List[Dict[str, Any]] = []
+    for shard_group in plan_groups(pending, max(1, args.checkpoint_every)):
+        group_started = time.perf_counter()
+        destination = os.path.join(args.output, f"part-{group_id(shard_group)}")
+        shutil.rmtree(destination, ignore_errors=True)
+        rows = embed_group(shard_group, destination, args)
+        seconds = time.perf_counter() - group_started
+        with open(os.path.join(args.output, CHECKPOINT_FILE), "a") as f:
+            f.write(json.dumps({"shards": shard_group, "output": destination, "rows": rows, "seconds": seconds}) + "\n")
+        total_rows += rows
+        groups.append({"shards": len(shard_group), "rows": rows, "seconds": round(seconds, 2)})
+        print(f"  {len(shard_group)} shards, {rows} rows in {seconds:.1f}s ({rows / seconds:.0f} rows/s)")
+
+    elapsed = time.perf_counter() - started
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "model": args.model,
+        "backend": os.getenv("EMBEDDINGS_BACKEND", "torch"),
+        "shards": len(pending),
+        "rows": total_rows,
+        "seconds": round(elapsed, 2),
+        "cluster_cpus": cores,
+        "actors": [args.min_actors, args.max_actors],
+        "cpus_per_actor": args.cpus_per_actor,
+        "rows_per_second": round(total_rows / elapsed, 1) if elapsed else 0.0,
+        "rows_per_second_per_core": round(total_rows / elapsed / cores, 1) if elapsed else 0.0,
+        "groups": groups,
+    }
+    with open(os.path.join(args.output, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Embedded {total_rows} rows in {elapsed:.1f}s: {report['rows_per_second']} rows/s, "
+          f"{report['rows_per_second_per_core']} rows/s per core ({cores:.0f} CPUs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Local load scenario that exercises Ray Serve autoscaling.
+
+Ramps concurrent /api/process traffic up and back down while printing the
+number of running replicas per deployment, so replicas can be seen scaling
+up under load and back down once it subsides.
+
+Start the services first with `make run-ray`, then run `make load-ray`.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+import numpy as np
+import ray
+from ray import serve
+
+# (concurrency, seconds) per phase: warm up, ramp up, peak, cool down, idle
+PHASES = [(1, 20), (16, 40), (64, 60), (8, 40), (0, 60)]
+
+
+def replica_counts() -> Dict[str, int]:
+    """Get the number of running replicas for every deployment."""
+    counts: Dict[str, int] = {}
+    for app_name, app_status in serve.status().applications.items():
+        for deployment_name, deployment_status in app_status.deployments.items():
+            running = deployment_status.replica_states.get("RUNNING", 0)
+            counts[f"{app_name}/{deployment_name}"] = running
+    return counts
+
+
+async def run_phase(url: str, concurrency: int, seconds: float, latencies: List[float]) -> int:
+    """Send requests from `concurrency` workers for `seconds`, returning the request count."""
+    deadline = time.monotonic() + seconds
+    completed = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal completed
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    url,
+                    json={"text": f"load scenario {uuid.uuid4()}", "process_embeddings": True},
+                    timeout=60.0
+                )
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+                completed += 1
+            except httpx.HTTPError:
+                pass
+
+    if concurrency == 0:
+        await asyncio.sleep(seconds)
+        return 0
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return completed
+
+
+async def monitor(stop: asyncio.Event, interval: float) -> None:
+    """Print replica counts periodically until stopped."""
+    while not stop.is_set():
+        counts = replica_counts()
+        print("   replicas: " + ", ".join(f"{name}={count}" for name, count in sorted(counts.items())))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000/api/process")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between replica reports")
+    args = parser.parse_args()
+
+    ray.init(address="auto", logging_level="ERROR")
+
+    for concurrency, seconds in PHASES:
+        print(f"Phase: {concurrency} concurrent clients for {seconds}s")
+        stop = asyncio.Event()
+        monitor_task = asyncio.create_task(monitor(stop, args.interval))
+        latencies: List[float] = []
+        completed = await run_phase(args.url, concurrency, seconds, latencies)
+        stop.set()
+        await monitor_task
+
+        if latencies:
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"   {completed / seconds:.1f} req/s, p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+
+    print("Final replicas: " + ", ".join(f"{name}={count}" for name, count in sorted(replica_counts().items())))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
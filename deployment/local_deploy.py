@@ -1,5 +1,23 @@
+#!/usr/bin/env python3
+"""
+Run both services locally.
+
+By default each service is a single uvicorn process with auto-reload, for
+development. With `--prod`, each runs as a pre-fork server: the reloader is
+off, the embeddings service loads its default model once in a master
+process and forks `--workers` workers that share the weights copy-on-write,
+and each worker pins torch to its share of the cores.
+
+Examples:
+    python deployment/local_deploy.py
+    python deployment/local_deploy.py --prod --workers 4 --user-input-workers 2
+    python deployment/local_deploy.py --prod --workers 4 --services embeddings
+"""
+import argparse
+import httpx
 import uvicorn
 import multiprocessing
+import signal
 import sys
 import os
 import time
@@ -7,6 +25,8 @@ import time
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
+SERVICES = ("embeddings", "user_input")
+
 
 def run_embeddings_service():
     """Run the embeddings service on port 8001."""
@@ -19,12 +39,25 @@ def run_embeddings_service():
     )
 
 
+def wait_until_ready(url: str, timeout: float = 300.0) -> None:
+    """Poll a readiness endpoint until it answers 200 or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    print(f"Embeddings service not ready after {timeout:.0f}s, starting user input service anyway")
+
+
 def run_user_input_service():
     """Run the user input service on port 8000."""
-    # Wait a bit for embeddings service to start
-    time.sleep(3)
+    # Start once the embeddings service has loaded and warmed up its model
+    wait_until_ready("http://localhost:8001/ready")
     uvicorn.run(
-        "src.user_input_service.app:app", 
+        "src.user_input_service.app:app",
         host="0.0.0.0",
         port=8000,
         reload=True,
@@ -32,35 +65,113 @@ def run_user_input_service():
     )
 
 
+def _torch_threads_per_worker(workers: int) -> int:
+    """Split the cores between workers unless EMBEDDINGS_TORCH_THREADS is set."""
+    configured = int(os.getenv("EMBEDDINGS_TORCH_THREADS", "0") or 0)
+    return configured if configured > 0 else max(1, (os.cpu_count() or 1) // workers)
+
+
+def _uses_torch() -> bool:
+    return os.getenv("EMBEDDINGS_STUB_MODEL", "false").lower() != "true"
+
+
+def run_embeddings_prefork(workers: int):
+    """Run the embeddings service on port 8001 as a pre-fork server with shared model weights."""
+    from src.shared.prefork import PreforkServer
+    from src.embeddings_service.generator import configure_torch_threads
+
+    def load_app():
+        from src.embeddings_service.app import app
+        return app
+
+    def preload():
+        from src.embeddings_service.app import model_registry
+        if _uses_torch():
+            # A single thread keeps torch from starting an OpenMP pool in the
+            # master, which forked workers would inherit in a broken state
+            configure_torch_threads(1)
+        model_registry.preload()
+
+    def post_fork(worker_id: int):
+        if _uses_torch():
+            configure_torch_threads(_torch_threads_per_worker(workers))
+
+    # ONNX Runtime sessions own thread pools that do not survive fork, so
+    # those backends load in each worker instead
+    shared = not os.getenv("EMBEDDINGS_BACKEND", "torch").startswith("onnx")
+    PreforkServer(
+        load_app, port=8001, workers=workers, preload=preload if shared else None, post_fork=post_fork
+    ).run()
+
+
+def run_user_input_prefork(workers: int):
+    """Run the user input service on port 8000 as a pre-fork server."""
+    from src.shared.prefork import PreforkServer
+
+    def load_app():
+        from src.user_input_service.app import app
+        return app
+
+    wait_until_ready("http://localhost:8001/ready")
+    PreforkServer(load_app, port=8000, workers=workers).run()
+
+
 if __name__ == "__main__":
-    print("Starting FastAPI services locally...")
-    print("Embeddings Service will run on: http://localhost:8001")
-    print("User Input Service will run on: http://localhost:8000")
-    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prod", action="store_true", help="Pre-fork workers without auto-reload")
+    parser.add_argument("--workers", type=int, default=2, help="Embeddings service workers with --prod")
+    parser.add_argument("--user-input-workers", type=int, default=2, help="User input service workers with --prod")
+    parser.add_argument("--services", default=",".join(SERVICES), help="Comma-separated services to run")
+    args = parser.parse_args()
+
+    services = [name.strip() for name in args.services.split(",") if name.strip()]
+    if args.prod:
+        targets = {
+            "embeddings": (run_embeddings_prefork, (args.workers,)),
+            "user_input": (run_user_input_prefork, (args.user_input_workers,)),
+        }
+    else:
+        targets = {"embeddings": (run_embeddings_service, ()), "user_input": (run_user_input_service, ())}
+
+    print("Starting FastAPI services locally" + (" (production mode)..." if args.prod else "..."))
+    if "embeddings" in services:
+        print("Embeddings Service will run on: http://localhost:8001"
+              + (f" with {args.workers} workers" if args.prod else ""))
+    if "user_input" in services:
+        print("User Input Service will run on: http://localhost:8000"
+              + (f" with {args.user_input_workers} workers" if args.prod else ""))
+
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+
+    # Stop the services the same way on SIGTERM as on Ctrl+C
+    signal.signal(signal.SIGTERM, interrupt)
+
+    processes = []
     try:
-        # Start both services as separate processes
-        embeddings_process = multiprocessing.Process(target=run_embeddings_service)
-        user_input_process = multiprocessing.Process(target=run_user_input_service)
-        
-        embeddings_process.start()
-        user_input_process.start()
-        
-        print("Both services started successfully!")
+        # Start each service as a separate process
+        for name in services:
+            target, target_args = targets[name]
+            process = multiprocessing.Process(target=target, args=target_args)
+            process.start()
+            processes.append(process)
+
+        print("Services started successfully!")
         print("\nTry these endpoints:")
         print("   curl -X POST http://localhost:8000/process -H 'Content-Type: application/json' -d '{\"text\": \"Hello world!\"}'")
         print("   curl -X POST http://localhost:8001/embed -H 'Content-Type: application/json' -d '{\"text\": \"Hello world!\"}'")
         print("\nPress Ctrl+C to stop the services")
 
-        # Wait for both processes
-        embeddings_process.join()
-        user_input_process.join()
-        
+        # Wait for every service
+        for process in processes:
+            process.join()
+
     except KeyboardInterrupt:
         print("\nShutting down services...")
-        embeddings_process.terminate()
-        user_input_process.terminate()
-        embeddings_process.join()
-        user_input_process.join()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
         print("Services stopped successfully!")
     except Exception as e:
         print(f"Error starting services: {str(e)}")
@@ -3,22 +3,85 @@ from ray import serve
 import asyncio
 import sys
 import os
+import time
+import yaml
+import numpy as np
+from typing import Any, Dict, List, Optional
 
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.embeddings_service.app import app as embeddings_app
-from src.user_input_service.app import app as user_input_app
+from src.embeddings_service.app import app as embeddings_app, embed_texts, startup_state
+from src.user_input_service.app import app as user_input_app, embeddings_client
+from src.user_input_service.transport import RayHandleTransport
+from src.shared.deadline import reset_deadline, set_deadline
+from src.shared.logs import reset_request_context, set_request_context
+from src.shared.utils import get_env_int
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "serve_config.yaml")
+
+# Serve application the embeddings deployment runs in
+EMBEDDINGS_APP_NAME = "embeddings-service"
+
+# Texts are hashed into EMBEDDINGS_AFFINITY_SHARDS routing shards (0 turns
+# affinity routing off); each replica serves at most this many of them
+AFFINITY_SHARDS_PER_REPLICA = get_env_int("EMBEDDINGS_AFFINITY_SHARDS_PER_REPLICA", 8)
 
 
 @serve.deployment(
     name="embeddings-service",
     num_replicas=1,
-    ray_actor_options={"num_cpus": 1, "num_gpus": 0}
+    ray_actor_options={
+        "num_cpus": 1,
+        "num_gpus": 0,
+        # Finish loading and warming up before the replica is admitted to traffic
+        "runtime_env": {"env_vars": {"EMBEDDINGS_BLOCKING_STARTUP": "true"}}
+    }
 )
 @serve.ingress(embeddings_app)
 class EmbeddingsService:
-    pass
+    @serve.multiplexed(max_num_models_per_replica=AFFINITY_SHARDS_PER_REPLICA)
+    async def affinity_shard(self, shard: str) -> str:
+        """Claim a routing shard, so Serve keeps routing its texts to this replica.
+
+        Nothing is loaded: the "model" is the share of this replica's result
+        cache that the shard's texts fill.
+        """
+        return shard
+
+    async def embed_array(
+        self,
+        texts: List[str],
+        model_name: str = "all-MiniLM-L6-v2",
+        batch_size: Optional[int] = None,
+        deadline_s: Optional[float] = None,
+        request_id: Optional[str] = None
+    ) -> np.ndarray:
+        """Embed texts for in-process callers holding a DeploymentHandle.
+
+        ``deadline_s`` is the caller's remaining budget, so expired texts are
+        dropped before inference as on the HTTP path, and ``request_id`` tags
+        this call's log records.
+        """
+        deadline_token = set_deadline(deadline_s)
+        log_tokens = set_request_context(request_id)
+        try:
+            shard = serve.get_multiplexed_model_id()
+            if shard:
+                await self.affinity_shard(shard)
+            return await embed_texts(texts, model_name, batch_size)
+        finally:
+            reset_request_context(log_tokens)
+            reset_deadline(deadline_token)
+
+    async def health_check(self) -> bool:
+        """Health check for in-process callers."""
+        return startup_state.ready
+
+    def check_health(self):
+        """Let Ray Serve replace a replica whose model failed to load."""
+        if startup_state.error:
+            raise RuntimeError(f"Embeddings replica failed to start: {startup_state.error}")
 
 
 @serve.deployment(
@@ -28,13 +91,63 @@ class EmbeddingsService:
 )
 @serve.ingress(user_input_app)
 class UserInputService:
-    pass
+    def __init__(self, embeddings_app_name: Optional[str] = None):
+        """Call the running embeddings application through a handle when one is named."""
+        if embeddings_app_name is not None:
+            embeddings_client.use_transport(RayHandleTransport(
+                serve.get_app_handle(embeddings_app_name),
+                affinity_shards=get_env_int("EMBEDDINGS_AFFINITY_SHARDS", 0)
+            ))
 
 
-async def deploy_services():
+def load_config(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load per-deployment settings from a YAML file."""
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def deployment_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate a deployment's config section into ``Deployment.options()`` kwargs."""
+    options = dict(settings)
+    torch_threads = options.pop("torch_threads", None)
+    env_vars = {key: str(value) for key, value in (options.pop("env_vars", None) or {}).items()}
+
+    if torch_threads:
+        # Size every native thread pool to the replica's CPU share
+        for name in ("EMBEDDINGS_TORCH_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+            env_vars.setdefault(name, str(torch_threads))
+
+    if env_vars:
+        actor_options = dict(options.get("ray_actor_options") or {})
+        runtime_env = dict(actor_options.get("runtime_env") or {})
+        runtime_env["env_vars"] = {**runtime_env.get("env_vars", {}), **env_vars}
+        actor_options["runtime_env"] = runtime_env
+        options["ray_actor_options"] = actor_options
+
+    # Autoscaling and a fixed replica count are mutually exclusive
+    if "autoscaling_config" in options:
+        options.setdefault("num_replicas", "auto")
+    return options
+
+
+def configured(deployment, config: Dict[str, Dict[str, Any]]):
+    """Apply the config section named after the deployment, if any."""
+    settings = config.get(deployment.name)
+    if not settings:
+        return deployment
+    return deployment.options(**deployment_options(settings))
+
+
+async def deploy_services(config_path: Optional[str] = None):
     """Deploy both microservices using Ray Serve."""
     print("Starting Ray Serve deployment...")
     
+    config_path = config_path or os.getenv("SERVE_CONFIG_PATH", DEFAULT_CONFIG_PATH)
+    config = load_config(config_path) if os.path.exists(config_path) else {}
+    print(f"Using deployment config: {config_path if config else 'built-in defaults'}")
+    embeddings_deployment = configured(EmbeddingsService, config)
+    user_input_deployment = configured(UserInputService, config)
+    
     # Set environment variable for Ray deployment
     os.environ["RAY_SERVE_DEPLOYMENT"] = "true"
     
@@ -45,15 +158,22 @@ async def deploy_services():
     # Deploy the embeddings service
     print("Deploying embeddings service...")
     embeddings_handle = serve.run(
-        EmbeddingsService.bind(),
-        name="embeddings-service",
+        embeddings_deployment.bind(),
+        name=EMBEDDINGS_APP_NAME,
         route_prefix="/embeddings"
     )
     
-    # Deploy the user input service  
+    # Deploy the user input service. By default it calls the embeddings
+    # application deployed above through a DeploymentHandle, so /process and
+    # /embeddings traffic share one pool of replicas, caches and autoscaling;
+    # EMBEDDINGS_TRANSPORT=http goes through the HTTP proxy instead.
     print("Deploying user input service...")
+    if os.getenv("EMBEDDINGS_TRANSPORT", "ray").lower() == "http":
+        user_input_app_node = user_input_deployment.bind()
+    else:
+        user_input_app_node = user_input_deployment.bind(EMBEDDINGS_APP_NAME)
     user_input_handle = serve.run(
-        UserInputService.bind(),
+        user_input_app_node,
         name="user-input-service", 
         route_prefix="/api"
     )
@@ -70,7 +190,7 @@ async def deploy_services():
 if __name__ == "__main__":
     try:
         # Run the deployment
-        handles = asyncio.run(deploy_services())
+        handles = asyncio.run(deploy_services(sys.argv[1] if len(sys.argv) > 1 else None))
 
         print("\nServices are now running!")
         print("Try these endpoints:")
@@ -81,7 +201,7 @@ if __name__ == "__main__":
         # Keep the script running
         try:
             while True:
-                asyncio.sleep(1)
+                time.sleep(1)
         except KeyboardInterrupt:
             print("\nShutting down services...")
             serve.shutdown()
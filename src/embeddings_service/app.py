@@ -1,19 +1,223 @@
-from fastapi import FastAPI, HTTPException
-from ..shared.models import EmbeddingRequest, EmbeddingResponse
-from ..shared.utils import get_logger, create_response
-from .generator import EmbeddingGenerator
+import asyncio
+import os
+import time
+import numpy as np
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Header, Request, Response
+from fastapi.responses import JSONResponse
+from ..shared.models import (
+    EmbeddingRequest,
+    EmbeddingResponse,
+    BatchEmbeddingRequest,
+    BatchEmbeddingResponse
+)
+from ..shared.cache import EmbeddingCache
+from ..shared.deadline import DeadlineExceededError, check_deadline, install_deadlines
+from ..shared.logs import LogSampler, install_request_logging
+from ..shared.metrics import histogram, install_metrics, record_stage, timed_stage
+from ..shared.models import OutputDtype
+from ..shared.tokenization import TOKENIZER_HEADER
+from ..shared.wire import (
+    NDJSON_MEDIA_TYPE, TOKEN_IDS_MEDIA_TYPE, WireFormatError, negotiate_dtype, encode_vectors, content_type,
+    decode_token_ids, quantize, truncate_dimensions
+)
+from ..shared.utils import get_logger, create_response, get_env_int, get_env_float, get_env_bool
+from .generator import EmbeddingGenerator, config_fingerprint
+from .batcher import EmbeddingBatcher
+from .executor import InferenceExecutor, InferenceOverloadedError
+from .registry import ModelPipeline, ModelRegistry, UnknownModelError
+from .scheduler import PRIORITIES, PriorityScheduler, TenantQuotaExceededError, TenantQuotas
+from .startup import StartupState
+from .streaming import NdjsonStreamingResponse, embed_stream, iter_lines
 
 logger = get_logger(__name__)
 
+# Created first so the boot phase covers interpreter start and imports
+startup_state = StartupState()
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+# Dummy batch of varied lengths run once before admitting traffic
+WARMUP_TEXTS = [" ".join(["warm up"] * words) for words in (1, 4, 16, 64)]
+
+PRIORITY_HEADER = "X-Priority"
+TENANT_HEADER = "X-Tenant-Id"
+DEFAULT_PRIORITY = os.getenv("EMBEDDINGS_DEFAULT_PRIORITY", "interactive")
+
+# Bulk batch requests run as chunks of this many texts, each scheduled on
+# its own, so interactive batches never wait behind a whole backfill batch
+BULK_CHUNK_SIZE = get_env_int("EMBEDDINGS_BULK_CHUNK_SIZE", 64)
+
+LANE_REQUEST_SECONDS = histogram(
+    "embeddings_lane_request_seconds", "Embedding request latency by priority lane", ("lane",)
+)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Embeddings Service",
     description="Microservice for generating vector embeddings",
     version="1.0.0"
 )
+install_metrics(app, service="embeddings")
+# Callers pass their remaining budget in X-Deadline-Ms; expired work is dropped before inference
+install_deadlines(app, default_ms=get_env_int("EMBEDDINGS_DEADLINE_MS", 0))
+# Request IDs on every log record, and INFO logs sampled per route (EMBEDDINGS_LOG_SAMPLE_RATE[S])
+install_request_logging(app, LogSampler.from_env("EMBEDDINGS"))
+
+
+def _build_pipeline(model_name: str) -> ModelPipeline:
+    """Load a model with its own inference executor and micro-batcher."""
+    generator = EmbeddingGenerator(model_name)
+    
+    # Run inference off the event loop so health checks and I/O stay responsive
+    executor = InferenceExecutor(
+        generator,
+        kind=os.getenv("EMBEDDINGS_EXECUTOR", "thread"),
+        max_workers=get_env_int("EMBEDDINGS_EXECUTOR_WORKERS", 1),
+        max_pending=get_env_int("EMBEDDINGS_MAX_PENDING_BATCHES", 16)
+    )
+    
+    # Share the executor's workers between priority lanes
+    scheduler = PriorityScheduler.from_env(
+        "EMBEDDINGS", slots=executor.max_workers, max_waiting=executor.max_pending, model_name=model_name
+    )
+    
+    # Micro-batch concurrent requests so they share one encode call
+    batcher = EmbeddingBatcher(
+        executor,
+        max_batch_size=get_env_int("EMBEDDINGS_MAX_BATCH_SIZE", 32),
+        max_wait_ms=get_env_float("EMBEDDINGS_MAX_WAIT_MS", 5.0),
+        max_queue_size=get_env_int("EMBEDDINGS_MAX_QUEUE_SIZE", 1024),
+        scheduler=scheduler
+    )
+    return ModelPipeline(generator, executor, batcher)
+
+
+# Initialize model registry; models other than the default load on first use
+model_registry = ModelRegistry(
+    allowed_models=[name.strip() for name in os.getenv("EMBEDDINGS_MODELS", DEFAULT_MODEL).split(",") if name.strip()],
+    default_model=os.getenv("EMBEDDINGS_DEFAULT_MODEL", DEFAULT_MODEL),
+    memory_budget_bytes=get_env_int("EMBEDDINGS_MODEL_MEMORY_MB", 2048) * 2**20,
+    build_pipeline=_build_pipeline
+)
+
+# Initialize embedding cache (EMBEDDINGS_CACHE_SIZE=0 disables it); a disk tier
+# written under another model configuration is dropped
+embedding_cache = EmbeddingCache.from_env(
+    "EMBEDDINGS", fingerprint=config_fingerprint(sorted(model_registry.allowed_models))
+)
+embedding_cache.register_metrics("embeddings")
+
+# Per-tenant concurrency quotas (EMBEDDINGS_TENANT_MAX_CONCURRENCY=0 disables them)
+tenant_quotas = TenantQuotas.from_env("EMBEDDINGS")
+
+
+async def warm_up() -> None:
+    """Load the default model and run a dummy batch through it, then mark the service ready."""
+    try:
+        with startup_state.phase("load"):
+            pipeline = await model_registry.get()
+        with startup_state.phase("warmup"):
+            await pipeline.executor.run(WARMUP_TEXTS)
+        startup_state.mark_ready()
+    except Exception as e:
+        startup_state.mark_failed(e)
+        raise
 
-# Initialize embedding generator
-embedding_generator = EmbeddingGenerator()
+
+@app.on_event("startup")
+async def startup():
+    """Load and warm up the default model.
+
+    By default this runs in the background so ``/live`` answers while the
+    model loads and ``/ready`` gates traffic. With
+    ``EMBEDDINGS_BLOCKING_STARTUP=true`` startup waits for it instead, which
+    keeps a Ray Serve replica out of rotation until it is warm.
+    """
+    if get_env_bool("EMBEDDINGS_BLOCKING_STARTUP", False):
+        await warm_up()
+    else:
+        app.state.warm_up = asyncio.create_task(warm_up())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background batching and inference and flush the cache on shutdown."""
+    await model_registry.shutdown()
+    embedding_cache.flush()
+
+
+def _binary_dtype(accept: Optional[str]) -> Optional[str]:
+    """Resolve the binary dtype requested by the Accept header, if any."""
+    try:
+        return negotiate_dtype(accept)
+    except WireFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+def _binary_response(vectors, dtype: str, model_name: str, dimension: int, scales=None) -> Response:
+    """Build a binary vector response with metadata in the headers and int8 scales in the payload."""
+    return Response(
+        content=encode_vectors(vectors, dtype, scales),
+        media_type=content_type(dtype),
+        headers={"X-Model-Name": model_name, "X-Embedding-Dimension": str(dimension)}
+    )
+
+
+def _convert_output(
+    embeddings: np.ndarray,
+    dtype: str,
+    dimensions: Optional[int]
+) -> Tuple[np.ndarray, Optional[np.ndarray], int]:
+    """Truncate and quantize a (count x dimension) batch for output.
+
+    Returns the converted rows, the int8 scales (if any) and the output
+    dimension. Raises ValueError for a ``dimensions`` the model cannot give.
+    """
+    with timed_stage("convert"):
+        vectors = truncate_dimensions(embeddings, dimensions)
+        converted, scales = quantize(vectors, dtype)
+    return converted, scales, vectors.shape[1]
+
+
+def _expired(error: DeadlineExceededError) -> HTTPException:
+    """Map a request whose deadline passed to a 504."""
+    logger.warning(f"Dropping embedding request: {str(error)}")
+    return HTTPException(status_code=504, detail=str(error))
+
+
+def _overloaded(error: InferenceOverloadedError) -> HTTPException:
+    """Map a saturated inference pipeline to a retryable 503."""
+    logger.warning(f"Shedding embedding request: {str(error)}")
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
+
+def _over_quota(error: TenantQuotaExceededError) -> HTTPException:
+    """Map a tenant over its concurrency quota to a retryable 429."""
+    logger.warning(f"Rejecting embedding request: {str(error)}")
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": "1"})
+
+
+def _priority(requested: Optional[str], header: Optional[str]) -> str:
+    """Resolve a request's priority lane from its body field, its header or the default."""
+    priority = requested or header or DEFAULT_PRIORITY
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=422, detail=f"Unknown priority: {priority} (expected one of {', '.join(PRIORITIES)})")
+    return priority
+
+
+@contextmanager
+def _admitted(priority: str, tenant: Optional[str]) -> Iterator[None]:
+    """Hold the tenant's quota for a request and record its latency in its lane."""
+    started = time.perf_counter()
+    try:
+        with tenant_quotas.hold(tenant):
+            yield
+    except TenantQuotaExceededError as e:
+        raise _over_quota(e)
+    finally:
+        LANE_REQUEST_SECONDS.labels(priority).observe(time.perf_counter() - started)
 
 
 @app.get("/health")
@@ -21,35 +225,428 @@ async def health_check():
     """Health check endpoint."""
     return create_response(
         success=True,
+        data={"ready": startup_state.ready},
         message="Embeddings service is healthy"
     )
 
 
+@app.get("/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving HTTP."""
+    return create_response(
+        success=True,
+        message="Embeddings service is live"
+    )
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: the default model is loaded and warmed up."""
+    if not startup_state.ready:
+        return JSONResponse(
+            status_code=503,
+            content=create_response(
+                success=False,
+                data=startup_state.get_stats(),
+                message="Embeddings service failed to start" if startup_state.error else "Embeddings service is starting"
+            )
+        )
+    return create_response(
+        success=True,
+        data=startup_state.get_stats(),
+        message="Embeddings service is ready"
+    )
+
+
 @app.post("/embed", response_model=EmbeddingResponse)
-async def generate_embeddings(request: EmbeddingRequest):
-    """Generate embeddings for the provided text."""
+async def generate_embeddings(
+    request: EmbeddingRequest,
+    accept: Optional[str] = Header(None),
+    x_priority: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """Generate embeddings for the provided text.
+
+    Clients sending ``Accept: application/x-embeddings`` get the vector as
+    raw little-endian bytes instead of a JSON float list.
+    """
+    binary_dtype = _binary_dtype(accept)
+    priority = _priority(request.priority, x_priority)
     try:
-        logger.info(f"Received embedding request for text: {request.text[:50]}...")
+        logger.info("Received %s embedding request for text: %.50s...", priority, request.text, extra={"priority": priority})
         
         # Generate embeddings
-        embeddings = embedding_generator.generate_embeddings(request.text)
-        dimension = embedding_generator.get_dimension()
+        model_name = model_registry.resolve(request.model_name)
+        with _admitted(priority, x_tenant_id):
+            embeddings = await embed_text(request.text, model_name, priority)
+        dtype = request.dtype or binary_dtype or "float32"
+        vectors, scales, dimension = _convert_output(embeddings, dtype, request.dimensions)
+        
+        if binary_dtype:
+            return _binary_response(vectors, dtype, model_name, dimension, scales)
         
         response = EmbeddingResponse(
             text=request.text,
-            embeddings=embeddings,
-            model_name=request.model_name,
-            dimension=dimension
+            embeddings=vectors[0].tolist(),
+            model_name=model_name,
+            dimension=dimension,
+            dtype=dtype,
+            scale=float(scales[0]) if scales is not None else None,
+            truncated=dimension < embeddings.shape[-1]
         )
         
-        logger.info(f"Successfully generated embeddings with dimension: {dimension}")
+        logger.info("Successfully generated embeddings with dimension: %d", dimension)
         return response
         
+    except HTTPException:
+        raise
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InferenceOverloadedError as e:
+        raise _overloaded(e)
+    except DeadlineExceededError as e:
+        raise _expired(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing embedding request: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def embed_text(text: str, model_name: Optional[str] = None, priority: str = DEFAULT_PRIORITY) -> np.ndarray:
+    """Embed one text through the cache and the model's micro-batcher."""
+    model_name = model_registry.resolve(model_name)
+    with timed_stage("cache"):
+        embeddings = embedding_cache.get(model_name, text)
+    if embeddings is None:
+        async with model_registry.use(model_name) as pipeline:
+            embeddings = await pipeline.batcher.submit(text, priority)
+        embedding_cache.put(model_name, text, embeddings)
+    return embeddings
+
+
+async def embed_texts(
+    texts: List[str],
+    model_name: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    priority: str = DEFAULT_PRIORITY
+) -> np.ndarray:
+    """Embed texts as a (count x dimension) array.
+
+    This is the entry point for in-process callers such as the Ray Serve
+    DeploymentHandle path, which bypass HTTP and JSON entirely.
+    """
+    model_name = model_registry.resolve(model_name)
+    if len(texts) == 1:
+        return (await embed_text(texts[0], model_name, priority))[np.newaxis, :]
+    return await _cached_batch(texts, model_name, batch_size, priority)
+
+
+async def _scheduled_run(
+    pipeline: ModelPipeline,
+    texts: List[str],
+    batch_size: Optional[int],
+    priority: str,
+    timings: dict
+) -> np.ndarray:
+    """Run texts through the executor once the scheduler grants their lane a slot.
+
+    Bulk work is split into ``BULK_CHUNK_SIZE`` chunks that are scheduled
+    one at a time.
+    """
+    chunk_size = BULK_CHUNK_SIZE if priority == "bulk" and BULK_CHUNK_SIZE > 0 else len(texts)
+    chunks = []
+    for start in range(0, len(texts), chunk_size):
+        check_deadline("embeddings", "inference")
+        await pipeline.batcher.scheduler.acquire(priority)
+        try:
+            chunks.append(await pipeline.executor.run(
+                texts[start:start + chunk_size],
+                batch_size=batch_size,
+                timings=timings
+            ))
+        finally:
+            pipeline.batcher.scheduler.release()
+    return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+
+async def _cached_batch(
+    texts: List[str],
+    model_name: str,
+    batch_size: Optional[int],
+    priority: str = DEFAULT_PRIORITY
+) -> np.ndarray:
+    """Encode a batch, running the model only for texts missing from the cache."""
+    with timed_stage("cache"):
+        cached = embedding_cache.get_many(model_name, texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    if not missing:
+        return np.stack(cached)
+    
+    timings = {}
+    async with model_registry.use(model_name) as pipeline:
+        computed = await _scheduled_run(pipeline, [texts[i] for i in missing], batch_size, priority, timings)
+    for stage, seconds in timings.items():
+        record_stage(stage, seconds)
+    if len(missing) == len(texts):
+        embeddings = computed
+    else:
+        embeddings = np.empty((len(texts), computed.shape[1]), dtype=computed.dtype)
+        embeddings[missing] = computed
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[i] = vector
+    
+    for i, vector in zip(missing, computed):
+        embedding_cache.put(model_name, texts[i], vector)
+    return embeddings
+
+
+@app.post("/embed/batch", response_model=BatchEmbeddingResponse)
+async def generate_embeddings_batch(
+    request: BatchEmbeddingRequest,
+    accept: Optional[str] = Header(None),
+    x_priority: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """Generate embeddings for a list of texts, returned as one 2-D block."""
+    binary_dtype = _binary_dtype(accept)
+    priority = _priority(request.priority, x_priority)
+    try:
+        logger.info(
+            "Received %s batch embedding request for %d texts", priority, len(request.texts),
+            extra={"priority": priority, "texts": len(request.texts)}
+        )
+        
+        model_name = model_registry.resolve(request.model_name)
+        with _admitted(priority, x_tenant_id):
+            embeddings = await _cached_batch(request.texts, model_name, request.batch_size, priority)
+        dtype = request.dtype or binary_dtype or "float32"
+        vectors, scales, dimension = _convert_output(embeddings, dtype, request.dimensions)
+        
+        if binary_dtype:
+            return _binary_response(vectors, dtype, model_name, dimension, scales)
+        
+        response = BatchEmbeddingResponse(
+            embeddings=vectors.tolist(),
+            model_name=model_name,
+            dimension=dimension,
+            count=len(request.texts),
+            dtype=dtype,
+            scales=scales.tolist() if scales is not None else None,
+            truncated=dimension < embeddings.shape[-1]
+        )
+        
+        logger.info("Successfully generated %d embeddings with dimension: %d", len(request.texts), dimension)
+        return response
+        
+    except HTTPException:
+        raise
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InferenceOverloadedError as e:
+        raise _overloaded(e)
+    except DeadlineExceededError as e:
+        raise _expired(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error processing batch embedding request: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/embed/tokens", response_model=BatchEmbeddingResponse)
+async def generate_embeddings_from_tokens(
+    request: Request,
+    model_name: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    dtype: Optional[OutputDtype] = None,
+    dimensions: Optional[int] = None,
+    accept: Optional[str] = Header(None),
+    x_priority: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None),
+    x_tokenizer_fingerprint: Optional[str] = Header(None)
+):
+    """Generate embeddings for texts the caller has already tokenized.
+
+    The body is ``application/x-token-ids``: int32 content token ids (no
+    special tokens) with each row's length, from the model's own tokenizer.
+    The ``X-Tokenizer-Fingerprint`` header must match the model's tokenizer
+    (see ``GET /tokenizer``), otherwise the request gets ``409``. Inputs go
+    straight to the forward pass; a single row joins the micro-batcher.
+    Pre-tokenized input bypasses the result cache, which is keyed by text.
+    """
+    binary_dtype = _binary_dtype(accept)
+    priority = _priority(None, x_priority)
+    if request.headers.get("content-type", "").split(";")[0].strip().lower() != TOKEN_IDS_MEDIA_TYPE:
+        raise HTTPException(status_code=415, detail=f"Expected a {TOKEN_IDS_MEDIA_TYPE} body")
+    try:
+        ids = decode_token_ids(await request.body())
+        if not ids:
+            raise ValueError("No token id rows in the request")
+        logger.info(
+            "Received %s embedding request for %d pre-tokenized texts", priority, len(ids),
+            extra={"priority": priority, "texts": len(ids)}
+        )
+        
+        model_name = model_registry.resolve(model_name)
+        with _admitted(priority, x_tenant_id):
+            async with model_registry.use(model_name) as pipeline:
+                fingerprint = pipeline.generator.tokenizer_fingerprint
+                if x_tokenizer_fingerprint != fingerprint:
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Token ids must come from tokenizer {fingerprint} of {model_name}",
+                        headers={TOKENIZER_HEADER: fingerprint}
+                    )
+                # Reject bad ids here, before they can fail a shared micro-batch
+                pipeline.generator.backend.text_tokenizer.check_ids(ids)
+                if len(ids) == 1:
+                    embeddings = (await pipeline.batcher.submit(ids[0], priority))[np.newaxis, :]
+                else:
+                    timings = {}
+                    embeddings = await _scheduled_run(pipeline, ids, batch_size, priority, timings)
+                    for stage, seconds in timings.items():
+                        record_stage(stage, seconds)
+        
+        dtype = dtype or binary_dtype or "float32"
+        vectors, scales, dimension = _convert_output(embeddings, dtype, dimensions)
+        if binary_dtype:
+            return _binary_response(vectors, dtype, model_name, dimension, scales)
+        return BatchEmbeddingResponse(
+            embeddings=vectors.tolist(),
+            model_name=model_name,
+            dimension=dimension,
+            count=len(ids),
+            dtype=dtype,
+            scales=scales.tolist() if scales is not None else None,
+            truncated=dimension < embeddings.shape[-1]
+        )
+        
+    except HTTPException:
+        raise
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InferenceOverloadedError as e:
+        raise _overloaded(e)
+    except DeadlineExceededError as e:
+        raise _expired(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error processing pre-tokenized embedding request: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/tokenizer")
+async def tokenizer_info(model_name: Optional[str] = None):
+    """Describe a model's tokenizer, for clients that tokenize locally."""
+    try:
+        model_name = model_registry.resolve(model_name)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    async with model_registry.use(model_name) as pipeline:
+        backend = pipeline.generator.backend
+        return create_response(
+            success=True,
+            data={
+                "model_name": model_name,
+                "fingerprint": pipeline.generator.tokenizer_fingerprint,
+                "max_seq_length": backend.max_seq_length,
+                "special_tokens": backend.special_tokens
+            },
+            message="Tokenizer"
+        )
+
+
+@app.post("/embed/stream")
+async def stream_embeddings(
+    request: Request,
+    model_name: Optional[str] = None,
+    priority: Optional[str] = None,
+    x_priority: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """Embed a newline-delimited stream of texts, streaming results back as they are computed.
+
+    Each request line is a JSON string or ``{"text": ..., "id": ...}``; each
+    response line is ``{"index", "id", "embedding"}`` (or ``"error"`` for a
+    bad line), in input order. Texts go through the micro-batcher and the
+    cache, and memory stays bounded by ``EMBEDDINGS_STREAM_WINDOW`` in-flight
+    texts. Clients should read the response while still sending, or send
+    bounded segments per request as ``EmbeddingsClient.stream_embeddings``
+    does. The stream holds one place in the tenant's quota until it ends.
+    """
+    priority = _priority(priority, x_priority)
+    try:
+        model_name = model_registry.resolve(model_name)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    try:
+        tenant_quotas.acquire(x_tenant_id)
+    except TenantQuotaExceededError as e:
+        raise _over_quota(e)
+    
+    try:
+        logger.info("Started %s embedding stream for model %s", priority, model_name, extra={"priority": priority})
+        lines = iter_lines(request.stream(), max_line_bytes=get_env_int("EMBEDDINGS_STREAM_MAX_LINE_BYTES", 2**20))
+        return NdjsonStreamingResponse(
+            embed_stream(
+                lines,
+                lambda text: embed_text(text, model_name, priority),
+                window=get_env_int("EMBEDDINGS_STREAM_WINDOW", 256)
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"X-Model-Name": model_name},
+            # Released when the response is done, even if its body never started
+            on_close=lambda: tenant_quotas.release(x_tenant_id)
+        )
+    except BaseException:
+        tenant_quotas.release(x_tenant_id)
+        raise
+
+
+@app.get("/batching/stats")
+async def batching_stats():
+    """Report the batch-size distribution achieved by each model's micro-batcher."""
+    return create_response(
+        success=True,
+        data={name: pipeline.batcher.get_stats() for name, pipeline in model_registry.loaded().items()},
+        message="Batching statistics"
+    )
+
+
+@app.get("/models")
+async def list_models():
+    """Report available and loaded models."""
+    return create_response(
+        success=True,
+        data=model_registry.get_stats(),
+        message="Model registry"
+    )
+
+
+@app.get("/tenants/stats")
+async def tenant_stats():
+    """Report tenant quotas and requests in flight per tenant."""
+    return create_response(
+        success=True,
+        data=tenant_quotas.get_stats(),
+        message="Tenant quotas"
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Report embedding cache hit/miss/eviction counters."""
+    return create_response(
+        success=True,
+        data=embedding_cache.get_stats(),
+        message="Cache statistics"
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
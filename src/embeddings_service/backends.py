@@ -0,0 +1,329 @@
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+from src.shared.tokenization import HuggingFaceTokenizer, TextTokenizer, WordTokenizer
+from src.shared.utils import get_logger, get_env_int
+from src.embeddings_service.stub import StubSentenceTransformer
+
+logger = get_logger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Probe texts for comparing a backend's output against the torch reference
+PARITY_TEXTS = [
+    "hello",
+    "The quick brown fox jumps over the lazy dog.",
+    "Embeddings map text to vectors so that similar texts end up close together.",
+    "¿Dónde está la biblioteca? Café, naïve, façade.",
+    "def add(a, b):\n    return a + b",
+    " ".join(["a much longer input that runs well past the usual sentence length"] * 8),
+]
+
+
+class InferenceBackend:
+    """Engine that turns texts into sentence embeddings.
+
+    Texts are tokenized once into content token ids (no special tokens, no
+    truncation) so the caller can bucket them by length and split long ones.
+    ``collate`` then turns a group of id lists into padded model inputs for
+    ``forward``. Tokenization is done by ``text_tokenizer``, which clients
+    can load on their own to send token ids instead of texts.
+    """
+
+    name = "base"
+    # Longest input, special tokens included, and how many of those the model adds
+    max_seq_length = 512
+    special_tokens = 0
+    # Whether the model outputs unit-length embeddings
+    normalizes = False
+    text_tokenizer: TextTokenizer
+
+    @property
+    def window(self) -> int:
+        """Get the most content tokens that fit in one input."""
+        return self.max_seq_length - self.special_tokens
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        """Tokenize texts into content token ids."""
+        return self.text_tokenizer.tokenize(texts)
+
+    def collate(self, ids: List[List[int]]) -> Dict[str, Any]:
+        """Truncate to the window, add special tokens and pad into model inputs."""
+        raise NotImplementedError
+
+    def forward(self, features: Dict[str, Any]) -> np.ndarray:
+        """Run the forward pass and return a float32 (count x dimension) array."""
+        raise NotImplementedError
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in one forward pass, truncating long ones."""
+        return self.forward(self.collate(self.tokenize(texts)))
+
+    def get_dimension(self) -> int:
+        """Get the dimension of the embeddings."""
+        raise NotImplementedError
+
+    def get_memory_bytes(self) -> int:
+        """Estimate the memory held by the model weights."""
+        raise NotImplementedError
+
+
+class StubBackend(InferenceBackend):
+    """Backend around the deterministic stub model used in benchmarks.
+
+    Words stand in for tokens: each word's id is a hash of it, so token
+    lengths, truncation and chunking behave like they would with a real
+    tokenizer, and ids made by another process (e.g. a client) match. The
+    stub vector is derived from the ids, so text and token id input agree.
+    """
+
+    name = "stub"
+    special_tokens = 2
+    normalizes = True
+
+    def __init__(self, model: StubSentenceTransformer):
+        self.model = model
+        self.max_seq_length = model.max_seq_length
+        self.text_tokenizer = WordTokenizer()
+
+    def collate(self, ids: List[List[int]]) -> Dict[str, Any]:
+        ids = [row[:self.window] for row in ids]
+        return {
+            "texts": [" ".join(map(str, row)) for row in ids],
+            "lengths": [len(row) + self.special_tokens for row in ids]
+        }
+
+    def forward(self, features: Dict[str, Any]) -> np.ndarray:
+        return self.model.forward(features)["sentence_embedding"]
+
+    def get_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def get_memory_bytes(self) -> int:
+        return self.model.memory_bytes
+
+
+class TransformersBackend(InferenceBackend):
+    """Tokenization shared by backends built from a SentenceTransformer.
+
+    Matches what the SentenceTransformer ``Transformer`` module does (strip,
+    optional lowercasing, special tokens, right padding), but keeps
+    tokenizing and padding separate.
+    """
+
+    def __init__(self, model):
+        from sentence_transformers import models
+
+        transformer = list(model)[0]
+        self.tokenizer = transformer.tokenizer
+        self.do_lower_case = transformer.do_lower_case
+        self.max_seq_length = model.max_seq_length
+        self.special_tokens = self.tokenizer.num_special_tokens_to_add(pair=False)
+        self.normalizes = any(isinstance(module, models.Normalize) for module in model)
+        self.input_names = list(self.tokenizer.model_input_names)
+        self.pad_token_id = self.tokenizer.pad_token_id or 0
+        self.text_tokenizer = HuggingFaceTokenizer(self.tokenizer, self.do_lower_case)
+
+    def collate(self, ids: List[List[int]]) -> Dict[str, Any]:
+        rows = [self.tokenizer.build_inputs_with_special_tokens(row[:self.window]) for row in ids]
+        length = max((len(row) for row in rows), default=0)
+        input_ids = np.full((len(rows), length), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), length), dtype=np.int64)
+        for i, row in enumerate(rows):
+            input_ids[i, :len(row)] = row
+            attention_mask[i, :len(row)] = 1
+
+        features = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            features["token_type_ids"] = np.zeros_like(input_ids)
+        return features
+
+
+def _state_dict_bytes(module) -> int:
+    """Sum tensor sizes in a module's state dict, including packed quantized weights."""
+    import torch
+
+    def size(value) -> int:
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(size(item) for item in value)
+        return 0
+
+    return sum(size(value) for value in module.state_dict().values())
+
+
+class TorchBackend(TransformersBackend):
+    """PyTorch SentenceTransformer forward pass."""
+
+    name = "torch"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.model = model
+
+    def forward(self, features: Dict[str, Any]) -> np.ndarray:
+        import torch
+        from sentence_transformers.util import batch_to_device
+
+        features = {name: torch.from_numpy(value) for name, value in features.items()}
+        with torch.inference_mode():
+            output = self.model.forward(batch_to_device(features, self.model.device))
+        return output["sentence_embedding"].float().cpu().numpy()
+
+    def get_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def get_memory_bytes(self) -> int:
+        return _state_dict_bytes(self.model)
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch forward pass with linear layers dynamically quantized to int8.
+
+    Weights are stored as int8 and activations are quantized on the fly, so
+    no calibration data is needed. Only runs on CPU.
+    """
+
+    name = "torch-int8"
+
+    def __init__(self, model):
+        import torch
+
+        # quantize_dynamic copies the model, leaving the float one intact for the parity check
+        quantized = torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized)
+
+
+class OnnxBackend(TransformersBackend):
+    """ONNX Runtime forward pass over the exported transformer.
+
+    The transformer is exported once to ``EMBEDDINGS_ONNX_DIR`` and reused on
+    later starts. Tokenization is shared with the torch backend, and pooling
+    and normalization are applied in NumPy the way the SentenceTransformer
+    modules do. With ``quantize=True`` the exported graph's weights are
+    dynamically quantized to int8.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model, model_name: str, quantize: bool = False):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx backends need the 'onnxruntime' package: pip install onnxruntime") from e
+        from sentence_transformers import models
+
+        modules = list(model)
+        transformer = modules[0]
+        if not isinstance(transformer, models.Transformer):
+            raise ValueError(f"Cannot export {model_name}: first module is {type(transformer).__name__}")
+        pooling = [module for module in modules if isinstance(module, models.Pooling)]
+        unsupported = [
+            type(module).__name__ for module in modules[1:]
+            if not isinstance(module, (models.Pooling, models.Normalize))
+        ]
+        if len(pooling) != 1 or unsupported:
+            raise ValueError(f"Cannot export {model_name}: unsupported modules {unsupported or 'pooling'}")
+
+        self.pooling_mode = pooling[0].get_pooling_mode_str()
+        if self.pooling_mode not in ("mean", "cls", "max"):
+            raise ValueError(f"Cannot export {model_name}: unsupported pooling mode {self.pooling_mode}")
+        super().__init__(model)
+        self.dimension = model.get_sentence_embedding_dimension()
+        if quantize:
+            self.name = "onnx-int8"
+
+        self.path = self._export(transformer, model_name, quantize)
+        options = onnxruntime.SessionOptions()
+        num_threads = get_env_int("EMBEDDINGS_TORCH_THREADS", 0)
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+        self.session_inputs = [node.name for node in self.session.get_inputs()]
+
+    def _export(self, transformer, model_name: str, quantize: bool) -> str:
+        """Export the transformer to ONNX unless a previous export exists."""
+        import torch
+
+        directory = os.path.expanduser(os.getenv("EMBEDDINGS_ONNX_DIR", "~/.cache/embeddings_service/onnx"))
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, model_name.replace("/", "__"))
+        path = f"{stem}.onnx"
+
+        if not os.path.exists(path):
+            logger.info(f"Exporting {model_name} to ONNX at {path}")
+            input_names = self.input_names
+            auto_model = transformer.auto_model.cpu().eval()
+
+            class HiddenStates(torch.nn.Module):
+                def forward(self, *inputs):
+                    return auto_model(**dict(zip(input_names, inputs)))[0]
+
+            sample = self.tokenizer(["export sample"], return_tensors="pt")
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+            torch.onnx.export(
+                HiddenStates(),
+                tuple(sample[name] for name in input_names),
+                path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        if not quantize:
+            return path
+        quantized_path = f"{stem}-int8.onnx"
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing ONNX export of {model_name} to {quantized_path}")
+            quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def forward(self, features: Dict[str, Any]) -> np.ndarray:
+        feed = {name: features[name] for name in self.session_inputs}
+        hidden = self.session.run(None, feed)[0]
+        mask = features["attention_mask"][..., None].astype(np.float32)
+
+        if self.pooling_mode == "cls":
+            pooled = hidden[:, 0]
+        elif self.pooling_mode == "max":
+            pooled = np.where(mask > 0, hidden, -1e9).max(axis=1)
+        else:
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalizes:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def get_dimension(self) -> int:
+        return self.dimension
+
+    def get_memory_bytes(self) -> int:
+        # The session holds the graph's initializers, which dominate the file size
+        return os.path.getsize(self.path)
+
+
+def create_backend(name: str, model, model_name: str) -> InferenceBackend:
+    """Build the named backend around a loaded SentenceTransformer."""
+    if name == "torch":
+        return TorchBackend(model)
+    if name == "torch-int8":
+        return QuantizedTorchBackend(model)
+    if name in ("onnx", "onnx-int8"):
+        return OnnxBackend(model, model_name, quantize=name == "onnx-int8")
+    raise ValueError(f"Unknown inference backend: {name} (expected one of {', '.join(BACKENDS)})")
+
+
+def cosine_parity(reference: InferenceBackend, candidate: InferenceBackend, texts: List[str]) -> float:
+    """Get the lowest cosine similarity between two backends' embeddings of ``texts``."""
+    expected = reference.embed(texts)
+    actual = candidate.embed(texts)
+    similarity = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return float(similarity.min())
@@ -0,0 +1,215 @@
+import asyncio
+import contextvars
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Union
+
+import numpy as np
+from src.shared.deadline import EXPIRED_REQUESTS, DeadlineExceededError, current_deadline
+from src.shared.metrics import SIZE_BUCKETS, gauge, histogram, record_stage
+from src.shared.utils import get_logger
+from .executor import InferenceExecutor, InferenceOverloadedError, REJECTED_REQUESTS
+from .scheduler import DEFAULT_PRIORITY, PriorityScheduler
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = histogram("embeddings_batch_size", "Texts per flushed micro-batch", ("model",), buckets=SIZE_BUCKETS)
+QUEUE_DEPTH = gauge("embeddings_queue_depth", "Texts waiting in the micro-batching queue", ("model",))
+QUEUE_WAIT_SECONDS = histogram(
+    "embeddings_queue_wait_seconds", "Time a text waited before its batch was flushed", ("model",)
+)
+
+
+class _PendingEmbedding:
+    """A queued text (or its token ids), the future its caller awaits, its deadline and its stage timings."""
+
+    __slots__ = ("text", "future", "deadline", "enqueued_at", "timings")
+
+    def __init__(self, text: Union[str, List[int]], future: "asyncio.Future[np.ndarray]", deadline: Optional[float] = None):
+        self.text = text
+        self.future = future
+        self.deadline = deadline
+        self.enqueued_at = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embedding requests and encodes them as one batch.
+
+    Requests are queued by ``submit`` and flushed to the inference executor
+    as soon as either ``max_batch_size`` items are waiting or the oldest item
+    has waited ``max_wait_ms``. Each caller gets back its own row of the
+    batch result. At most one batch per executor worker is in flight; while
+    they are all busy, new requests accumulate into the next batch. Once
+    ``max_queue_size`` texts are waiting, ``submit`` raises
+    :class:`InferenceOverloadedError` instead of queueing more. Texts whose
+    request deadline passes while they wait are dropped from their batch
+    before inference, failing with :class:`DeadlineExceededError`.
+
+    Each priority lane has its own queue and flush loop, and a batch only
+    holds texts of one lane. Inference slots are granted to the lanes by
+    ``scheduler``, which the model's other callers share.
+    """
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+        scheduler: Optional[PriorityScheduler] = None
+    ):
+        """Initialize the batcher around an inference executor."""
+        self.executor = executor
+        self.model_name = executor.generator.model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self.scheduler = scheduler or PriorityScheduler(executor.max_workers, model_name=self.model_name)
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._flushes: Set[asyncio.Task] = set()
+        self._batch_sizes: Counter = Counter()
+        self._batches = 0
+        self._items = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def _ensure_worker(self, lane: str) -> asyncio.Queue:
+        """Start a lane's flush loop on the running event loop if it is not running."""
+        if lane not in self._queues:
+            self._queues[lane] = asyncio.Queue(maxsize=self.max_queue_size)
+        worker = self._workers.get(lane)
+        if worker is None or worker.done():
+            # Start the loop in an empty context: it outlives the request that
+            # happens to start it, and must not carry its request id, deadline
+            # or stage timings
+            self._workers[lane] = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run(lane))
+        return self._queues[lane]
+
+    async def submit(self, text: Union[str, List[int]], priority: str = DEFAULT_PRIORITY) -> np.ndarray:
+        """Queue a text for the next batch of its priority lane and wait for its embedding.
+
+        ``text`` may also be the text's content token ids. Queue wait, tokenization and inference time are recorded as stages
+        of the calling request.
+        """
+        queue = self._ensure_worker(priority)
+        item = _PendingEmbedding(text, asyncio.get_running_loop().create_future(), current_deadline())
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            REJECTED_REQUESTS.labels("queue").inc()
+            raise InferenceOverloadedError(f"Embedding queue for {priority} requests is full")
+        QUEUE_DEPTH.labels(self.model_name).set(self.queue_depth)
+        try:
+            return await item.future
+        finally:
+            for stage, seconds in item.timings.items():
+                record_stage(stage, seconds)
+
+    async def stop(self) -> None:
+        """Stop the flush loops, dropping anything still queued."""
+        for worker in self._workers.values():
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = {}
+        self._queues = {}
+
+    async def _run(self, lane: str) -> None:
+        """Collect a lane's queued items into batches and flush them."""
+        loop = asyncio.get_running_loop()
+        queue = self._queues[lane]
+        while True:
+            batch: List[_PendingEmbedding] = [await queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Only then wait for the scheduler to give this lane an inference
+            # slot, so no slot sits idle while a batch fills; texts that
+            # arrived during the wait still join the batch
+            await self.scheduler.acquire(lane, shed=False)
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            QUEUE_DEPTH.labels(self.model_name).set(self.queue_depth)
+            task = loop.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[_PendingEmbedding]) -> None:
+        """Encode a batch and resolve every waiting caller."""
+        try:
+            await self._encode(batch)
+        finally:
+            self.scheduler.release()
+
+    async def _encode(self, batch: List[_PendingEmbedding]) -> None:
+        """Run a batch through the executor and hand each caller its row."""
+        batch = [item for item in batch if not item.future.done()]
+        now = time.monotonic()
+        for item in batch:
+            if item.deadline is not None and now >= item.deadline:
+                EXPIRED_REQUESTS.labels("embeddings", "queue").inc()
+                item.future.set_exception(DeadlineExceededError("Deadline exceeded while queued for inference"))
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            return
+
+        flushed_at = time.perf_counter()
+        for item in batch:
+            item.timings["queue"] = flushed_at - item.enqueued_at
+            QUEUE_WAIT_SECONDS.labels(self.model_name).observe(item.timings["queue"])
+        self._record(len(batch))
+
+        timings: Dict[str, float] = {}
+        try:
+            embeddings = await self.executor.run([item.text for item in batch], timings=timings)
+        except Exception as e:
+            logger.error(f"Error flushing batch of {len(batch)} texts: {str(e)}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, embedding in zip(batch, embeddings):
+            item.timings.update(timings)
+            if not item.future.done():
+                item.future.set_result(embedding)
+
+    def _record(self, size: int) -> None:
+        """Record the size of a flushed batch."""
+        self._batch_sizes[size] += 1
+        self._batches += 1
+        self._items += size
+        BATCH_SIZE.labels(self.model_name).observe(size)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the batch-size distribution achieved so far."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+            "deduplicated": self.executor.deduplicated,
+            "queue_depth": self.queue_depth,
+            "scheduler": self.scheduler.get_stats(),
+            "batch_size_histogram": {
+                str(size): count for size, count in sorted(self._batch_sizes.items())
+            }
+        }
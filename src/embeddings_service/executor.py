@@ -0,0 +1,144 @@
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import multiprocessing
+import numpy as np
+from src.shared.cache import dedupe
+from src.shared.metrics import counter, gauge
+from src.shared.utils import get_logger
+from .generator import EmbeddingGenerator
+
+logger = get_logger(__name__)
+
+PENDING_BATCHES = gauge(
+    "embeddings_executor_pending", "Batches queued or running in the inference executor", ("model",)
+)
+REJECTED_REQUESTS = counter("embeddings_rejected_total", "Requests rejected because inference is saturated", ("reason",))
+DEDUPLICATED_TEXTS = counter(
+    "embeddings_deduplicated_texts_total", "Duplicate texts in a batch answered without running the model", ("model",)
+)
+
+
+class InferenceOverloadedError(Exception):
+    """Raised when inference is saturated and new work should be shed."""
+
+
+# Generator owned by each process-pool worker
+_worker_generator: Optional[EmbeddingGenerator] = None
+
+
+def _init_worker(model_name: str) -> None:
+    """Load the model once in a process-pool worker."""
+    global _worker_generator
+    _worker_generator = EmbeddingGenerator(model_name)
+
+
+def _encode_in_worker(texts: List[str], batch_size: Optional[int]) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Encode a batch in a process-pool worker, returning the stage timings too."""
+    timings: Dict[str, float] = {}
+    embeddings = _worker_generator.generate_embeddings_batch(texts, batch_size=batch_size, timings=timings)
+    return embeddings, timings
+
+
+class InferenceExecutor:
+    """Runs CPU-bound inference off the event loop with bounded admission.
+
+    ``kind="thread"`` runs the shared generator in a thread pool (torch
+    releases the GIL during the forward pass). ``kind="process"`` starts
+    worker processes that each load their own copy of the model; their
+    encode metrics stay in the workers. At most ``max_pending`` batches may
+    be queued or running; beyond that ``run`` raises
+    :class:`InferenceOverloadedError` so callers can shed load. Texts that
+    normalize to the same string are encoded once per batch and the row is
+    copied back to every position.
+    """
+
+    def __init__(
+        self,
+        generator: EmbeddingGenerator,
+        kind: str = "thread",
+        max_workers: int = 1,
+        max_pending: int = 16
+    ):
+        """Initialize the executor around an embedding generator."""
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.generator = generator
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self._pending = 0
+        self.deduplicated = 0
+        self._pool: Optional[Executor] = None
+
+    def _get_pool(self) -> Executor:
+        """Create the worker pool on first use."""
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.generator.model_name,)
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            logger.info(f"Started {self.kind} inference executor with {self.max_workers} workers")
+        return self._pool
+
+    @property
+    def saturated(self) -> bool:
+        return self._pending >= self.max_pending
+
+    async def run(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """Encode a batch in the pool without blocking the event loop."""
+        if self.saturated:
+            REJECTED_REQUESTS.labels("executor").inc()
+            raise InferenceOverloadedError("Inference executor is saturated")
+
+        unique, inverse = dedupe(texts)
+        if len(unique) == len(texts):
+            return await self._run(texts, batch_size, timings)
+        duplicates = len(texts) - len(unique)
+        self.deduplicated += duplicates
+        DEDUPLICATED_TEXTS.labels(self.generator.model_name).inc(duplicates)
+        return (await self._run(unique, batch_size, timings))[inverse]
+
+    async def _run(
+        self,
+        texts: List[str],
+        batch_size: Optional[int],
+        timings: Optional[Dict[str, float]]
+    ) -> np.ndarray:
+        """Encode distinct texts in the pool."""
+        self._pending += 1
+        PENDING_BATCHES.labels(self.generator.model_name).set(self._pending)
+        loop = asyncio.get_running_loop()
+        try:
+            if self.kind == "process":
+                embeddings, worker_timings = await loop.run_in_executor(
+                    self._get_pool(), _encode_in_worker, texts, batch_size
+                )
+                if timings is not None:
+                    timings.update(worker_timings)
+                return embeddings
+            return await loop.run_in_executor(
+                self._get_pool(),
+                functools.partial(self.generator.generate_embeddings_batch, texts, batch_size, timings)
+            )
+        finally:
+            self._pending -= 1
+            PENDING_BATCHES.labels(self.generator.model_name).set(self._pending)
+
+    def shutdown(self) -> None:
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,29 +1,282 @@
 from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional, Dict, Sequence, Tuple, Union
+import bisect
+import hashlib
+import os
+import time
 import numpy as np
-from src.shared.utils import get_logger
+from src.shared.metrics import counter, histogram
+from src.shared.utils import get_logger, get_env_int, get_env_bool, get_env_float
+from src.embeddings_service.backends import (
+    PARITY_TEXTS, StubBackend, TorchBackend, cosine_parity, create_backend
+)
+from src.embeddings_service.stub import StubSentenceTransformer
 
 logger = get_logger(__name__)
 
+ENCODE_SECONDS = histogram("embeddings_encode_seconds", "Time spent encoding a batch", ("model",))
+TOKENIZE_SECONDS = histogram("embeddings_tokenize_seconds", "Time spent tokenizing a batch", ("model",))
+INFERENCE_SECONDS = histogram("embeddings_inference_seconds", "Time spent in the model forward pass", ("model",))
+TOKENS = counter("embeddings_tokens_total", "Tokens sent through the model, real or padding", ("model", "kind"))
+LONG_TEXTS = counter("embeddings_long_texts_total", "Texts longer than the model's max sequence length", ("model", "action"))
+
+LONG_TEXT_MODES = ("truncate", "chunk")
+
+
+def configure_torch_threads(num_threads: int) -> None:
+    """Pin torch intra-op threads for this process to avoid CPU oversubscription."""
+    import torch
+    
+    torch.set_num_threads(num_threads)
+    logger.info(f"Using {num_threads} torch intra-op threads")
+
+
+def resolve_model_path(model_name: str) -> str:
+    """Prefer a pre-baked local copy of the model over the HuggingFace cache.
+
+    Models baked with ``deployment/bake_model.py`` live under
+    ``EMBEDDINGS_MODEL_DIR`` as safetensors, which are memory-mapped on load.
+    """
+    model_dir = os.getenv("EMBEDDINGS_MODEL_DIR")
+    if model_dir:
+        path = os.path.join(model_dir, model_name.replace("/", "__"))
+        if os.path.isdir(path):
+            return path
+        logger.warning(f"No baked artifact for {model_name} in {model_dir}, falling back to the HuggingFace cache")
+    return model_name
+
+
+def config_fingerprint(model_names: Sequence[str]) -> str:
+    """Identify the settings that change the vectors the given models produce.
+
+    Covers the backend, sequence length and long-text handling, and the
+    revision of each model: the files of a baked artifact (re-baking changes
+    it) or the model name otherwise. Vectors cached under a different
+    fingerprint must not be served.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    settings = [
+        os.getenv("EMBEDDINGS_BACKEND", "torch"),
+        str(get_env_bool("EMBEDDINGS_STUB_MODEL", False)),
+        str(get_env_int("EMBEDDINGS_MAX_SEQ_LENGTH", 0)),
+        os.getenv("EMBEDDINGS_LONG_TEXT", "truncate"),
+        str(get_env_int("EMBEDDINGS_CHUNK_OVERLAP", 32)),
+        str(get_env_int("EMBEDDINGS_MAX_CHUNKS", 16)),
+    ]
+    for model_name in sorted(model_names):
+        path = resolve_model_path(model_name)
+        settings.append(model_name)
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    stat = os.stat(file_path)
+                    settings.append(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    for setting in settings:
+        digest.update(setting.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
 
 class EmbeddingGenerator:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        """Initialize the embedding generator with a pre-trained model."""
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: Optional[str] = None):
+        """Initialize the embedding generator with a pre-trained model.
+
+        ``backend`` (default ``EMBEDDINGS_BACKEND``, else ``torch``) picks the
+        inference engine; see ``backends.BACKENDS``.
+        """
         self.model_name = model_name
-        logger.info(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        backend = backend or os.getenv("EMBEDDINGS_BACKEND", "torch")
+        
+        num_threads = get_env_int("EMBEDDINGS_TORCH_THREADS", 0)
+        if num_threads > 0:
+            configure_torch_threads(num_threads)
+        
+        if get_env_bool("EMBEDDINGS_STUB_MODEL", False):
+            logger.info(f"Using stub embedding model in place of: {model_name}")
+            self.backend = StubBackend(StubSentenceTransformer(model_name))
+        else:
+            model_path = resolve_model_path(model_name)
+            logger.info(f"Loading embedding model: {model_name} from {model_path} ({backend} backend)")
+            model = SentenceTransformer(model_path)
+            self.backend = create_backend(backend, model, model_name)
+            if backend != "torch":
+                self._check_parity(TorchBackend(model))
+        
+        max_seq_length = get_env_int("EMBEDDINGS_MAX_SEQ_LENGTH", 0)
+        if max_seq_length > 0:
+            self.backend.max_seq_length = min(max_seq_length, self.backend.max_seq_length)
+        
+        # Texts are grouped into batches by token length, bounded by these edges
+        # (special tokens included) and by a padded-token budget per forward pass
+        self.length_buckets = sorted(
+            int(edge) for edge in os.getenv("EMBEDDINGS_LENGTH_BUCKETS", "16,32,64,128,256").split(",") if edge
+        )
+        self.max_batch_tokens = get_env_int("EMBEDDINGS_MAX_BATCH_TOKENS", 16384)
+        
+        # Texts over the max sequence length are truncated, or split into
+        # overlapping windows whose embeddings are mean-pooled
+        self.long_text_mode = os.getenv("EMBEDDINGS_LONG_TEXT", "truncate")
+        if self.long_text_mode not in LONG_TEXT_MODES:
+            raise ValueError(f"EMBEDDINGS_LONG_TEXT must be one of {', '.join(LONG_TEXT_MODES)}")
+        self.chunk_overlap = min(get_env_int("EMBEDDINGS_CHUNK_OVERLAP", 32), self.backend.window // 2)
+        self.max_chunks = max(get_env_int("EMBEDDINGS_MAX_CHUNKS", 16), 1)
         logger.info(f"Model {model_name} loaded successfully")
     
+    def _check_parity(self, reference: TorchBackend) -> None:
+        """Refuse to serve a backend whose output drifts too far from torch."""
+        min_cosine = get_env_float("EMBEDDINGS_PARITY_MIN_COSINE", 0.99)
+        similarity = cosine_parity(reference, self.backend, PARITY_TEXTS)
+        logger.info(f"{self.backend.name} backend parity with torch: min cosine {similarity:.5f}")
+        if similarity < min_cosine:
+            raise RuntimeError(
+                f"{self.backend.name} backend for {self.model_name} failed the parity check: "
+                f"min cosine {similarity:.5f} < {min_cosine}"
+            )
+    
     def generate_embeddings(self, text: str) -> List[float]:
         """Generate embeddings for the given text."""
         try:
-            logger.info(f"Generating embeddings for text: {text[:50]}...")
-            embeddings = self.model.encode([text])
+            logger.info("Generating embeddings for text: %.50s...", text)
+            embeddings = self.generate_embeddings_batch([text])
             return embeddings[0].tolist()
         except Exception as e:
             logger.error(f"Error generating embeddings: {str(e)}")
             raise
     
+    @property
+    def tokenizer_fingerprint(self) -> str:
+        """Identify the tokenizer that pre-tokenized input must come from."""
+        return self.backend.text_tokenizer.fingerprint
+    
+    def generate_embeddings_batch(
+        self,
+        texts: Sequence[Union[str, Sequence[int]]],
+        batch_size: Optional[int] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """Generate embeddings for a batch of texts, in input order.
+
+        Texts are tokenized once, then grouped by token length so each
+        forward pass pads only to the longest text in its own bucket. Inputs
+        may also be content token ids from this model's tokenizer (see
+        ``tokenizer_fingerprint``), which skip tokenization.
+        ``batch_size`` caps how many inputs go through the model per forward
+        pass; by default only the buckets and ``max_batch_tokens`` split the
+        batch. Tokenization and inference are timed separately, and when
+        ``timings`` is given the seconds spent in each are added to it.
+        """
+        try:
+            logger.info("Generating embeddings for batch of %d texts", len(texts), extra={"texts": len(texts)})
+            started = time.perf_counter()
+            segments, owners = self._segment(self._token_ids(texts))
+            tokenize_seconds = time.perf_counter() - started
+            inference_seconds = 0.0
+            
+            outputs = np.empty((len(segments), self.get_dimension()), dtype=np.float32)
+            for indices in self._plan_batches([len(segment) for segment in segments], batch_size):
+                started = time.perf_counter()
+                features = self.backend.collate([segments[i] for i in indices])
+                collated = time.perf_counter()
+                outputs[indices] = self.backend.forward(features)
+                
+                tokenize_seconds += collated - started
+                inference_seconds += time.perf_counter() - collated
+            
+            embeddings = self._pool(outputs, segments, owners, len(texts))
+            
+            TOKENIZE_SECONDS.labels(self.model_name).observe(tokenize_seconds)
+            INFERENCE_SECONDS.labels(self.model_name).observe(inference_seconds)
+            ENCODE_SECONDS.labels(self.model_name).observe(tokenize_seconds + inference_seconds)
+            if timings is not None:
+                timings["tokenize"] = timings.get("tokenize", 0.0) + tokenize_seconds
+                timings["inference"] = timings.get("inference", 0.0) + inference_seconds
+            return embeddings
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {str(e)}")
+            raise
+    
+    def _token_ids(self, inputs: Sequence[Union[str, Sequence[int]]]) -> List[List[int]]:
+        """Tokenize the texts among the inputs, passing pre-tokenized ones through."""
+        texts = [i for i, item in enumerate(inputs) if isinstance(item, str)]
+        if len(texts) == len(inputs):
+            return self.backend.tokenize(list(inputs))
+        ids = [list(item) if not isinstance(item, str) else [] for item in inputs]
+        self.backend.text_tokenizer.check_ids(ids)
+        for i, row in zip(texts, self.backend.tokenize([inputs[i] for i in texts]) if texts else []):
+            ids[i] = row
+        return ids
+    
+    def _segment(self, ids: List[List[int]]) -> Tuple[List[List[int]], np.ndarray]:
+        """Split token ids into model inputs, returning them with the index of the text each came from."""
+        window = self.backend.window
+        stride = window - self.chunk_overlap
+        segments = []
+        owners = []
+        for owner, row in enumerate(ids):
+            if len(row) <= window:
+                segments.append(row)
+                owners.append(owner)
+                continue
+            
+            if self.long_text_mode == "truncate":
+                LONG_TEXTS.labels(self.model_name, "truncated").inc()
+                segments.append(row[:window])
+                owners.append(owner)
+                continue
+            
+            LONG_TEXTS.labels(self.model_name, "chunked").inc()
+            for start in range(0, self.max_chunks * stride, stride):
+                segments.append(row[start:start + window])
+                owners.append(owner)
+                if start + window >= len(row):
+                    break
+        return segments, np.asarray(owners, dtype=np.int64)
+    
+    def _plan_batches(self, lengths: List[int], batch_size: Optional[int] = None) -> List[np.ndarray]:
+        """Group inputs into forward passes of similar token length."""
+        special = self.backend.special_tokens
+        batches = []
+        current = []
+        current_bucket = padded_length = None
+        for i in np.argsort([-length for length in lengths], kind="stable"):
+            length = lengths[i] + special
+            bucket = bisect.bisect_left(self.length_buckets, length)
+            if current:
+                full = bool(batch_size) and len(current) >= batch_size
+                over_budget = self.max_batch_tokens > 0 and (len(current) + 1) * padded_length > self.max_batch_tokens
+                if bucket != current_bucket or full or over_budget:
+                    batches.append(np.asarray(current))
+                    current = []
+            if not current:
+                # Longest first, so the first input sets the batch's padded length
+                current_bucket, padded_length = bucket, length
+            current.append(i)
+        if current:
+            batches.append(np.asarray(current))
+        
+        real = sum(lengths) + special * len(lengths)
+        padded = sum(len(batch) * (lengths[batch[0]] + special) for batch in batches)
+        TOKENS.labels(self.model_name, "real").inc(real)
+        TOKENS.labels(self.model_name, "padding").inc(padded - real)
+        return batches
+    
+    def _pool(self, outputs: np.ndarray, segments: List[List[int]], owners: np.ndarray, count: int) -> np.ndarray:
+        """Mean-pool window embeddings back into one row per text, weighted by token count."""
+        if len(outputs) == count:
+            return outputs
+        weights = np.asarray([max(len(segment), 1) for segment in segments], dtype=np.float32)
+        embeddings = np.zeros((count, outputs.shape[1]), dtype=np.float32)
+        np.add.at(embeddings, owners, outputs * weights[:, None])
+        embeddings /= np.bincount(owners, weights=weights, minlength=count)[:, None].astype(np.float32)
+        if self.backend.normalizes:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+    
+    def get_memory_bytes(self) -> int:
+        """Estimate the memory held by the model weights."""
+        return self.backend.get_memory_bytes()
+    
     def get_dimension(self) -> int:
         """Get the dimension of the embeddings."""
-        return self.model.get_sentence_embedding_dimension()
+        return self.backend.get_dimension()
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+from src.shared.metrics import callback_metric, counter
+from src.shared.utils import get_logger
+from .batcher import EmbeddingBatcher
+from .executor import InferenceExecutor
+from .generator import EmbeddingGenerator
+
+logger = get_logger(__name__)
+
+MODEL_LOADS = counter("embeddings_model_loads_total", "Models loaded into the registry", ("model",))
+MODEL_EVICTIONS = counter("embeddings_model_evictions_total", "Models evicted from the registry", ("model",))
+LOADED_MODEL_BYTES = callback_metric("embeddings_loaded_model_bytes", "Estimated memory held by loaded models")
+
+
+class UnknownModelError(Exception):
+    """Raised when a request names a model the service does not serve."""
+
+
+class ModelPipeline:
+    """A loaded model together with its own inference executor and micro-batcher."""
+
+    def __init__(self, generator: EmbeddingGenerator, executor: InferenceExecutor, batcher: EmbeddingBatcher):
+        self.generator = generator
+        self.executor = executor
+        self.batcher = batcher
+        self.memory_bytes = generator.get_memory_bytes()
+        self.active = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def model_name(self) -> str:
+        return self.generator.model_name
+
+    async def close(self) -> None:
+        """Stop batching and inference for this model."""
+        await self.batcher.stop()
+        self.executor.shutdown()
+
+
+class ModelRegistry:
+    """Lazily loads embedding models and evicts the least recently used ones.
+
+    Only models in ``allowed_models`` can be loaded; anything else raises
+    :class:`UnknownModelError`. Models are loaded on first use (in a thread,
+    so the event loop keeps serving) and share their weights across the
+    executor's threads. When the estimated memory of loaded models exceeds
+    ``memory_budget_bytes``, idle models are evicted least recently used
+    first. A model that is serving requests is never evicted.
+    """
+
+    def __init__(
+        self,
+        allowed_models: Iterable[str],
+        default_model: str,
+        memory_budget_bytes: int,
+        build_pipeline: Callable[[str], ModelPipeline]
+    ):
+        """Initialize the registry; ``build_pipeline`` loads one model."""
+        self.default_model = default_model
+        self.allowed_models = set(allowed_models) | {default_model}
+        self.memory_budget_bytes = memory_budget_bytes
+        self._build_pipeline = build_pipeline
+        self._pipelines: "OrderedDict[str, ModelPipeline]" = OrderedDict()
+        self._loading: Dict[str, "asyncio.Future[ModelPipeline]"] = {}
+        LOADED_MODEL_BYTES.add(lambda: self.loaded_bytes)
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(pipeline.memory_bytes for pipeline in self._pipelines.values())
+
+    def resolve(self, model_name: Optional[str]) -> str:
+        """Map a requested model name to a served one, rejecting unknown names."""
+        model_name = model_name or self.default_model
+        if model_name not in self.allowed_models:
+            raise UnknownModelError(f"Unknown model: {model_name}")
+        return model_name
+
+    def preload(self, model_name: Optional[str] = None) -> ModelPipeline:
+        """Load a model synchronously, e.g. before serving starts."""
+        model_name = self.resolve(model_name)
+        pipeline = self._pipelines.get(model_name)
+        if pipeline is None:
+            pipeline = self._add(self._build_pipeline(model_name))
+        return pipeline
+
+    def _add(self, pipeline: ModelPipeline) -> ModelPipeline:
+        """Register a freshly loaded pipeline."""
+        self._pipelines[pipeline.model_name] = pipeline
+        MODEL_LOADS.labels(pipeline.model_name).inc()
+        logger.info(f"Registered model {pipeline.model_name} ({pipeline.memory_bytes / 2**20:.0f} MiB)")
+        return pipeline
+
+    async def get(self, model_name: Optional[str] = None) -> ModelPipeline:
+        """Get the pipeline for a model, loading it on first use."""
+        model_name = self.resolve(model_name)
+        pipeline = self._pipelines.get(model_name)
+        if pipeline is not None:
+            self._pipelines.move_to_end(model_name)
+            pipeline.last_used = time.monotonic()
+            return pipeline
+
+        loading = self._loading.get(model_name)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        loop = asyncio.get_running_loop()
+        loading = self._loading[model_name] = loop.create_future()
+        try:
+            logger.info(f"Lazily loading model {model_name}")
+            pipeline = self._add(await loop.run_in_executor(None, self._build_pipeline, model_name))
+            await self._evict(keep=model_name)
+            loading.set_result(pipeline)
+            return pipeline
+        except Exception as e:
+            loading.set_exception(e)
+            # Mark the exception retrieved in case nobody else was waiting
+            loading.exception()
+            raise
+        finally:
+            self._loading.pop(model_name, None)
+
+    @asynccontextmanager
+    async def use(self, model_name: Optional[str] = None) -> AsyncIterator[ModelPipeline]:
+        """Hold a model's pipeline for the duration of a request so it is not evicted."""
+        pipeline = await self.get(model_name)
+        pipeline.active += 1
+        try:
+            yield pipeline
+        finally:
+            pipeline.active -= 1
+
+    async def _evict(self, keep: str) -> None:
+        """Evict idle models, least recently used first, until within the memory budget."""
+        while self.loaded_bytes > self.memory_budget_bytes:
+            victim = next(
+                (pipeline for name, pipeline in self._pipelines.items() if name != keep and pipeline.active == 0),
+                None
+            )
+            if victim is None:
+                logger.warning(
+                    f"Loaded models use {self.loaded_bytes / 2**20:.0f} MiB, over the "
+                    f"{self.memory_budget_bytes / 2**20:.0f} MiB budget, but none can be evicted"
+                )
+                return
+            del self._pipelines[victim.model_name]
+            MODEL_EVICTIONS.labels(victim.model_name).inc()
+            logger.info(f"Evicting model {victim.model_name} to stay within the memory budget")
+            await victim.close()
+
+    async def shutdown(self) -> None:
+        """Stop every loaded pipeline."""
+        for pipeline in list(self._pipelines.values()):
+            await pipeline.close()
+        self._pipelines.clear()
+
+    def loaded(self) -> Dict[str, ModelPipeline]:
+        """Get the currently loaded pipelines, least recently used first."""
+        return dict(self._pipelines)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe loaded and available models."""
+        return {
+            "default_model": self.default_model,
+            "available_models": sorted(self.allowed_models),
+            "memory_budget_mb": self.memory_budget_bytes / 2**20,
+            "loaded_mb": self.loaded_bytes / 2**20,
+            "loaded_models": [
+                {
+                    "model_name": name,
+                    "dimension": pipeline.generator.get_dimension(),
+                    "memory_mb": pipeline.memory_bytes / 2**20,
+                    "active_requests": pipeline.active,
+                    "idle_seconds": time.monotonic() - pipeline.last_used
+                }
+                for name, pipeline in self._pipelines.items()
+            ]
+        }
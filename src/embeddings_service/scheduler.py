@@ -0,0 +1,232 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+from src.shared.metrics import counter, gauge, histogram
+from src.shared.utils import get_logger, get_env_int
+from .executor import InferenceOverloadedError, REJECTED_REQUESTS
+
+logger = get_logger(__name__)
+
+# Request classes, highest priority first
+PRIORITIES = ("interactive", "bulk")
+DEFAULT_PRIORITY = "interactive"
+DEFAULT_WEIGHTS = {"interactive": 8, "bulk": 1}
+POLICIES = ("weighted", "strict")
+
+LANE_WAITING = gauge("embeddings_lane_waiting", "Batches waiting for an inference slot", ("model", "lane"))
+LANE_WAIT_SECONDS = histogram(
+    "embeddings_lane_wait_seconds", "Time a batch waited for an inference slot", ("model", "lane")
+)
+LANE_DISPATCHED = counter("embeddings_lane_dispatched_total", "Batches granted an inference slot", ("model", "lane"))
+TENANT_ACTIVE = gauge("embeddings_tenant_active_requests", "Requests in flight for tenants with a quota")
+
+
+class TenantQuotaExceededError(Exception):
+    """Raised when a tenant already has as many requests in flight as its quota allows."""
+
+
+def parse_mapping(value: str) -> Dict[str, str]:
+    """Parse ``name=value,name=value`` settings."""
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {name.strip(): setting.strip() for name, setting in pairs}
+
+
+class PriorityScheduler:
+    """Hands out a model's inference slots to per-priority lanes.
+
+    Every batch acquires one of ``slots`` slots (one per executor worker)
+    before it runs. When none is free, batches wait in a queue per lane and
+    each freed slot goes to the next lane chosen by ``policy``: ``strict``
+    always serves the highest-priority waiting lane, ``weighted`` shares the
+    slots between waiting lanes in proportion to ``weights`` (smooth
+    weighted round-robin), so bulk work keeps progressing under interactive
+    load. Once ``max_waiting`` batches are waiting, sheddable acquires raise
+    :class:`InferenceOverloadedError`.
+    """
+
+    def __init__(
+        self,
+        slots: int = 1,
+        policy: str = "weighted",
+        weights: Optional[Dict[str, int]] = None,
+        max_waiting: int = 16,
+        model_name: str = ""
+    ):
+        """Initialize the scheduler with ``slots`` free slots."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.slots = max(1, slots)
+        self.policy = policy
+        self.weights = {lane: max(1, (weights or DEFAULT_WEIGHTS).get(lane, 1)) for lane in PRIORITIES}
+        self.max_waiting = max(1, max_waiting)
+        self.model_name = model_name
+        self._free = self.slots
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in PRIORITIES}
+        self._credits = {lane: 0 for lane in PRIORITIES}
+        self._dispatched = {lane: 0 for lane in PRIORITIES}
+
+    @classmethod
+    def from_env(cls, prefix: str, slots: int, max_waiting: int, model_name: str = "") -> "PriorityScheduler":
+        """Build a scheduler from ``<prefix>_SCHEDULING`` and ``<prefix>_LANE_WEIGHTS``."""
+        weights = parse_mapping(os.getenv(f"{prefix}_LANE_WEIGHTS", ""))
+        return cls(
+            slots=slots,
+            policy=os.getenv(f"{prefix}_SCHEDULING", "weighted"),
+            weights={**DEFAULT_WEIGHTS, **{lane: int(weight) for lane, weight in weights.items()}},
+            max_waiting=max_waiting,
+            model_name=model_name
+        )
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def acquire(self, lane: str, shed: bool = True) -> None:
+        """Wait until ``lane`` is granted an inference slot.
+
+        With ``shed`` set, raises :class:`InferenceOverloadedError` instead
+        of waiting when too many batches are already waiting.
+        """
+        started = time.perf_counter()
+        if self._free > 0 and not self.waiting:
+            self._free -= 1
+            self._granted(lane, started)
+            return
+        if shed and self.waiting >= self.max_waiting:
+            REJECTED_REQUESTS.labels("lane").inc()
+            raise InferenceOverloadedError(f"Too many {lane} batches waiting for inference")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(waiter)
+        LANE_WAITING.labels(self.model_name, lane).set(len(self._waiters[lane]))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the caller gave up: pass the slot on
+                self.release()
+            elif waiter in self._waiters[lane]:
+                self._waiters[lane].remove(waiter)
+                LANE_WAITING.labels(self.model_name, lane).set(len(self._waiters[lane]))
+            raise
+        self._granted(lane, started)
+
+    def release(self) -> None:
+        """Return a slot, handing it to the next waiting lane if there is one."""
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._free = min(self._free + 1, self.slots)
+                return
+            waiter = self._waiters[lane].popleft()
+            LANE_WAITING.labels(self.model_name, lane).set(len(self._waiters[lane]))
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def _next_lane(self) -> Optional[str]:
+        """Pick the lane that gets the next free slot."""
+        ready = [lane for lane in PRIORITIES if self._waiters[lane]]
+        if len(ready) <= 1 or self.policy == "strict":
+            return ready[0] if ready else None
+        total = 0
+        for lane in ready:
+            self._credits[lane] += self.weights[lane]
+            total += self.weights[lane]
+        chosen = max(ready, key=self._credits.__getitem__)
+        self._credits[chosen] -= total
+        return chosen
+
+    def _granted(self, lane: str, started: float) -> None:
+        self._dispatched[lane] += 1
+        LANE_DISPATCHED.labels(self.model_name, lane).inc()
+        LANE_WAIT_SECONDS.labels(self.model_name, lane).observe(time.perf_counter() - started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe slot usage and each lane's backlog."""
+        return {
+            "policy": self.policy,
+            "slots": self.slots,
+            "free_slots": self._free,
+            "lanes": {
+                lane: {
+                    "weight": self.weights[lane],
+                    "waiting": len(self._waiters[lane]),
+                    "dispatched": self._dispatched[lane]
+                }
+                for lane in PRIORITIES
+            }
+        }
+
+
+class TenantQuotas:
+    """Caps the requests each tenant may have in flight at once.
+
+    Tenants get ``default_limit`` concurrent requests unless ``limits``
+    overrides theirs; 0 means unlimited. Requests without a tenant are not
+    limited. A request over its tenant's quota raises
+    :class:`TenantQuotaExceededError` straight away rather than queueing, so
+    one tenant's backfill cannot fill the queues in front of the model.
+    """
+
+    def __init__(self, default_limit: int = 0, limits: Optional[Dict[str, int]] = None):
+        self.default_limit = default_limit
+        self.limits = dict(limits or {})
+        self._active: Dict[str, int] = {}
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "TenantQuotas":
+        """Build quotas from ``<prefix>_TENANT_MAX_CONCURRENCY`` and ``<prefix>_TENANT_QUOTAS``."""
+        return cls(
+            default_limit=get_env_int(f"{prefix}_TENANT_MAX_CONCURRENCY", 0),
+            limits={
+                tenant: int(limit) for tenant, limit in parse_mapping(os.getenv(f"{prefix}_TENANT_QUOTAS", "")).items()
+            }
+        )
+
+    def limit(self, tenant: str) -> int:
+        return self.limits.get(tenant, self.default_limit)
+
+    def acquire(self, tenant: Optional[str]) -> None:
+        """Count a request against its tenant's quota, or raise if the quota is used up."""
+        if not tenant or self.limit(tenant) <= 0:
+            return
+        active = self._active.get(tenant, 0)
+        if active >= self.limit(tenant):
+            self.rejected += 1
+            REJECTED_REQUESTS.labels("tenant_quota").inc()
+            raise TenantQuotaExceededError(f"Tenant {tenant} has {active} requests in flight, its quota")
+        self._active[tenant] = active + 1
+        TENANT_ACTIVE.inc()
+
+    def release(self, tenant: Optional[str]) -> None:
+        """Return a request's place in its tenant's quota."""
+        if not tenant or tenant not in self._active:
+            return
+        self._active[tenant] -= 1
+        if not self._active[tenant]:
+            del self._active[tenant]
+        TENANT_ACTIVE.dec()
+
+    @contextmanager
+    def hold(self, tenant: Optional[str]) -> Iterator[None]:
+        """Hold a place in a tenant's quota for the duration of a request."""
+        self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe quotas and per-tenant requests in flight."""
+        return {
+            "default_limit": self.default_limit,
+            "limits": self.limits,
+            "active": dict(self._active),
+            "rejected": self.rejected
+        }
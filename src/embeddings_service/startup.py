@@ -0,0 +1,79 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from src.shared.metrics import callback_metric, gauge
+from src.shared.utils import get_logger
+
+logger = get_logger(__name__)
+
+STARTUP_SECONDS = gauge("embeddings_startup_seconds", "Time spent in each startup phase", ("phase",))
+READY = callback_metric("embeddings_ready", "Whether the service has finished warming up")
+
+
+def process_age() -> Optional[float]:
+    """Get seconds since this process started, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces, so split after its closing parenthesis
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupState:
+    """Tracks startup phases and whether the service is ready for traffic.
+
+    The service is live as soon as it answers HTTP, and ready only once its
+    models are loaded and warmed up. Each phase's duration is kept for
+    ``/ready`` and exported as ``embeddings_startup_seconds{phase}``; the
+    ``boot`` phase covers interpreter start and imports, ``total`` runs from
+    process start until ready.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        boot = process_age()
+        if boot is not None:
+            self._record("boot", boot)
+        self._started = time.perf_counter() - (boot or 0.0)
+        READY.add(lambda: float(self.ready))
+
+    def _record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        STARTUP_SECONDS.labels(name).set(seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time one startup phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - started)
+
+    def mark_ready(self) -> None:
+        """Record the total startup time and start admitting traffic."""
+        self._record("total", time.perf_counter() - self._started)
+        self.ready = True
+        timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        logger.info(f"Ready to serve ({timings})")
+
+    def mark_failed(self, error: Exception) -> None:
+        """Record a startup failure; the service stays unready."""
+        self.error = str(error)
+        logger.error(f"Startup failed: {self.error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe readiness and startup phase timings."""
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "startup_seconds": dict(self.phases)
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+import numpy as np
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.shared.metrics import counter
+from src.shared.utils import get_logger
+from .executor import InferenceOverloadedError
+
+logger = get_logger(__name__)
+
+STREAMED_TEXTS = counter("embeddings_stream_texts_total", "Lines handled by the streaming endpoint", ("outcome",))
+
+
+class NdjsonStreamingResponse(StreamingResponse):
+    """Streaming response that can be sent while the request body is still being read.
+
+    Starlette's ``StreamingResponse`` consumes ``receive`` to watch for
+    client disconnects, which would swallow request body chunks. Here the
+    request body reader owns ``receive``; a disconnect ends the body, which
+    ends the stream. ``on_close`` runs once the response is done with, even
+    if sending failed before the body was iterated.
+    """
+
+    def __init__(self, *args: Any, on_close: Optional[Callable[[], None]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """Split a chunked body into lines, yielding None in place of lines over ``max_line_bytes``."""
+    buffer = bytearray()
+    discarding = False
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            if discarding:
+                discarding = False
+            else:
+                yield line if len(line) <= max_line_bytes else None
+        if not discarding and len(buffer) > max_line_bytes:
+            # Report the oversized line now and drop the rest of it as it arrives
+            discarding = True
+            yield None
+        if discarding:
+            buffer.clear()
+    if buffer and not discarding:
+        yield bytes(buffer)
+
+
+def parse_line(line: bytes) -> Tuple[Any, str]:
+    """Parse one NDJSON input line: a JSON string, or an object with ``text`` and optional ``id``."""
+    item = json.loads(line)
+    if isinstance(item, str):
+        return None, item
+    if isinstance(item, dict) and isinstance(item.get("text"), str):
+        return item.get("id"), item["text"]
+    raise ValueError('expected a JSON string or an object with a "text" string')
+
+
+async def _embed_when_admitted(embed: Callable[[str], Awaitable[np.ndarray]], text: str) -> np.ndarray:
+    """Embed one text, waiting out overload instead of failing the stream."""
+    delay = 0.01
+    while True:
+        try:
+            return await embed(text)
+        except InferenceOverloadedError:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+
+def _output_line(index: int, item_id: Any, **fields: Any) -> bytes:
+    """Encode one NDJSON output line."""
+    item = {"index": index}
+    if item_id is not None:
+        item["id"] = item_id
+    item.update(fields)
+    return json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+async def embed_stream(
+    lines: AsyncIterator[Optional[bytes]],
+    embed: Callable[[str], Awaitable[np.ndarray]],
+    window: int
+) -> AsyncIterator[bytes]:
+    """Embed NDJSON input lines and yield NDJSON output lines in input order.
+
+    Texts are submitted as soon as they are read, so the micro-batcher
+    groups them, but at most ``window`` are in flight: once that many are
+    waiting to be written out, reading the request body pauses. Memory stays
+    bounded however long the stream is and however slowly the client reads.
+    Bad lines get an ``error`` line instead of failing the stream.
+    """
+    pending: "asyncio.Queue[Optional[Tuple[int, Any, Any]]]" = asyncio.Queue(maxsize=window)
+
+    async def produce() -> None:
+        index = 0
+        try:
+            async for line in lines:
+                if line is not None and not line.strip():
+                    continue
+                item_id = None
+                try:
+                    if line is None:
+                        raise ValueError("line too long")
+                    item_id, text = parse_line(line)
+                    result: Any = asyncio.ensure_future(_embed_when_admitted(embed, text))
+                except ValueError as e:
+                    result = e
+                await pending.put((index, item_id, result))
+                index += 1
+        except Exception:
+            # Reading the body failed (e.g. the client went away): end the stream, then re-raise
+            await pending.put(None)
+            raise
+        await pending.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            entry = await pending.get()
+            if entry is None:
+                break
+            index, item_id, result = entry
+            if isinstance(result, Exception):
+                STREAMED_TEXTS.labels("invalid").inc()
+                yield _output_line(index, item_id, error=str(result))
+                continue
+            try:
+                embedding = await result
+            except Exception as e:
+                logger.error(f"Error embedding streamed line {index}: {str(e)}")
+                STREAMED_TEXTS.labels("error").inc()
+                yield _output_line(index, item_id, error=str(e))
+                continue
+            STREAMED_TEXTS.labels("embedded").inc()
+            yield _output_line(index, item_id, embedding=embedding.tolist())
+        await producer
+    finally:
+        producer.cancel()
+        while not pending.empty():
+            entry = pending.get_nowait()
+            if entry is not None and isinstance(entry[2], asyncio.Future):
+                entry[2].cancel()
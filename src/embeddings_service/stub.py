@@ -0,0 +1,64 @@
+import hashlib
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from src.shared.utils import get_env_float
+
+
+class StubSentenceTransformer:
+    """Deterministic stand-in for SentenceTransformer used in benchmarks.
+
+    Each text maps to a fixed pseudo-random unit vector derived from its
+    hash. Every forward pass sleeps for a fixed overhead plus a per-text
+    and a per-padded-token cost, so batching, padding and caching effects
+    show up the way they would with the real model, without loading any
+    weights.
+    """
+
+    def __init__(self, model_name: str, dimension: int = 384, max_seq_length: int = 256):
+        """Initialize the stub model."""
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_seq_length = max_seq_length
+        self.batch_overhead_ms = get_env_float("EMBEDDINGS_STUB_BATCH_MS", 10.0)
+        self.per_text_ms = get_env_float("EMBEDDINGS_STUB_PER_TEXT_MS", 1.0)
+        self.per_token_ms = get_env_float("EMBEDDINGS_STUB_PER_TOKEN_MS", 0.0)
+        # Roughly the size of all-MiniLM-L6-v2, for memory-budget accounting
+        self.memory_bytes = 90 * 2**20
+
+    def _vector(self, text: str) -> np.ndarray:
+        """Map a text to its deterministic unit vector."""
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def tokenize(self, texts: List[str]) -> Dict[str, Any]:
+        """Mimic tokenization by splitting texts into capped word lists."""
+        return {
+            "texts": list(texts),
+            "lengths": [min(len(text.split()) + 2, self.max_seq_length) for text in texts]
+        }
+
+    def forward(self, features: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Simulate one forward pass over tokenized features."""
+        texts = features["texts"]
+        padded_tokens = len(texts) * max(features["lengths"], default=0)
+        time.sleep((self.batch_overhead_ms + self.per_text_ms * len(texts) + self.per_token_ms * padded_tokens) / 1000.0)
+        if not texts:
+            return {"sentence_embedding": np.empty((0, self.dimension), dtype=np.float32)}
+        return {"sentence_embedding": np.stack([self._vector(text) for text in texts])}
+
+    def encode(self, sentences: List[str], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """Encode texts, simulating one forward pass per ``batch_size`` chunk."""
+        chunks = [
+            self.forward(self.tokenize(sentences[start:start + batch_size]))["sentence_embedding"]
+            for start in range(0, len(sentences), batch_size)
+        ]
+        if not chunks:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.concatenate(chunks)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get the dimension of the embeddings."""
+        return self.dimension
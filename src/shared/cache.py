@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from src.shared.metrics import callback_metric
+from src.shared.utils import get_logger, get_env_int, get_env_float
+
+logger = get_logger(__name__)
+
+CACHE_EVENTS = callback_metric(
+    "embedding_cache_events_total", "Embedding cache hits, misses and evictions",
+    ("cache", "event"), type="counter"
+)
+CACHE_ENTRIES = callback_metric("embedding_cache_entries", "Entries in the in-memory embedding cache", ("cache",))
+CACHE_HIT_RATIO = callback_metric("embedding_cache_hit_ratio", "Embedding cache hit ratio since start", ("cache",))
+
+KEY_SIZE = 16
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """Content-address an embedding by model name and normalized text."""
+    digest = hashlib.blake2b(digest_size=KEY_SIZE)
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.digest()
+
+
+def dedupe(texts: List[Any]) -> Tuple[List[Any], np.ndarray]:
+    """Collapse texts that normalize to the same string.
+
+    Returns the distinct texts (first occurrence of each, in order) and, for
+    every input, the position of its distinct text, so ``results[inverse]``
+    fans the distinct results back out. Token id lists are compared as is.
+    """
+    positions: Dict[Any, int] = {}
+    unique: List[Any] = []
+    inverse = np.empty(len(texts), dtype=np.intp)
+    for i, text in enumerate(texts):
+        key = normalize_text(text) if isinstance(text, str) else tuple(text)
+        position = positions.get(key)
+        if position is None:
+            position = positions[key] = len(unique)
+            unique.append(text)
+        inverse[i] = position
+    return unique, inverse
+
+
+class DiskCacheTier:
+    """Memory-mapped ring of vectors that survives process restarts.
+
+    The directory holds a ``meta.json`` plus three fixed-size arrays (keys,
+    write timestamps and float32 vectors). When full, the oldest slot is
+    overwritten. Files are created lazily on the first write, once the
+    vector dimension is known. ``fingerprint`` identifies the configuration
+    that produced the vectors; a tier written under another one is dropped.
+    """
+
+    def __init__(self, path: str, capacity: int = 100000, fingerprint: str = ""):
+        """Open (or prepare to create) the disk tier in the given directory."""
+        self.path = path
+        self.capacity = capacity
+        self.fingerprint = fingerprint
+        self.dimension: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._cursor = 0
+        self._keys: Optional[np.memmap] = None
+        self._stamps: Optional[np.memmap] = None
+        self._vectors: Optional[np.memmap] = None
+
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("capacity") != capacity:
+                logger.warning(f"Disk cache at {path} has a different capacity, recreating it")
+            elif meta.get("fingerprint", "") != fingerprint:
+                logger.warning(f"Disk cache at {path} was written with a different model configuration, recreating it")
+            else:
+                self._open(meta["dimension"], mode="r+")
+
+    def _open(self, dimension: int, mode: str) -> None:
+        """Map the backing files and rebuild the in-memory slot index."""
+        os.makedirs(self.path, exist_ok=True)
+        self.dimension = dimension
+        self._keys = np.memmap(os.path.join(self.path, "keys.bin"), dtype=np.uint8,
+                               mode=mode, shape=(self.capacity, KEY_SIZE))
+        self._stamps = np.memmap(os.path.join(self.path, "stamps.bin"), dtype=np.float64,
+                                 mode=mode, shape=(self.capacity,))
+        self._vectors = np.memmap(os.path.join(self.path, "vectors.bin"), dtype=np.float32,
+                                  mode=mode, shape=(self.capacity, dimension))
+        if mode == "w+":
+            with open(os.path.join(self.path, "meta.json"), "w") as f:
+                json.dump({"dimension": dimension, "capacity": self.capacity, "fingerprint": self.fingerprint}, f)
+
+        used = np.flatnonzero(self._stamps > 0)
+        self._index = {self._keys[slot].tobytes(): int(slot) for slot in used}
+        # Resume writing over the oldest slot (unused slots have a zero stamp)
+        self._cursor = int(np.argmin(self._stamps))
+        logger.info(f"Opened disk cache at {self.path} with {len(self._index)} entries")
+
+    def get(self, key: bytes, max_age: Optional[float]) -> Optional[Tuple[float, np.ndarray]]:
+        """Get the write time and a copy of a stored vector, or None if missing or expired."""
+        slot = self._index.get(key)
+        if slot is None:
+            return None
+        stored_at = float(self._stamps[slot])
+        if max_age is not None and time.time() - stored_at > max_age:
+            return None
+        return stored_at, np.array(self._vectors[slot])
+
+    def put(self, key: bytes, vector: np.ndarray) -> None:
+        """Store a vector, overwriting the oldest slot when full."""
+        if self._vectors is None:
+            self._open(int(vector.shape[-1]), mode="w+")
+        elif vector.shape[-1] != self.dimension:
+            return
+
+        slot = self._index.get(key)
+        if slot is None:
+            slot = self._cursor
+            self._cursor = (self._cursor + 1) % self.capacity
+            old_key = self._keys[slot].tobytes()
+            if self._stamps[slot] > 0:
+                self._index.pop(old_key, None)
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._index[key] = slot
+
+        self._vectors[slot] = vector
+        self._stamps[slot] = time.time()
+
+    def flush(self) -> None:
+        """Flush pending writes to disk."""
+        for array in (self._keys, self._stamps, self._vectors):
+            if array is not None:
+                array.flush()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache with LRU/TTL eviction.
+
+    Entries are keyed by a hash of (model name, normalized text). An
+    optional :class:`DiskCacheTier` backs the in-memory LRU so entries
+    survive restarts; disk hits are promoted back into memory and keep
+    their original write time for the TTL. The tier is dropped when it was
+    written under a different ``fingerprint`` (see
+    ``generator.config_fingerprint``).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: Optional[float] = 3600.0,
+        disk_path: Optional[str] = None,
+        disk_capacity: int = 100000,
+        fingerprint: str = ""
+    ):
+        """Initialize the cache. ``max_entries=0`` disables caching."""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = (
+            DiskCacheTier(disk_path, disk_capacity, fingerprint) if disk_path and max_entries > 0 else None
+        )
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls, prefix: str, fingerprint: str = "") -> "EmbeddingCache":
+        """Build a cache from ``<prefix>_CACHE_*`` environment variables."""
+        ttl_seconds = get_env_float(f"{prefix}_CACHE_TTL_SECONDS", 3600.0)
+        return cls(
+            max_entries=get_env_int(f"{prefix}_CACHE_SIZE", 10000),
+            ttl_seconds=ttl_seconds if ttl_seconds > 0 else None,
+            disk_path=os.getenv(f"{prefix}_CACHE_DIR") or None,
+            disk_capacity=get_env_int(f"{prefix}_CACHE_DISK_CAPACITY", 100000),
+            fingerprint=fingerprint
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        """Look up the embedding for a text, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = cache_key(model_name, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, vector = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._disk is not None:
+                stored = self._disk.get(key, self.ttl_seconds)
+                if stored is not None:
+                    written_at, vector = stored
+                    vector.setflags(write=False)
+                    # Age the promoted entry from its original write, not from now
+                    self._store(key, vector, time.monotonic() - max(time.time() - written_at, 0.0))
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up several texts at once."""
+        return [self.get(model_name, text) for text in texts]
+
+    def put(self, model_name: str, text: str, vector: np.ndarray) -> None:
+        """Store the embedding for a text."""
+        if not self.enabled:
+            return
+        key = cache_key(model_name, text)
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._store(key, vector)
+            if self._disk is not None:
+                self._disk.put(key, vector)
+
+    def _store(self, key: bytes, vector: np.ndarray, stored_at: Optional[float] = None) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entries if full."""
+        self._entries[key] = (time.monotonic() if stored_at is None else stored_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def flush(self) -> None:
+        """Flush the disk tier, if any."""
+        if self._disk is not None:
+            with self._lock:
+                self._disk.flush()
+
+    def register_metrics(self, cache_name: str) -> None:
+        """Expose this cache's counters on /metrics under the given cache label."""
+        for event in ("hits", "misses", "disk_hits", "evictions", "expirations"):
+            CACHE_EVENTS.add(lambda event=event: getattr(self, event), cache_name, event)
+        CACHE_ENTRIES.add(lambda: len(self._entries), cache_name)
+        CACHE_HIT_RATIO.add(lambda: self.get_stats()["hit_rate"], cache_name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_entries": len(self._disk) if self._disk is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,94 @@
+import contextvars
+import time
+from typing import Optional
+
+from src.shared.metrics import counter
+
+# Header carrying the caller's remaining time budget in milliseconds. A
+# relative budget, rather than an absolute time, is immune to clock skew
+# between hosts; each hop subtracts the time it has already spent.
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+EXPIRED_REQUESTS = counter(
+    "request_deadline_exceeded_total", "Work dropped because its deadline had passed", ("service", "stage")
+)
+
+# Absolute deadline of the current request on the time.monotonic() clock
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline passes before its work is done."""
+
+
+def current_deadline() -> Optional[float]:
+    """Get the current request's deadline on the monotonic clock, if it has one."""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Get the seconds left before the current request's deadline, if it has one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def set_deadline(seconds: Optional[float]) -> contextvars.Token:
+    """Give the current context a deadline ``seconds`` from now (None clears it)."""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def reset_deadline(token: contextvars.Token) -> None:
+    """Restore the deadline the context had before :func:`set_deadline`."""
+    _deadline.reset(token)
+
+
+def check_deadline(service: str, stage: str, deadline: Optional[float] = None) -> None:
+    """Raise :class:`DeadlineExceededError` if the (given or current) deadline has passed."""
+    deadline = deadline if deadline is not None else _deadline.get()
+    if deadline is not None and time.monotonic() >= deadline:
+        EXPIRED_REQUESTS.labels(service, stage).inc()
+        raise DeadlineExceededError(f"Deadline exceeded before {stage}")
+
+
+def header_value(seconds: float) -> str:
+    """Format a remaining budget for the deadline header."""
+    return str(max(int(seconds * 1000), 0))
+
+
+class DeadlineMiddleware:
+    """ASGI middleware that gives each request a deadline.
+
+    The budget comes from the caller's ``X-Deadline-Ms`` header, capped at
+    ``default_ms`` when that is set; requests without the header get
+    ``default_ms`` (0 means no deadline).
+    """
+
+    def __init__(self, app, default_ms: int = 0):
+        self.app = app
+        self.default_ms = default_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget_ms: Optional[float] = self.default_ms or None
+        for name, value in scope.get("headers", ()):
+            if name.decode("latin-1").lower() == DEADLINE_HEADER.lower():
+                try:
+                    requested = float(value.decode("latin-1"))
+                except ValueError:
+                    break
+                budget_ms = min(requested, budget_ms) if budget_ms else requested
+                break
+
+        token = set_deadline(None if budget_ms is None else budget_ms / 1000)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
+
+
+def install_deadlines(app, default_ms: int = 0) -> None:
+    """Give every request to an app a deadline from its header or ``default_ms``."""
+    app.add_middleware(DeadlineMiddleware, default_ms=default_ms)
@@ -0,0 +1,470 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from src.shared.metrics import callback_metric, histogram
+from src.shared.utils import get_logger, get_env_int
+
+logger = get_logger(__name__)
+
+INDEX_VECTORS = callback_metric("vector_index_vectors", "Vectors stored in the index", ("index",))
+SEARCH_SECONDS = histogram(
+    "vector_index_search_seconds", "Time spent searching the vector index", ("index", "mode"),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+METRICS = ("cosine", "dot")
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Get the positions of the ``k`` highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class _Block:
+    """One inverted list: a contiguous, growable block of vectors and their ids."""
+
+    def __init__(self, vectors: np.ndarray, ids: List[str]):
+        self.vectors = vectors
+        self.ids = ids
+        self.count = len(ids)
+
+    def add(self, item_id: str, vector: np.ndarray) -> int:
+        if self.count == len(self.vectors):
+            grown = np.empty((max(2 * len(self.vectors), 16), self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.count] = self.vectors[:self.count]
+            self.vectors = grown
+        self.vectors[self.count] = vector
+        self.ids.append(item_id)
+        self.count += 1
+        return self.count - 1
+
+    def remove(self, position: int) -> Optional[str]:
+        """Remove by moving the last row into ``position``; return the id that moved, if any."""
+        last = self.count - 1
+        moved = None
+        if position != last:
+            self.vectors[position] = self.vectors[last]
+            self.ids[position] = moved = self.ids[last]
+        self.ids.pop()
+        self.count = last
+        return moved
+
+
+class _InvertedFile:
+    """IVF accelerator: vectors grouped by nearest k-means centroid.
+
+    A search scores the centroids, then only the vectors in the ``nprobe``
+    closest lists. Each list is a contiguous block, so that is a handful of
+    small matrix-vector products instead of one over the whole store.
+    """
+
+    def __init__(self, centroids: np.ndarray, blocks: List[_Block]):
+        self.centroids = centroids
+        self.blocks = blocks
+        self.where: Dict[str, Tuple[int, int]] = {
+            item_id: (list_id, position)
+            for list_id, block in enumerate(blocks)
+            for position, item_id in enumerate(block.ids)
+        }
+
+    def add(self, item_id: str, vector: np.ndarray) -> None:
+        self.remove(item_id)
+        list_id = int(np.argmax(self.centroids @ vector))
+        self.where[item_id] = (list_id, self.blocks[list_id].add(item_id, vector))
+
+    def remove(self, item_id: str) -> None:
+        location = self.where.pop(item_id, None)
+        if location is None:
+            return
+        list_id, position = location
+        moved = self.blocks[list_id].remove(position)
+        if moved is not None:
+            self.where[moved] = (list_id, position)
+
+    def search(self, query: np.ndarray, k: int, nprobe: int) -> Tuple[List[str], np.ndarray]:
+        probes = _top_k(self.centroids @ query, nprobe)
+        ids: List[str] = []
+        scores = []
+        for list_id in probes:
+            block = self.blocks[list_id]
+            if block.count:
+                scores.append(block.vectors[:block.count] @ query)
+                ids.extend(block.ids)
+        if not scores:
+            return [], np.empty(0, dtype=np.float32)
+        scores = np.concatenate(scores)
+        top = _top_k(scores, k)
+        return [ids[i] for i in top], scores[top]
+
+
+def _kmeans(sample: np.ndarray, clusters: int, spherical: bool, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Cluster ``sample`` rows into ``clusters`` centroids (spherical k-means for cosine)."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1) if spherical else np.argmin(
+            (centroids ** 2).sum(axis=1) - 2 * sample @ centroids.T, axis=1
+        )
+        # Per-cluster sums as one matrix product, much faster than np.add.at
+        members = np.zeros((len(sample), clusters), dtype=np.float32)
+        members[np.arange(len(sample)), assign] = 1.0
+        sums = members.T @ sample
+        counts = np.bincount(assign, minlength=clusters)
+        empty = counts == 0
+        # Reseed empty clusters from random sample rows
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        counts[empty] = 1
+        centroids = sums / counts[:, None]
+        if spherical:
+            centroids /= np.clip(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12, None)
+    return centroids.astype(np.float32)
+
+
+class VectorIndex:
+    """In-process nearest-neighbour index over embedding vectors.
+
+    Vectors live in one preallocated, contiguous float32 matrix that doubles
+    when full, so exact search is a single matrix-vector product over the
+    used rows. Deletes move the last row into the freed slot to keep it
+    contiguous. With ``path``, the matrix is a memory-mapped file that grows
+    in place, and every upsert and delete appends its ids to a journal
+    (``ids.<generation>.log``) next to it, so the index reopens after a crash
+    without reloading every vector into memory. ``flush`` folds the journal
+    into ``ids.json`` and starts the next generation's.
+
+    With ``ann="ivf"``, an inverted-file accelerator is trained in a
+    background thread once ``train_threshold`` vectors are stored (and again
+    whenever the index has grown 4x since). It keeps its own copy of the
+    vectors grouped by centroid; until it is ready, searches are exact.
+    """
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        metric: str = "cosine",
+        path: Optional[str] = None,
+        initial_capacity: int = 1024,
+        ann: Optional[str] = None,
+        nprobe: int = 16,
+        train_threshold: int = 50000,
+        name: str = "default"
+    ):
+        """Initialize (or reopen, when ``path`` holds a saved index) the index."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(METRICS)})")
+        if ann not in (None, "ivf"):
+            raise ValueError(f"Unknown approximate index: {ann} (expected ivf)")
+        self.metric = metric
+        self.path = path
+        self.ann = ann
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self.name = name
+        self.dimension = dimension
+        self.count = 0
+        self._capacity = initial_capacity
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._ivf: Optional[_InvertedFile] = None
+        self._trained_size = 0
+        self._training: Optional[threading.Thread] = None
+        self._dirty: Optional[Set[str]] = None
+        self._journal = None
+        self._generation = 0
+
+        if path and os.path.exists(os.path.join(path, "meta.json")):
+            self._load()
+        INDEX_VECTORS.add(lambda: self.count, name)
+
+    @classmethod
+    def from_env(cls, prefix: str, name: str = "default") -> "VectorIndex":
+        """Build an index from ``<prefix>_INDEX_*`` environment variables."""
+        ann = os.getenv(f"{prefix}_INDEX_ANN", "none").lower()
+        return cls(
+            metric=os.getenv(f"{prefix}_INDEX_METRIC", "cosine"),
+            path=os.getenv(f"{prefix}_INDEX_DIR") or None,
+            initial_capacity=get_env_int(f"{prefix}_INDEX_CAPACITY", 1024),
+            ann=None if ann == "none" else ann,
+            nprobe=get_env_int(f"{prefix}_INDEX_NPROBE", 16),
+            train_threshold=get_env_int(f"{prefix}_INDEX_TRAIN_THRESHOLD", 50000),
+            name=name
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        """Allocate (or grow) the vector matrix, memory-mapped when the index is persistent."""
+        if not self.path:
+            vectors = np.empty((capacity, self.dimension), dtype=np.float32)
+            if self._vectors is not None:
+                vectors[:self.count] = self._vectors[:self.count]
+            return vectors
+        os.makedirs(self.path, exist_ok=True)
+        target = os.path.join(self.path, "vectors.bin")
+        # Grow the file in place and map it again: nothing is copied, and the
+        # old, shorter mapping stays valid for readers such as a training thread
+        with open(target, "w+b" if self._vectors is None else "r+b") as f:
+            f.truncate(capacity * self.dimension * np.dtype(np.float32).itemsize)
+        vectors = np.memmap(target, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+        self._write_meta(capacity)
+        return vectors
+
+    def _write_meta(self, capacity: int) -> None:
+        with open(os.path.join(self.path, "meta.json.tmp"), "w") as f:
+            json.dump({"dimension": self.dimension, "metric": self.metric, "capacity": capacity}, f)
+        os.replace(os.path.join(self.path, "meta.json.tmp"), os.path.join(self.path, "meta.json"))
+
+    def _load(self) -> None:
+        """Reopen a persisted index, replaying changes journaled since the last flush."""
+        with open(os.path.join(self.path, "meta.json")) as f:
+            meta = json.load(f)
+        ids_path = os.path.join(self.path, "ids.json")
+        if os.path.exists(ids_path):
+            with open(ids_path) as f:
+                saved = json.load(f)
+            # Indexes saved before the journal existed hold a plain list
+            if isinstance(saved, list):
+                self._ids = saved
+            else:
+                self._ids, self._generation = saved["ids"], saved["generation"]
+        self.metric = meta["metric"]
+        self.dimension = meta["dimension"]
+        self._capacity = meta["capacity"]
+        self.count = len(self._ids)
+        self._slots = {item_id: slot for slot, item_id in enumerate(self._ids)}
+        self._vectors = np.memmap(os.path.join(self.path, "vectors.bin"), dtype=np.float32,
+                                  mode="r+", shape=(self._capacity, self.dimension))
+
+        journal_path = self._journal_path(self._generation)
+        if os.path.exists(journal_path):
+            replayed = 0
+            with open(journal_path) as f:
+                for line in f:
+                    try:
+                        op, item_id = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        break
+                    # The vectors were written through the mapping already; redo the slot bookkeeping
+                    if op == "+":
+                        if item_id not in self._slots:
+                            self._slots[item_id] = self.count
+                            self._ids.append(item_id)
+                            self.count += 1
+                    else:
+                        self._remove_slot(item_id)
+                    replayed += 1
+            logger.info(f"Replayed {replayed} journaled changes to vector index at {self.path}")
+        logger.info(f"Reopened vector index at {self.path} with {self.count} vectors")
+        self._maybe_train()
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """Validate vectors and normalize them for cosine similarity."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape[1]}")
+        if self.metric == "cosine":
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray) -> int:
+        """Insert or replace vectors by id; returns how many were new."""
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(ids)} ids for {len(vectors)} vectors")
+        with self._lock:
+            vectors = self._prepare(vectors)
+            if self._vectors is None:
+                self._vectors = self._allocate(self._capacity)
+            added = 0
+            new_ids = []
+            for item_id, vector in zip(ids, vectors):
+                slot = self._slots.get(item_id)
+                if slot is None:
+                    if self.count == self._capacity:
+                        self._capacity *= 2
+                        self._vectors = self._allocate(self._capacity)
+                    slot = self._slots[item_id] = self.count
+                    self._ids.append(item_id)
+                    self.count += 1
+                    added += 1
+                    new_ids.append(item_id)
+                self._vectors[slot] = vector
+                self._touch(item_id, vector)
+            self._log("+", new_ids)
+        self._maybe_train()
+        return added
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """Delete vectors by id; returns how many existed."""
+        removed = []
+        with self._lock:
+            for item_id in ids:
+                slot = self._slots.get(item_id)
+                if slot is None:
+                    continue
+                last = self.count - 1
+                if slot != last:
+                    # Keep the used rows contiguous by moving the last one into the gap
+                    self._vectors[slot] = self._vectors[last]
+                    if self._dirty is not None:
+                        self._dirty.add(self._ids[last])
+                self._remove_slot(item_id)
+                removed.append(item_id)
+                self._touch(item_id, None)
+            self._log("-", removed)
+        return len(removed)
+
+    def _remove_slot(self, item_id: str) -> None:
+        """Drop an id, moving the last id into its slot (the caller moves the vector)."""
+        slot = self._slots.pop(item_id, None)
+        if slot is None:
+            return
+        last = self.count - 1
+        if slot != last:
+            moved = self._ids[last]
+            self._ids[slot] = moved
+            self._slots[moved] = slot
+        self._ids.pop()
+        self.count = last
+
+    def _journal_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"ids.{generation}.log")
+
+    def _log(self, op: str, ids: List[str]) -> None:
+        """Journal added or removed ids so a reopened index sees them before the next flush."""
+        if not self.path or not ids:
+            return
+        if self._journal is None:
+            self._journal = open(self._journal_path(self._generation), "a")
+        self._journal.write("".join(json.dumps([op, item_id]) + "\n" for item_id in ids))
+        self._journal.flush()
+
+    def _touch(self, item_id: str, vector: Optional[np.ndarray]) -> None:
+        """Mirror a change into the IVF lists and any training in progress."""
+        if self._ivf is not None:
+            if vector is None:
+                self._ivf.remove(item_id)
+            else:
+                self._ivf.add(item_id, vector)
+        if self._dirty is not None:
+            self._dirty.add(item_id)
+
+    def search(self, query: np.ndarray, k: int = 10, exact: bool = False) -> List[Tuple[str, float]]:
+        """Find the ``k`` nearest vectors to ``query`` as (id, score) pairs, best first."""
+        started = time.perf_counter()
+        with self._lock:
+            if self.count == 0:
+                return []
+            query = self._prepare(query)[0]
+            mode = "exact" if exact or self._ivf is None else "ivf"
+            if mode == "ivf":
+                ids, scores = self._ivf.search(query, k, self.nprobe)
+                if len(ids) < min(k, self.count):
+                    mode = "exact"
+            if mode == "exact":
+                all_scores = self._vectors[:self.count] @ query
+                top = _top_k(all_scores, k)
+                ids, scores = [self._ids[i] for i in top], all_scores[top]
+        SEARCH_SECONDS.labels(self.name, mode).observe(time.perf_counter() - started)
+        return list(zip(ids, scores.tolist()))
+
+    def _maybe_train(self) -> None:
+        """Start (re)training the IVF accelerator in the background when due."""
+        if self.ann != "ivf" or self.count < self.train_threshold:
+            return
+        if self._training is not None or (self._ivf is not None and self.count < 4 * self._trained_size):
+            return
+        with self._lock:
+            if self._training is not None:
+                return
+            self._dirty = set()
+            snapshot = (self._vectors, self.count, list(self._ids))
+            self._training = threading.Thread(target=self._train, args=snapshot, name="ivf-train", daemon=True)
+        self._training.start()
+
+    def _train(self, vectors: np.ndarray, count: int, ids: List[str]) -> None:
+        """Build IVF lists from a snapshot, then fold in changes made meanwhile."""
+        try:
+            started = time.perf_counter()
+            clusters = int(min(max(np.sqrt(count), 16), 4096))
+            rng = np.random.default_rng(0)
+            sample = vectors[np.sort(rng.choice(count, min(count, 32 * clusters), replace=False))]
+            centroids = _kmeans(np.asarray(sample), clusters, spherical=self.metric == "cosine")
+
+            assign = np.empty(count, dtype=np.int64)
+            for start in range(0, count, 8192):
+                end = min(start + 8192, count)
+                assign[start:end] = np.argmax(vectors[start:end] @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=clusters))])
+            blocks = [
+                _Block(np.array(vectors[order[bounds[i]:bounds[i + 1]]]), [ids[j] for j in order[bounds[i]:bounds[i + 1]]])
+                for i in range(clusters)
+            ]
+
+            with self._lock:
+                ivf = _InvertedFile(centroids, blocks)
+                # Rows changed during training may have been read mid-update; redo them
+                for item_id in self._dirty:
+                    ivf.remove(item_id)
+                    slot = self._slots.get(item_id)
+                    if slot is not None:
+                        ivf.add(item_id, self._vectors[slot])
+                self._ivf = ivf
+                self._trained_size = count
+            logger.info(
+                f"Trained IVF index {self.name} on {count} vectors with {clusters} lists "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        except Exception as e:
+            logger.error(f"Training IVF index {self.name} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._dirty = None
+                self._training = None
+
+    def flush(self) -> None:
+        """Write vectors to disk and fold the id journal into ``ids.json`` when the index has a path."""
+        if not self.path or self._vectors is None:
+            return
+        with self._lock:
+            self._vectors.flush()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            # ids.json names the journal to replay on top of it, so a crash on
+            # either side of the replace reopens the same ids
+            previous = self._journal_path(self._generation)
+            self._generation += 1
+            with open(os.path.join(self.path, "ids.json.tmp"), "w") as f:
+                json.dump({"generation": self._generation, "ids": self._ids}, f)
+            os.replace(os.path.join(self.path, "ids.json.tmp"), os.path.join(self.path, "ids.json"))
+            if os.path.exists(previous):
+                os.remove(previous)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe the index size and search mode."""
+        return {
+            "vectors": self.count,
+            "dimension": self.dimension,
+            "metric": self.metric,
+            "capacity": self._capacity,
+            "persistent": bool(self.path),
+            "ann": self.ann,
+            "ann_ready": self._ivf is not None,
+            "ann_lists": len(self._ivf.blocks) if self._ivf is not None else 0,
+            "nprobe": self.nprobe,
+            "training": self._training is not None
+        }
@@ -0,0 +1,272 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from src.shared.metrics import counter
+
+# Header carrying a request's ID between services; generated when absent
+REQUEST_ID_HEADER = "X-Request-Id"
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+LOG_RECORDS_DROPPED = counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+LOGGED_REQUESTS = counter("log_requests_total", "Requests by whether their INFO logs were sampled", ("sampled",))
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+# Whether the current request's INFO and DEBUG records are kept
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def current_request_id() -> Optional[str]:
+    """Get the ID of the request being handled, if any."""
+    return _request_id.get()
+
+
+def set_request_context(request_id: Optional[str], sampled: bool = True) -> Tuple[Token, Token]:
+    """Make log records in the current context carry ``request_id`` and follow ``sampled``."""
+    return _request_id.set(request_id), _sampled.set(sampled)
+
+
+def reset_request_context(tokens: Tuple[Token, Token]) -> None:
+    request_token, sampled_token = tokens
+    _request_id.reset(request_token)
+    _sampled.reset(sampled_token)
+
+
+class SampledLogger(logging.Logger):
+    """Logger that skips INFO and DEBUG calls in requests sampled out of logging.
+
+    The check happens before a record is built or its message formatted, so
+    a sampled-out call costs about as much as one below the log level.
+    Warnings and errors are always logged.
+    """
+
+    def isEnabledFor(self, level: int) -> bool:
+        if level < logging.WARNING and not _sampled.get():
+            return False
+        return super().isEnabledFor(level)
+
+
+def get_sampled_logger(name: str) -> logging.Logger:
+    """Get a logger whose INFO and DEBUG calls follow the request's sampling decision.
+
+    Only loggers obtained here sample; the logger class of other libraries
+    is left alone.
+    """
+    logger = logging.getLogger(name)
+    if type(logger) is logging.Logger:
+        # SampledLogger adds behaviour but no state, so the logger can switch class in place
+        logger.__class__ = SampledLogger
+    return logger
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request ID while still in the caller's context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line.
+
+    Fields passed with ``extra`` are added to the object as they are, so
+    ``logger.info("Embedded %d texts", n, extra={"texts": n})`` can be
+    queried by ``texts`` without parsing the message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a background writer without formatting or blocking.
+
+    Unlike the standard ``QueueHandler`` it does not format the message in
+    the caller, so the %-style arguments are only merged by the writer
+    thread; they should be immutable values (strings, numbers). When the
+    bounded queue is full the record is dropped and counted in
+    ``log_records_dropped_total`` rather than stalling the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LogSampler:
+    """Per-route sampling rates for the INFO logs of requests.
+
+    Each request is kept or dropped as a whole, with the rate of the longest
+    path prefix in ``rates`` that matches it, or ``default_rate``.
+    """
+
+    def __init__(self, default_rate: float = 1.0, rates: Optional[Dict[str, float]] = None):
+        self.default_rate = default_rate
+        # Longest prefixes first
+        self.rates: List[Tuple[str, float]] = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "LogSampler":
+        """Build a sampler from ``<prefix>_LOG_SAMPLE_RATE`` and ``<prefix>_LOG_SAMPLE_RATES``.
+
+        The latter is a ``path=rate`` list, e.g. ``/health=0,/embed=0.01``.
+        """
+        value = os.getenv(f"{prefix}_LOG_SAMPLE_RATE")
+        pairs = (item.split("=", 1) for item in os.getenv(f"{prefix}_LOG_SAMPLE_RATES", "").split(",") if "=" in item)
+        return cls(
+            default_rate=float(value) if value else 1.0,
+            rates={path.strip(): float(rate) for path, rate in pairs}
+        )
+
+    def rate(self, path: str) -> float:
+        for route, rate in self.rates:
+            if path.startswith(route):
+                return rate
+        return self.default_rate
+
+    def sample(self, path: str) -> bool:
+        rate = self.rate(path)
+        return rate >= 1.0 or random.random() < rate
+
+
+class RequestLogMiddleware:
+    """ASGI middleware giving each request an ID and a log sampling decision.
+
+    The ID comes from the caller's ``X-Request-Id`` header or is generated,
+    is attached to every log record of the request and is echoed in the
+    response.
+    """
+
+    def __init__(self, app, sampler: LogSampler):
+        self.app = app
+        self.sampler = sampler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name.decode("latin-1").lower() == REQUEST_ID_HEADER.lower():
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        sampled = self.sampler.sample(scope["path"])
+        LOGGED_REQUESTS.labels(str(sampled).lower()).inc()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(REQUEST_ID_HEADER, request_id)
+            await send(message)
+
+        tokens = set_request_context(request_id, sampled)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            reset_request_context(tokens)
+
+
+def install_request_logging(app, sampler: Optional[LogSampler] = None) -> None:
+    """Give every request to an app a request ID and a log sampling decision."""
+    app.add_middleware(RequestLogMiddleware, sampler=sampler or LogSampler())
+
+
+_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def build_handlers(
+    stream=None,
+    fmt: str = "text",
+    asynchronous: bool = True,
+    queue_size: int = 10000
+) -> Tuple[logging.Handler, Optional[logging.handlers.QueueListener]]:
+    """Build the handler loggers write to and, when asynchronous, the listener that drains it."""
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    if not asynchronous:
+        writer.addFilter(RequestIdFilter())
+        return writer, None
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RequestIdFilter())
+    return handler, logging.handlers.QueueListener(handler.queue, writer)
+
+
+def configure_logging() -> None:
+    """Set up the root logger from ``LOG_LEVEL``, ``LOG_FORMAT``, ``LOG_ASYNC`` and ``LOG_QUEUE_SIZE``.
+
+    By default records are queued to a background thread that formats and
+    writes them as text; ``LOG_FORMAT=json`` writes one JSON object per
+    line instead. Like ``logging.basicConfig`` it leaves a root logger that
+    already has handlers (e.g. set up by Ray) alone.
+    """
+    global _handler, _listener
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    _handler, _listener = build_handlers(
+        fmt=os.getenv("LOG_FORMAT", "text"),
+        asynchronous=os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes", "on"),
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE") or 10000)
+    )
+    root.addHandler(_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    if _listener is not None:
+        _listener.start()
+        atexit.register(stop_logging)
+        # Threads do not survive fork: give forked workers their own queue and writer
+        os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_in_child() -> None:
+    """Give a forked child its own queue and writer thread; the parent's thread did not survive the fork."""
+    global _listener
+    if _listener is None:
+        return
+    _handler.queue = queue.Queue(maxsize=_handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers)
+    _listener.start()
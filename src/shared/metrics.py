@@ -0,0 +1,353 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a label set as ``{name="value",...}``."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together by a /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        """Register a metric, returning the existing one if the name is taken."""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    """A single labelled counter or gauge value."""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, _Value] = {}
+
+    def labels(self, *values: str) -> _Value:
+        """Get the child for a label set."""
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._values.get(key)
+            if child is None:
+                child = self._values[key] = _Value()
+            return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class CallbackMetric(_Metric):
+    """Counter or gauge whose values are read from callbacks at scrape time.
+
+    Useful for exposing counters that are already kept elsewhere, such as
+    the embedding cache statistics.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), type: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self._callbacks: Dict[LabelValues, Callable[[], float]] = {}
+
+    def add(self, callback: Callable[[], float], *values: str) -> None:
+        """Read the value for a label set from ``callback``."""
+        with self._lock:
+            self._callbacks[tuple(str(value) for value in values)] = callback
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._callbacks.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(callback())}"
+                for key, callback in items]
+
+
+class _HistogramValue:
+    """A single labelled histogram."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, _HistogramValue] = {}
+
+    def labels(self, *values: str) -> _HistogramValue:
+        """Get the child for a label set."""
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._values.get(key)
+            if child is None:
+                child = self._values[key] = _HistogramValue(self.buckets)
+            return child
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        lines = []
+        for key, child in items:
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Create (or fetch) a counter in the default registry."""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Create (or fetch) a gauge in the default registry."""
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Create (or fetch) a histogram in the default registry."""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def callback_metric(name: str, documentation: str, labelnames: Sequence[str] = (),
+                    type: str = "gauge") -> CallbackMetric:
+    """Create (or fetch) a callback-driven metric in the default registry."""
+    return REGISTRY.register(CallbackMetric(name, documentation, labelnames, type))
+
+
+# Per-request stage timings, reported in the Server-Timing response header
+_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Add time spent in a stage to the current request's timings."""
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed_stage(name: str, observer: Optional[_HistogramValue] = None) -> Iterator[None]:
+    """Time a block as a request stage, optionally observing it in a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record_stage(name, elapsed)
+        if observer is not None:
+            observer.observe(elapsed)
+
+
+def format_server_timing(stages: Dict[str, float]) -> str:
+    """Render stage timings (in seconds) as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items())
+
+
+def parse_server_timing(value: str) -> Dict[str, float]:
+    """Parse a Server-Timing header value into stage timings in seconds."""
+    stages: Dict[str, float] = {}
+    for entry in value.split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            key, _, duration = param.partition("=")
+            if key == "dur" and name:
+                try:
+                    stages[name] = float(duration) / 1000
+                except ValueError:
+                    pass
+    return stages
+
+
+REQUEST_LATENCY = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("service", "method", "route", "status")
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and a Server-Timing header."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stages: Dict[str, float] = {}
+        token = _stages.set(stages)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings = dict(stages, total=time.perf_counter() - start)
+                MutableHeaders(scope=message).append("Server-Timing", format_server_timing(timings))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stages.reset(token)
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                self.service,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            ).observe(time.perf_counter() - start)
+
+
+def install_metrics(app, service: str) -> None:
+    """Add request metrics, Server-Timing headers and a /metrics route to an app."""
+    app.add_middleware(MetricsMiddleware, service=service)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Expose metrics in the Prometheus text format."""
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
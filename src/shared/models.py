@@ -1,22 +1,61 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Union
+
+# Output element types: int8 rows are scaled per vector, binary rows are
+# sign bits packed into bytes (ceil(dimension / 8) integers per vector)
+OutputDtype = Literal["float32", "float16", "int8", "binary"]
+
+# Request classes with separate queues in front of the model
+Priority = Literal["interactive", "bulk"]
 
 
 class EmbeddingRequest(BaseModel):
     text: str
     model_name: Optional[str] = "all-MiniLM-L6-v2"
+    # Defaults to float32, or the binary format's dtype when one is negotiated
+    dtype: Optional[OutputDtype] = None
+    # Keep only the first N dimensions, re-normalized
+    dimensions: Optional[int] = Field(None, ge=1)
+    # Overrides the X-Priority header
+    priority: Optional[Priority] = None
 
 
 class EmbeddingResponse(BaseModel):
     text: str
-    embeddings: List[float]
+    embeddings: Union[List[int], List[float]]
+    model_name: str
+    dimension: int
+    dtype: str = "float32"
+    # Multiply int8 values by this to recover the float vector
+    scale: Optional[float] = None
+    truncated: bool = False
+
+
+class BatchEmbeddingRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1)
+    model_name: Optional[str] = "all-MiniLM-L6-v2"
+    batch_size: Optional[int] = Field(None, ge=1)
+    dtype: Optional[OutputDtype] = None
+    dimensions: Optional[int] = Field(None, ge=1)
+    priority: Optional[Priority] = None
+
+
+class BatchEmbeddingResponse(BaseModel):
+    # Row-major (count x dimension) matrix, one row per input text
+    embeddings: Union[List[List[int]], List[List[float]]]
     model_name: str
     dimension: int
+    count: int
+    dtype: str = "float32"
+    scales: Optional[List[float]] = None
+    truncated: bool = False
 
 
 class UserInputRequest(BaseModel):
     text: str
     process_embeddings: bool = True
+    # When set, the embedding is also upserted into the vector index under this id
+    index_id: Optional[str] = None
 
 
 class UserInputResponse(BaseModel):
@@ -24,3 +63,38 @@ class UserInputResponse(BaseModel):
     processed: bool
     embeddings: Optional[EmbeddingResponse] = None
     message: str
+
+
+class IndexItem(BaseModel):
+    id: str
+    # Either text to embed or a precomputed vector
+    text: Optional[str] = None
+    vector: Optional[List[float]] = None
+
+
+class IndexUpsertRequest(BaseModel):
+    items: List[IndexItem] = Field(..., min_length=1)
+    model_name: Optional[str] = "all-MiniLM-L6-v2"
+
+
+class IndexDeleteRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1)
+
+
+class SearchRequest(BaseModel):
+    # Either query text to embed or a query vector
+    text: Optional[str] = None
+    vector: Optional[List[float]] = None
+    k: int = Field(10, ge=1, le=1000)
+    model_name: Optional[str] = "all-MiniLM-L6-v2"
+    exact: bool = False
+
+
+class SearchHit(BaseModel):
+    id: str
+    score: float
+
+
+class SearchResponse(BaseModel):
+    hits: List[SearchHit]
+    count: int
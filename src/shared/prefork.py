@@ -0,0 +1,123 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+import uvicorn
+
+from src.shared.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Bind the listening socket every worker will accept on."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Runs an ASGI app in ``workers`` forked uvicorn processes sharing one socket.
+
+    The app is imported and ``preload`` runs in the master before forking,
+    so whatever it loads (model weights) is shared copy-on-write by every
+    worker instead of being loaded once per worker. ``gc.freeze`` moves the
+    preloaded objects out of the collector's reach so collections in the
+    workers do not touch, and un-share, their pages. ``post_fork`` runs in
+    each worker before it starts serving, e.g. to size its thread pools.
+    Workers that die are replaced; SIGINT/SIGTERM stop them all.
+    """
+
+    def __init__(
+        self,
+        load_app: Callable[[], Any],
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 1,
+        preload: Optional[Callable[[], None]] = None,
+        post_fork: Optional[Callable[[int], None]] = None,
+        log_level: str = "info"
+    ):
+        self.load_app = load_app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.preload = preload
+        self.post_fork = post_fork
+        self.log_level = log_level
+        self._children: Dict[int, int] = {}
+        self._stopping = False
+
+    def run(self) -> None:
+        """Preload, fork the workers and supervise them until stopped."""
+        sock = bind_socket(self.host, self.port)
+        app = self.load_app()
+        if self.preload is not None:
+            started = time.perf_counter()
+            self.preload()
+            logger.info(f"Preloaded in the master in {time.perf_counter() - started:.1f}s")
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        for worker_id in range(self.workers):
+            self._spawn(worker_id, app, sock)
+        logger.info(f"Serving on {self.host}:{self.port} with {self.workers} workers")
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            worker_id = self._children.pop(pid, None)
+            if worker_id is not None and not self._stopping:
+                logger.warning(f"Worker {worker_id} (pid {pid}) exited with status {status}, restarting it")
+                time.sleep(1.0)
+                self._spawn(worker_id, app, sock)
+        sock.close()
+
+    def _spawn(self, worker_id: int, app: Any, sock: socket.socket) -> None:
+        """Fork one worker serving ``app`` on the shared socket."""
+        pid = os.fork()
+        if pid:
+            self._children[pid] = worker_id
+            return
+        # Worker: restore default signal handling, which uvicorn replaces with graceful shutdown
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            if self.post_fork is not None:
+                self.post_fork(worker_id)
+            config = uvicorn.Config(app, log_level=self.log_level, lifespan="on")
+            uvicorn.Server(config).run(sockets=[sock])
+        except BaseException as e:
+            logger.error(f"Worker {worker_id} failed: {str(e)}")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def _stop(self, signum: int, frame: Any) -> None:
+        """Ask every worker to shut down gracefully."""
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info(f"Stopping {len(self._children)} workers")
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
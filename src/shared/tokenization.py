@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+from typing import List, Optional
+
+from src.shared.utils import get_logger, get_env_bool
+
+logger = get_logger(__name__)
+
+# Header naming the tokenizer that produced pre-tokenized input
+TOKENIZER_HEADER = "X-Tokenizer-Fingerprint"
+
+
+class TokenizerMismatchError(Exception):
+    """Raised when token ids come from a different tokenizer than the model's."""
+
+
+class TextTokenizer:
+    """Turns texts into content token ids: no special tokens, no truncation.
+
+    ``fingerprint`` identifies the vocabulary and normalization, so ids
+    produced by one process can be checked before another feeds them to a
+    model.
+    """
+
+    fingerprint = ""
+    vocab_size = 0
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        raise NotImplementedError
+
+    def check_ids(self, ids: List[List[int]]) -> None:
+        """Raise ValueError if any id is outside the vocabulary."""
+        for row in ids:
+            if len(row) and (min(row) < 0 or max(row) >= self.vocab_size):
+                raise ValueError(f"Token ids must be between 0 and {self.vocab_size - 1}")
+
+
+class WordTokenizer(TextTokenizer):
+    """Whitespace tokenizer for the stub model: each word maps to a hash of itself.
+
+    The ids depend only on the word, so every process produces the same ids
+    for the same text.
+    """
+
+    fingerprint = "stub-words-v1"
+    vocab_size = 2**31
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        return [[self.word_id(word) for word in text.split()] for text in texts]
+
+    @staticmethod
+    def word_id(word: str) -> int:
+        return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little") & 0x7FFFFFFF
+
+
+class HuggingFaceTokenizer(TextTokenizer):
+    """A model's HuggingFace tokenizer, with the text preprocessing SentenceTransformer applies."""
+
+    def __init__(self, tokenizer, do_lower_case: bool = False):
+        self.tokenizer = tokenizer
+        self.do_lower_case = do_lower_case
+        self.vocab_size = len(tokenizer)
+        self.fingerprint = self._fingerprint()
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        texts = [text.strip() for text in texts]
+        if self.do_lower_case:
+            texts = [text.lower() for text in texts]
+        return self.tokenizer(texts, add_special_tokens=False, truncation=False, verbose=False)["input_ids"]
+
+    def _fingerprint(self) -> str:
+        """Hash the vocabulary, normalizers and pre-tokenizers, but not per-call settings."""
+        backend = getattr(self.tokenizer, "backend_tokenizer", None)
+        if backend is not None:
+            spec = json.loads(backend.to_str())
+            # Truncation and padding change with each call and do not affect the ids
+            spec.pop("truncation", None)
+            spec.pop("padding", None)
+        else:
+            spec = {"class": type(self.tokenizer).__name__, "vocab": self.tokenizer.get_vocab()}
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(json.dumps(spec, sort_keys=True).encode("utf-8"))
+        digest.update(b"lower" if self.do_lower_case else b"cased")
+        return digest.hexdigest()
+
+
+def _read_lower_case(path: str) -> bool:
+    """Read ``do_lower_case`` from a SentenceTransformer model's ``sentence_bert_config.json``."""
+    try:
+        if not os.path.isdir(path):
+            from huggingface_hub import hf_hub_download
+            path = os.path.dirname(hf_hub_download(path, "sentence_bert_config.json"))
+        with open(os.path.join(path, "sentence_bert_config.json")) as f:
+            return bool(json.load(f).get("do_lower_case", False))
+    except Exception as e:
+        logger.warning(f"Could not read sentence_bert_config.json for {path}, assuming a cased model: {str(e)}")
+        return False
+
+
+def load_tokenizer(model_name: str, model_dir: Optional[str] = None) -> TextTokenizer:
+    """Load only the tokenizer of an embedding model, without its weights.
+
+    Uses the stub word tokenizer when ``EMBEDDINGS_STUB_MODEL`` is set, and
+    otherwise a model baked into ``model_dir`` (default
+    ``EMBEDDINGS_MODEL_DIR``) or the HuggingFace hub.
+    """
+    if get_env_bool("EMBEDDINGS_STUB_MODEL", False):
+        return WordTokenizer()
+
+    from transformers import AutoTokenizer
+
+    model_dir = model_dir or os.getenv("EMBEDDINGS_MODEL_DIR")
+    path = os.path.join(model_dir, model_name.replace("/", "__")) if model_dir else ""
+    if not os.path.isdir(path):
+        # SentenceTransformer resolves bare names to the sentence-transformers organization
+        path = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = HuggingFaceTokenizer(AutoTokenizer.from_pretrained(path), _read_lower_case(path))
+    logger.info(f"Loaded tokenizer for {model_name} from {path} (fingerprint {tokenizer.fingerprint})")
+    return tokenizer
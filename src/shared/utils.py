@@ -1,16 +1,36 @@
 import logging
+import os
 from typing import Dict, Any
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from src.shared.logs import configure_logging, get_sampled_logger
+
+# Configure logging (queued to a background writer; see src.shared.logs)
+configure_logging()
 
 
 def get_logger(name: str) -> logging.Logger:
-    """Get a configured logger instance."""
-    return logging.getLogger(name)
+    """Get a configured logger instance that follows per-request log sampling."""
+    return get_sampled_logger(name)
+
+
+def get_env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def get_env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment."""
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def get_env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting from the environment."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
 
 
 def create_response(success: bool, data: Any = None, message: str = "") -> Dict[str, Any]:
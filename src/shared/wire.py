@@ -0,0 +1,175 @@
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Media type for the binary vector format. Clients opt in through the Accept
+# header, optionally choosing the element type: ``application/x-embeddings;
+# dtype=float16``.
+EMBEDDINGS_MEDIA_TYPE = "application/x-embeddings"
+
+# Media type for newline-delimited JSON, used by the streaming bulk endpoint
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Little-endian header: magic, version, dtype code, flags, rows, dims.
+# It is 16 bytes long so the vector data that follows stays aligned. With
+# the scales flag set, one float32 scale per row comes between the header
+# and the values (int8 rows times their scale give the float values).
+_HEADER = struct.Struct("<4sBBHII")
+_MAGIC = b"EMBV"
+_VERSION = 1
+_FLAG_SCALES = 1
+
+_DTYPE_CODES = {
+    "float32": 1,
+    "float16": 2,
+    "int8": 3,
+    "binary": 4,
+}
+_CODE_DTYPES = {code: name for name, code in _DTYPE_CODES.items()}
+
+# NumPy element type of each output dtype; binary vectors are sign bits
+# packed eight to a byte, so their rows are ceil(dimension / 8) bytes long
+_NUMPY_DTYPES = {
+    "float32": "float32",
+    "float16": "float16",
+    "int8": "int8",
+    "binary": "uint8",
+}
+
+OUTPUT_DTYPES = tuple(_DTYPE_CODES)
+
+# Media type for pre-tokenized input: a little-endian header (magic,
+# version, reserved, rows), then each row's token count and all token ids,
+# as int32. Ids are content tokens only; the service adds special tokens.
+TOKEN_IDS_MEDIA_TYPE = "application/x-token-ids"
+_TOKENS_HEADER = struct.Struct("<4sBBHI")
+_TOKENS_MAGIC = b"TOKN"
+
+
+class WireFormatError(ValueError):
+    """Raised when a binary vector payload cannot be decoded."""
+
+
+def negotiate_dtype(accept: Optional[str]) -> Optional[str]:
+    """Return the requested binary dtype from an Accept header, or None for JSON."""
+    if not accept:
+        return None
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if media_type.lower() != EMBEDDINGS_MEDIA_TYPE:
+            continue
+        dtype = "float32"
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "dtype":
+                dtype = value.strip().strip('"').lower()
+        if dtype not in _DTYPE_CODES:
+            raise WireFormatError(f"Unsupported embeddings dtype: {dtype}")
+        return dtype
+    return None
+
+
+def content_type(dtype: str) -> str:
+    """Get the Content-Type header value for a binary payload."""
+    return f"{EMBEDDINGS_MEDIA_TYPE}; dtype={dtype}"
+
+
+def encode_vectors(vectors: np.ndarray, dtype: str = "float32", scales: Optional[np.ndarray] = None) -> bytes:
+    """Encode a 2-D array of vectors as header, optional row scales and raw little-endian values."""
+    if dtype not in _DTYPE_CODES:
+        raise WireFormatError(f"Unsupported embeddings dtype: {dtype}")
+    array = np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.dtype(_NUMPY_DTYPES[dtype]).newbyteorder("<"))
+    rows, dims = array.shape
+    if scales is None:
+        return _HEADER.pack(_MAGIC, _VERSION, _DTYPE_CODES[dtype], 0, rows, dims) + array.tobytes()
+    scales = np.ascontiguousarray(scales, dtype="<f4").ravel()
+    if len(scales) != rows:
+        raise WireFormatError(f"Expected {rows} scales, got {len(scales)}")
+    header = _HEADER.pack(_MAGIC, _VERSION, _DTYPE_CODES[dtype], _FLAG_SCALES, rows, dims)
+    return header + scales.tobytes() + array.tobytes()
+
+
+def decode_vectors(payload: bytes) -> np.ndarray:
+    """Decode a binary payload into a read-only (rows x dims) view without copying."""
+    return decode_scaled_vectors(payload)[0]
+
+
+def decode_scaled_vectors(payload: bytes) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Decode a binary payload into its (rows x dims) values and row scales, if it has them."""
+    if len(payload) < _HEADER.size:
+        raise WireFormatError("Payload is shorter than the header")
+    magic, version, code, flags, rows, dims = _HEADER.unpack_from(payload)
+    if magic != _MAGIC or version != _VERSION:
+        raise WireFormatError("Payload is not a supported embeddings format")
+    if code not in _CODE_DTYPES:
+        raise WireFormatError(f"Unknown dtype code: {code}")
+
+    dtype = np.dtype(_NUMPY_DTYPES[_CODE_DTYPES[code]]).newbyteorder("<")
+    offset = _HEADER.size + (rows * 4 if flags & _FLAG_SCALES else 0)
+    expected = offset + rows * dims * dtype.itemsize
+    if len(payload) != expected:
+        raise WireFormatError(f"Expected {expected} bytes, got {len(payload)}")
+    scales = np.frombuffer(payload, dtype="<f4", count=rows, offset=_HEADER.size) if flags & _FLAG_SCALES else None
+    return np.frombuffer(payload, dtype=dtype, count=rows * dims, offset=offset).reshape(rows, dims), scales
+
+
+def truncate_dimensions(vectors: np.ndarray, dimensions: Optional[int]) -> np.ndarray:
+    """Keep the first ``dimensions`` of each row and re-normalize (Matryoshka-style).
+
+    Only meaningful for models trained so that leading dimensions carry the
+    most information; for others it is a lossy projection.
+    """
+    vectors = np.atleast_2d(vectors)
+    if dimensions is None or dimensions == vectors.shape[1]:
+        return vectors
+    if not 1 <= dimensions <= vectors.shape[1]:
+        raise ValueError(f"dimensions must be between 1 and {vectors.shape[1]}, got {dimensions}")
+    truncated = vectors[:, :dimensions]
+    return truncated / np.clip(np.linalg.norm(truncated, axis=1, keepdims=True), 1e-12, None)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Convert a batch of float vectors to an output dtype.
+
+    Returns the converted rows and, for ``int8``, each row's scale: rows are
+    scaled so their largest component maps to 127, and ``row * scale``
+    recovers the original values. ``binary`` keeps one sign bit per
+    dimension (1 for positive), packed eight to a byte.
+    """
+    if dtype not in _DTYPE_CODES:
+        raise WireFormatError(f"Unsupported embeddings dtype: {dtype}")
+    vectors = np.atleast_2d(vectors)
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    if dtype == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    return vectors.astype(_NUMPY_DTYPES[dtype], copy=False), None
+
+
+def encode_token_ids(ids: List[List[int]]) -> bytes:
+    """Encode rows of token ids as header, row lengths and flat int32 ids."""
+    lengths = np.asarray([len(row) for row in ids], dtype="<i4")
+    flat = np.fromiter((token for row in ids for token in row), dtype="<i4", count=int(lengths.sum()))
+    return _TOKENS_HEADER.pack(_TOKENS_MAGIC, _VERSION, 0, 0, len(ids)) + lengths.tobytes() + flat.tobytes()
+
+
+def decode_token_ids(payload: bytes) -> List[List[int]]:
+    """Decode a token id payload into one list of ids per row."""
+    if len(payload) < _TOKENS_HEADER.size:
+        raise WireFormatError("Payload is shorter than the header")
+    magic, version, _, _, rows = _TOKENS_HEADER.unpack_from(payload)
+    if magic != _TOKENS_MAGIC or version != _VERSION:
+        raise WireFormatError("Payload is not a supported token id format")
+    if len(payload) < _TOKENS_HEADER.size + rows * 4:
+        raise WireFormatError("Payload is shorter than its row lengths")
+    lengths = np.frombuffer(payload, dtype="<i4", count=rows, offset=_TOKENS_HEADER.size)
+    offset = _TOKENS_HEADER.size + rows * 4
+    if (lengths < 0).any() or len(payload) != offset + int(lengths.sum()) * 4:
+        raise WireFormatError("Row lengths do not match the payload size")
+    flat = np.frombuffer(payload, dtype="<i4", offset=offset).tolist()
+    bounds = np.concatenate(([0], np.cumsum(lengths))).tolist()
+    return [flat[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
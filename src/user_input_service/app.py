@@ -1,7 +1,22 @@
-from fastapi import FastAPI, HTTPException
-from src.shared.models import UserInputRequest, UserInputResponse
-from src.shared.utils import get_logger, create_response
+import asyncio
+import os
+import numpy as np
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Header, Response
+from src.shared.models import (
+    UserInputRequest, UserInputResponse, IndexUpsertRequest, IndexDeleteRequest,
+    SearchRequest, SearchResponse, SearchHit
+)
+from src.shared.cache import EmbeddingCache
+from src.shared.deadline import install_deadlines
+from src.shared.index import VectorIndex
+from src.shared.logs import LogSampler, install_request_logging
+from src.shared.metrics import install_metrics
+from src.shared.tokenization import load_tokenizer
+from src.shared.wire import WireFormatError, negotiate_dtype, encode_vectors, content_type, quantize
+from src.shared.utils import get_logger, create_response, get_env_int, get_env_float, get_env_bool
 from src.user_input_service.client import EmbeddingsClient
+from src.user_input_service.resilience import ResiliencePolicy
 
 logger = get_logger(__name__)
 
@@ -11,9 +26,51 @@ app = FastAPI(
     description="Microservice for handling user input and coordinating with embeddings service",
     version="1.0.0"
 )
+install_metrics(app, service="user_input")
+# Each request gets USER_INPUT_DEADLINE_MS (or the caller's X-Deadline-Ms, if
+# shorter) and passes what is left on to the embeddings service
+install_deadlines(app, default_ms=get_env_int("USER_INPUT_DEADLINE_MS", 10000))
+# Request IDs on every log record (forwarded upstream), and INFO logs sampled
+# per route (USER_INPUT_LOG_SAMPLE_RATE[S])
+install_request_logging(app, LogSampler.from_env("USER_INPUT"))
+
+# Model to tokenize for here, sending token ids instead of texts (unset: send texts)
+TOKENIZER_MODEL = os.getenv("USER_INPUT_TOKENIZER_MODEL")
+
+# Initialize embeddings client with a pooled HTTP client and a local cache
+# (USER_INPUT_CACHE_SIZE=0 disables the cache)
+embeddings_client = EmbeddingsClient(
+    cache=EmbeddingCache.from_env("USER_INPUT"),
+    max_connections=get_env_int("USER_INPUT_MAX_CONNECTIONS", 100),
+    max_keepalive_connections=get_env_int("USER_INPUT_MAX_KEEPALIVE_CONNECTIONS", 20),
+    keepalive_expiry=get_env_float("USER_INPUT_KEEPALIVE_EXPIRY", 30.0),
+    http2=get_env_bool("USER_INPUT_HTTP2", False),
+    resilience=ResiliencePolicy.from_env("USER_INPUT"),
+    # Comma-separated embeddings replicas to route texts between by content
+    replica_urls=[url.strip() for url in os.getenv("USER_INPUT_EMBEDDINGS_REPLICAS", "").split(",") if url.strip()],
+    routing=os.getenv("USER_INPUT_ROUTING", "hash"),
+    routing_load_factor=get_env_float("USER_INPUT_ROUTING_LOAD_FACTOR", 1.25),
+    tokenizer=load_tokenizer(TOKENIZER_MODEL) if TOKENIZER_MODEL else None,
+    tokenizer_model=TOKENIZER_MODEL or "all-MiniLM-L6-v2"
+)
+embeddings_client.cache.register_metrics("user_input")
+
+# Nearest-neighbour index over embeddings upserted via /index/upsert or /process
+# (configured with USER_INPUT_INDEX_*; persistent when USER_INPUT_INDEX_DIR is set)
+vector_index = VectorIndex.from_env("USER_INPUT", name="user_input")
+
+
+@app.on_event("startup")
+async def startup():
+    """Open the pooled connection to the embeddings service."""
+    await embeddings_client.start()
 
-# Initialize embeddings client
-embeddings_client = EmbeddingsClient()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the pooled connection to the embeddings service and persist the index."""
+    await embeddings_client.close()
+    await asyncio.to_thread(vector_index.flush)
 
 
 @app.get("/health")
@@ -24,17 +81,30 @@ async def health_check():
         success=True,
         data={
             "user_input_service": "healthy",
-            "embeddings_service": "healthy" if embeddings_healthy else "unhealthy"
+            "embeddings_service": "healthy" if embeddings_healthy else "unhealthy",
+            "embeddings_circuit": embeddings_client.resilience.breaker.state
         },
         message="User input service health check"
     )
 
 
 @app.post("/process", response_model=UserInputResponse)
-async def process_user_input(request: UserInputRequest):
-    """Process user input and optionally generate embeddings."""
+async def process_user_input(request: UserInputRequest, accept: Optional[str] = Header(None)):
+    """Process user input and optionally generate embeddings.
+
+    Clients sending ``Accept: application/x-embeddings`` get the vector as
+    raw little-endian bytes, with the processing status in the headers.
+    """
     try:
-        logger.info(f"Processing user input: {request.text[:50]}...")
+        binary_dtype = negotiate_dtype(accept)
+    except WireFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    
+    if binary_dtype:
+        return await _process_user_input_binary(request, binary_dtype)
+    
+    try:
+        logger.info("Processing user input: %.50s...", request.text)
         
         embeddings_response = None
         
@@ -50,6 +120,11 @@ async def process_user_input(request: UserInputRequest):
                     embeddings=None,
                     message="Failed to generate embeddings"
                 )
+            
+            if request.index_id is not None:
+                await asyncio.to_thread(
+                    vector_index.upsert, [request.index_id], np.asarray([embeddings_response.embeddings])
+                )
         
         response = UserInputResponse(
             original_text=request.text,
@@ -67,6 +142,143 @@ async def process_user_input(request: UserInputRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _process_user_input_binary(request: UserInputRequest, dtype: str) -> Response:
+    """Process user input and return the embeddings in the binary wire format."""
+    try:
+        logger.info("Processing user input (binary %s): %.50s...", dtype, request.text)
+        
+        vectors = np.empty((0, 0), dtype=np.float32)
+        scales = None
+        processed = True
+        message = "Successfully processed user input without embeddings"
+        
+        if request.process_embeddings:
+            # Fetch (and cache) float32 and quantize here, so int8 keeps its scales
+            embeddings = await embeddings_client.get_embeddings_array(request.text)
+            if embeddings is None:
+                logger.warning("Failed to get embeddings, continuing without them")
+                processed = False
+                message = "Failed to generate embeddings"
+            else:
+                vectors, scales = quantize(embeddings[None, :], dtype)
+                message = "Successfully processed user input with embeddings"
+                if request.index_id is not None:
+                    await asyncio.to_thread(vector_index.upsert, [request.index_id], embeddings[None, :])
+        
+        return Response(
+            content=encode_vectors(vectors, dtype, scales),
+            media_type=content_type(dtype),
+            headers={"X-Processed": str(processed).lower(), "X-Message": message}
+        )
+        
+    except Exception as e:
+        logger.error(f"Error processing user input: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest):
+    """Find the indexed vectors nearest to a query text or vector."""
+    if (request.text is None) == (request.vector is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of text or vector")
+    
+    if request.text is not None:
+        query = await embeddings_client.get_embeddings_array(request.text, request.model_name)
+        if query is None:
+            raise HTTPException(status_code=502, detail="Failed to generate query embedding")
+    else:
+        query = np.asarray(request.vector, dtype=np.float32)
+    
+    try:
+        results = await asyncio.to_thread(vector_index.search, query, request.k, exact=request.exact)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return SearchResponse(
+        hits=[SearchHit(id=item_id, score=score) for item_id, score in results],
+        count=len(results)
+    )
+
+
+@app.post("/index/upsert")
+async def index_upsert(request: IndexUpsertRequest):
+    """Insert or replace items in the vector index, embedding any given as text."""
+    for item in request.items:
+        if (item.text is None) == (item.vector is None):
+            raise HTTPException(status_code=422, detail=f"Item {item.id}: provide exactly one of text or vector")
+    
+    texts = [item.text for item in request.items if item.text is not None]
+    embedded = None
+    if texts:
+        # One batch call for every text item
+        embedded = await embeddings_client.get_embeddings_batch_array(texts, request.model_name)
+        if embedded is None:
+            raise HTTPException(status_code=502, detail="Failed to generate embeddings")
+    
+    rows = []
+    next_text = 0
+    for item in request.items:
+        if item.text is not None:
+            rows.append(embedded[next_text])
+            next_text += 1
+        else:
+            rows.append(np.asarray(item.vector, dtype=np.float32))
+    
+    try:
+        # Off the event loop: the index lock may be held while the store grows
+        added = await asyncio.to_thread(vector_index.upsert, [item.id for item in request.items], np.stack(rows))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return create_response(
+        success=True,
+        data={"added": added, "updated": len(request.items) - added, "vectors": len(vector_index)},
+        message=f"Upserted {len(request.items)} items"
+    )
+
+
+@app.post("/index/delete")
+async def index_delete(request: IndexDeleteRequest):
+    """Delete items from the vector index by id."""
+    deleted = await asyncio.to_thread(vector_index.delete, request.ids)
+    return create_response(
+        success=True,
+        data={"deleted": deleted, "vectors": len(vector_index)},
+        message=f"Deleted {deleted} items"
+    )
+
+
+@app.get("/index/stats")
+async def index_stats():
+    """Report the vector index size and search mode."""
+    return create_response(
+        success=True,
+        data=vector_index.get_stats(),
+        message="Vector index statistics"
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Report the client-side embedding cache counters."""
+    return create_response(
+        success=True,
+        data=embeddings_client.cache.get_stats(),
+        message="Cache statistics"
+    )
+
+
+@app.get("/routing/stats")
+async def routing_stats():
+    """Report how texts were routed between embeddings replicas."""
+    transport = embeddings_client.transport
+    return create_response(
+        success=True,
+        data=transport.get_stats() if hasattr(transport, "get_stats") else None,
+        message="Routing statistics"
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -1,41 +1,171 @@
+import asyncio
+import os
+import time
 import httpx
-from typing import Optional
-from src.shared.models import EmbeddingRequest, EmbeddingResponse
+import numpy as np
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+from src.shared.models import EmbeddingResponse, BatchEmbeddingResponse
+from src.shared.cache import EmbeddingCache, cache_key, dedupe
+from src.shared.deadline import DeadlineExceededError
+from src.shared.metrics import callback_metric, histogram, timed_stage
+from src.shared.tokenization import TextTokenizer, TokenizerMismatchError
+from src.shared.wire import quantize
 from src.shared.utils import get_logger
+from src.user_input_service.resilience import CircuitOpenError, ResiliencePolicy
+from src.user_input_service.routing import AffinityRouter, AffinityTransport
+from src.user_input_service.transport import EmbeddingsTransport, HttpTransport
 
 logger = get_logger(__name__)
 
+UPSTREAM_SECONDS = histogram(
+    "embeddings_client_request_seconds",
+    "Latency of calls from the user input service to the embeddings service",
+    ("transport", "outcome")
+)
+COALESCED_REQUESTS = callback_metric(
+    "embeddings_client_coalesced_total",
+    "Requests that shared an in-flight upstream call",
+    type="counter"
+)
+DEDUPLICATED_TEXTS = callback_metric(
+    "embeddings_client_deduplicated_texts_total",
+    "Duplicate texts in a batch that were not sent upstream",
+    type="counter"
+)
+
 
 class EmbeddingsClient:
-    def __init__(self, embeddings_service_url: str = "http://localhost:8001"):
-        """Initialize the embeddings service client."""
+    def __init__(
+        self,
+        embeddings_service_url: str = "http://localhost:8001",
+        cache: Optional[EmbeddingCache] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        coalesce: bool = True,
+        transport: Optional[EmbeddingsTransport] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        replica_urls: Optional[List[str]] = None,
+        routing: str = "hash",
+        routing_load_factor: float = 1.25,
+        tokenizer: Optional[TextTokenizer] = None,
+        tokenizer_model: str = "all-MiniLM-L6-v2"
+    ):
+        """Initialize the embeddings service client.
+
+        Requests go through ``transport``; by default that is an
+        :class:`HttpTransport` owning one pooled connection, which should be
+        opened and closed with ``start``/``close`` from the app's startup and
+        shutdown hooks. When a ``cache`` is given, hits are answered locally
+        without a network round-trip, and with ``coalesce`` concurrent
+        requests for the same (normalized) text share one upstream call.
+        Duplicate texts within a batch are sent upstream only once. Calls go
+        through ``resilience`` (deadlines, circuit breaker, retries and
+        optional hedging); any failure still comes back as None.
+
+        With ``replica_urls``, texts are spread over those embeddings
+        replicas by an :class:`AffinityRouter` (``routing`` is ``hash`` for
+        consistent hashing with bounded loads, or ``random``) instead of all
+        going to ``embeddings_service_url``.
+
+        With a ``tokenizer`` for ``tokenizer_model``, texts for that model
+        are tokenized here and sent as token ids, taking tokenization off
+        the embeddings service's event loop. If the service reports that its
+        tokenizer differs, the client drops its own and sends texts again.
+        """
         self.base_url = embeddings_service_url
-        logger.info(f"Initialized embeddings client with URL: {embeddings_service_url}")
         
-        # For Ray deployment, use internal routing
+        # For Ray deployment without a handle, route through the Serve HTTP proxy
         if embeddings_service_url == "http://localhost:8001":
-            import os
             if os.getenv("RAY_SERVE_DEPLOYMENT", "false").lower() == "true":
                 self.base_url = "http://localhost:8000/embeddings"
+        
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        if transport is None and replica_urls:
+            transport = AffinityTransport(
+                [HttpTransport(url, limits=limits, http2=http2) for url in replica_urls],
+                AffinityRouter(replica_urls, policy=routing, load_factor=routing_load_factor)
+            )
+        self.transport = transport or HttpTransport(self.base_url, limits=limits, http2=http2)
+        self.tokenizer = tokenizer
+        self.tokenizer_model = tokenizer_model
+        self.cache = cache
+        self.resilience = resilience or ResiliencePolicy()
+        self.coalesce = coalesce
+        self.coalesced_requests = 0
+        self.deduplicated_texts = 0
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        COALESCED_REQUESTS.add(lambda: self.coalesced_requests)
+        DEDUPLICATED_TEXTS.add(lambda: self.deduplicated_texts)
+        logger.info(f"Initialized embeddings client using {type(self.transport).__name__}")
     
-    async def get_embeddings(self, text: str, model_name: str = "all-MiniLM-L6-v2") -> Optional[EmbeddingResponse]:
-        """Get embeddings from the embeddings service."""
+    async def start(self) -> None:
+        """Open the transport's long-lived resources."""
+        await self.transport.start()
+    
+    async def close(self) -> None:
+        """Close the transport's long-lived resources."""
+        await self.transport.close()
+    
+    def use_transport(self, transport: EmbeddingsTransport) -> None:
+        """Switch to a different transport; call this before ``start``."""
+        self.transport = transport
+        logger.info(f"Embeddings client switched to {type(transport).__name__}")
+    
+    async def _coalesced(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fetch`` once for all concurrent callers that share ``key``."""
+        if not self.coalesce:
+            return await fetch()
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced_requests += 1
+        # Shield so one caller giving up does not cancel the call for the others
+        return await asyncio.shield(task)
+    
+    async def _embed(
+        self,
+        texts: List[str],
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> Optional[np.ndarray]:
+        """Fetch embeddings through the transport, returning None on any error."""
+        transport = type(self.transport).__name__
+        outcome = "error"
+        started = time.perf_counter()
         try:
-            request_data = EmbeddingRequest(text=text, model_name=model_name)
-            
-            async with httpx.AsyncClient() as client:
-                logger.info(f"Requesting embeddings for text: {text[:50]}...")
-                response = await client.post(
-                    f"{self.base_url}/embed",
-                    json=request_data.model_dump(),
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                logger.info("Successfully received embeddings from service")
-                return EmbeddingResponse(**data)
+            ids = await self._tokenize(texts, model_name)
+            with timed_stage("upstream"):
+                logger.info("Requesting embeddings for %d texts", len(texts), extra={"texts": len(texts)})
+                vectors = None
+                if ids is not None:
+                    vectors = await self._embed_tokens(ids, model_name, batch_size, dtype)
+                if vectors is None:
+                    vectors = await self.resilience.call(
+                        lambda: self.transport.embed(texts, model_name, batch_size, dtype)
+                    )
+            logger.info("Successfully received embeddings from service")
+            outcome = "success"
+            return vectors
                 
+        except CircuitOpenError as e:
+            outcome = "circuit_open"
+            logger.warning(f"Not calling embeddings service: {str(e)}")
+            return None
+        except DeadlineExceededError as e:
+            outcome = "deadline_exceeded"
+            logger.warning(f"Gave up on embeddings service: {str(e)}")
+            return None
         except httpx.RequestError as e:
             logger.error(f"Network error connecting to embeddings service: {str(e)}")
             return None
@@ -45,13 +175,186 @@ class EmbeddingsClient:
         except Exception as e:
             logger.error(f"Unexpected error getting embeddings: {str(e)}")
             return None
+        finally:
+            UPSTREAM_SECONDS.labels(transport, outcome).observe(time.perf_counter() - started)
+    
+    async def _tokenize(self, texts: List[str], model_name: str) -> Optional[List[List[int]]]:
+        """Tokenize texts locally when the client can send token ids for this model."""
+        tokenizer = self.tokenizer
+        if tokenizer is None or model_name != self.tokenizer_model or not self.transport.accepts_token_ids:
+            return None
+        with timed_stage("tokenize"):
+            if len(texts) == 1:
+                return tokenizer.tokenize(texts)
+            # Large batches would stall the event loop
+            return await asyncio.to_thread(tokenizer.tokenize, texts)
+    
+    async def _embed_tokens(
+        self,
+        ids: List[List[int]],
+        model_name: str,
+        batch_size: Optional[int],
+        dtype: str
+    ) -> Optional[np.ndarray]:
+        """Send token ids upstream; None if the service's tokenizer is a different one."""
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return None
+        try:
+            return await self.resilience.call(
+                lambda: self.transport.embed_tokens(ids, tokenizer.fingerprint, model_name, batch_size, dtype)
+            )
+        except TokenizerMismatchError as e:
+            # Sending ids the model would misread is worse than tokenizing on the server
+            logger.error(f"Disabling client-side tokenization: {str(e)}")
+            self.tokenizer = None
+            return None
+    
+    async def get_embeddings(self, text: str, model_name: str = "all-MiniLM-L6-v2") -> Optional[EmbeddingResponse]:
+        """Get embeddings from the embeddings service."""
+        vector = await self.get_embeddings_array(text, model_name)
+        if vector is None:
+            return None
+        return EmbeddingResponse(
+            text=text,
+            embeddings=vector.tolist(),
+            model_name=model_name,
+            dimension=len(vector)
+        )
+    
+    async def get_embeddings_batch(
+        self,
+        texts: List[str],
+        model_name: str = "all-MiniLM-L6-v2",
+        batch_size: Optional[int] = None
+    ) -> Optional[BatchEmbeddingResponse]:
+        """Get embeddings for many texts in a single request to the embeddings service."""
+        vectors = await self.get_embeddings_batch_array(texts, model_name, batch_size)
+        if vectors is None:
+            return None
+        return BatchEmbeddingResponse(
+            embeddings=vectors.tolist(),
+            model_name=model_name,
+            dimension=vectors.shape[1],
+            count=len(texts)
+        )
+    
+    async def get_embeddings_array(
+        self,
+        text: str,
+        model_name: str = "all-MiniLM-L6-v2",
+        dtype: str = "float32"
+    ) -> Optional[np.ndarray]:
+        """Get embeddings for one text as a NumPy vector.
+
+        For ``int8`` and ``binary`` the vector holds the quantized values
+        only; callers that need int8 scales should fetch float32 and
+        quantize it themselves with ``src.shared.wire.quantize``.
+        """
+        cached = self._cache_get(model_name, text)
+        if cached is not None:
+            return quantize(cached, dtype)[0][0]
+        
+        return await self._coalesced(
+            (dtype, cache_key(model_name, text)),
+            lambda: self._fetch_one(text, model_name, dtype)
+        )
+    
+    async def _fetch_one(self, text: str, model_name: str, dtype: str) -> Optional[np.ndarray]:
+        """Fetch and cache the embedding for one text."""
+        vectors = await self._embed([text], model_name, dtype=dtype)
+        if vectors is None:
+            return None
+        if dtype == "float32":
+            self._cache_put(model_name, text, vectors[0])
+        return vectors[0]
+    
+    async def get_embeddings_batch_array(
+        self,
+        texts: List[str],
+        model_name: str = "all-MiniLM-L6-v2",
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> Optional[np.ndarray]:
+        """Get a (count x dimension) array for many texts, fetching only cache misses."""
+        cached, missing = self._cache_split(model_name, texts)
+        if not missing:
+            return quantize(np.stack(cached), dtype)[0]
+        
+        unique, inverse = dedupe([texts[i] for i in missing])
+        self.deduplicated_texts += len(missing) - len(unique)
+        vectors = await self._embed(unique, model_name, batch_size, dtype)
+        if vectors is None:
+            return None
+        if len(unique) < len(missing):
+            vectors = vectors[inverse]
+        
+        if dtype == "float32":
+            for i, vector in zip(missing, vectors):
+                self._cache_put(model_name, texts[i], vector)
+        if len(missing) == len(texts):
+            return vectors
+        
+        merged = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+        merged[missing] = vectors
+        hits = [i for i, vector in enumerate(cached) if vector is not None]
+        merged[hits] = quantize(np.stack([cached[i] for i in hits]), dtype)[0]
+        return merged
+    
+    async def stream_embeddings(
+        self,
+        texts: Union[Iterable[str], AsyncIterable[str]],
+        model_name: str = "all-MiniLM-L6-v2",
+        segment_size: int = 1024
+    ) -> AsyncIterator[np.ndarray]:
+        """Embed a long (or unbounded) stream of texts, yielding one vector per text in order.
+
+        Meant for bulk backfills: texts are consumed lazily and at most
+        ``segment_size`` of them are held at a time, so memory stays bounded
+        regardless of the corpus size. Bypasses the cache and coalescing.
+        Unlike the other methods, errors are raised rather than returned as
+        None, since a partial stream cannot be told apart from a short one.
+        """
+        async def iterate() -> AsyncIterator[str]:
+            if hasattr(texts, "__aiter__"):
+                async for text in texts:
+                    yield text
+            else:
+                for text in texts:
+                    yield text
+        
+        transport = type(self.transport).__name__
+        count = 0
+        try:
+            async for vector in self.transport.embed_stream(iterate(), model_name, segment_size):
+                count += 1
+                yield vector
+        except Exception as e:
+            logger.error(f"Embedding stream failed after {count} texts: {str(e)}")
+            raise
+        finally:
+            logger.info("Streamed %d embeddings through %s", count, transport)
+    
+    def _cache_get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        """Look up a text in the local cache, if one is configured."""
+        return self.cache.get(model_name, text) if self.cache is not None else None
+    
+    def _cache_put(self, model_name: str, text: str, vector: np.ndarray) -> None:
+        """Store a vector in the local cache, if one is configured."""
+        if self.cache is not None:
+            self.cache.put(model_name, text, vector)
+    
+    def _cache_split(self, model_name: str, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Split a batch into cached vectors and the indices that still need fetching."""
+        if self.cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        cached = self.cache.get_many(model_name, texts)
+        return cached, [i for i, vector in enumerate(cached) if vector is None]
     
     async def health_check(self) -> bool:
         """Check if the embeddings service is healthy."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/health", timeout=5.0)
-                return response.status_code == 200
+            return await self.transport.health_check()
         except Exception as e:
             logger.error(f"Health check failed: {str(e)}")
             return False
@@ -0,0 +1,209 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+from src.shared.deadline import DeadlineExceededError, check_deadline, remaining
+from src.shared.metrics import callback_metric, counter
+from src.shared.utils import get_logger, get_env_int, get_env_float
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+CIRCUIT_STATE = callback_metric(
+    "embeddings_client_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ("circuit",)
+)
+RESILIENCE_EVENTS = counter(
+    "embeddings_client_resilience_events_total", "Retries, hedges and fast failures of upstream calls", ("event",)
+)
+
+# Upstream statuses that mean "try again later" rather than "bad request"
+RETRYABLE_STATUSES = (502, 503, 504)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that the circuit breaker considers down."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed upstream call says the upstream is unhealthy or overloaded."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream is failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected with :class:`CircuitOpenError` without touching the
+    network. After ``reset_timeout`` seconds it goes half-open and lets one
+    probe call through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0, name: str = "embeddings"):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        CIRCUIT_STATE.add(lambda: float(_STATE_VALUES[self.state]), name)
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> None:
+        """Admit a call, or raise :class:`CircuitOpenError`."""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probing):
+            RESILIENCE_EVENTS.labels("circuit_rejected").inc()
+            raise CircuitOpenError(f"Circuit to {self.name} is open")
+        if state == HALF_OPEN:
+            self._probing = True
+
+    def abandon(self) -> None:
+        """Forget an admitted call that ended without an outcome, so another call may probe."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info(f"Circuit to {self.name} closed")
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or (self._opened_at is None and self.failures >= self.failure_threshold):
+            logger.warning(f"Circuit to {self.name} opened after {self.failures} consecutive failures")
+            RESILIENCE_EVENTS.labels("circuit_opened").inc()
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+
+class ResiliencePolicy:
+    """Deadlines, circuit breaking, retries and hedging around upstream calls.
+
+    Each call is bounded by the current request's deadline (see
+    ``src.shared.deadline``) and fails with :class:`DeadlineExceededError`
+    once it is spent. Retryable failures (connection errors, timeouts,
+    502/503/504) are retried up to ``retries`` times with exponential
+    backoff and full jitter, as long as the deadline leaves room. With
+    ``hedge_after`` set, an attempt still running after that many seconds
+    is raced against a second identical one and the first to succeed wins,
+    which cuts tail latency for idempotent calls.
+    """
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        retries: int = 1,
+        backoff: float = 0.05,
+        max_backoff: float = 1.0,
+        hedge_after: float = 0.0
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "ResiliencePolicy":
+        """Build a policy from ``<prefix>_BREAKER_*``, ``_RETRIES``, ``_RETRY_BACKOFF_MS`` and ``_HEDGE_AFTER_MS``."""
+        return cls(
+            breaker=CircuitBreaker(
+                failure_threshold=get_env_int(f"{prefix}_BREAKER_FAILURES", 5),
+                reset_timeout=get_env_float(f"{prefix}_BREAKER_RESET_SECONDS", 10.0)
+            ),
+            retries=get_env_int(f"{prefix}_RETRIES", 1),
+            backoff=get_env_float(f"{prefix}_RETRY_BACKOFF_MS", 50.0) / 1000,
+            hedge_after=get_env_float(f"{prefix}_HEDGE_AFTER_MS", 0.0) / 1000
+        )
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run ``attempt`` under the policy; it must be safe to repeat."""
+        for retry in range(self.retries + 1):
+            check_deadline("user_input", "upstream")
+            self.breaker.allow()
+            try:
+                result = await self._bounded(self._hedged(attempt))
+            except DeadlineExceededError:
+                self.breaker.record_failure()
+                raise
+            except asyncio.CancelledError:
+                # The caller went away (or lost a hedge): no verdict on the upstream
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered, so it is up even if the call failed
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if retry == self.retries or self.breaker.state != CLOSED:
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+                budget = remaining()
+                if budget is not None and budget <= delay:
+                    raise
+                RESILIENCE_EVENTS.labels("retry").inc()
+                logger.info(f"Retrying upstream call in {delay * 1000:.0f} ms after: {type(e).__name__}")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+        raise AssertionError("unreachable")
+
+    async def _bounded(self, call: Awaitable[T]) -> T:
+        """Cut an attempt off at the current request's deadline."""
+        budget = remaining()
+        if budget is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, max(budget, 0.0))
+        except asyncio.TimeoutError:
+            RESILIENCE_EVENTS.labels("deadline_exceeded").inc()
+            raise DeadlineExceededError("Deadline exceeded waiting for the embeddings service")
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Race a second attempt against one that is slower than ``hedge_after``."""
+        if self.hedge_after <= 0:
+            return await attempt()
+        tasks = {asyncio.ensure_future(attempt())}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                RESILIENCE_EVENTS.labels("hedge").inc()
+                tasks.add(asyncio.ensure_future(attempt()))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe the circuit breaker and policy settings."""
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retries": self.retries,
+            "hedge_after_ms": self.hedge_after * 1000
+        }
@@ -0,0 +1,218 @@
+import asyncio
+import bisect
+import hashlib
+import math
+import random
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from src.shared.cache import cache_key
+from src.shared.metrics import counter
+from src.shared.utils import get_logger
+from src.user_input_service.transport import EmbeddingsTransport
+
+logger = get_logger(__name__)
+
+ROUTED_TEXTS = counter(
+    "embeddings_client_routed_texts_total", "Texts routed to embeddings replicas", ("replica", "route")
+)
+
+ROUTING_POLICIES = ("hash", "random")
+
+
+def key_position(key: bytes) -> int:
+    """Map a routing key to a position on the hash ring."""
+    return int.from_bytes(key[:8], "big")
+
+
+def token_key(model_name: str, ids: List[int]) -> bytes:
+    """Routing key for pre-tokenized text; the same text always tokenizes to the same key."""
+    digest = hashlib.blake2b(model_name.encode("utf-8"), digest_size=16)
+    digest.update(b"\0")
+    digest.update(np.asarray(ids, dtype="<i4").tobytes())
+    return digest.digest()
+
+
+class HashRing:
+    """Consistent hash ring over replica names.
+
+    Each replica owns ``vnodes`` points on the ring, so keys spread evenly
+    and adding or removing a replica only moves the keys of its own arcs.
+    """
+
+    def __init__(self, names: List[str], vnodes: int = 64):
+        points = []
+        for index, name in enumerate(names):
+            for vnode in range(vnodes):
+                digest = hashlib.blake2b(f"{name}#{vnode}".encode("utf-8"), digest_size=8).digest()
+                points.append((key_position(digest), index))
+        points.sort()
+        self._positions = [position for position, _ in points]
+        self._owners = [owner for _, owner in points]
+        self.size = len(names)
+
+    def candidates(self, key: bytes) -> Iterator[int]:
+        """Yield each replica once, in ring order from the key's position."""
+        start = bisect.bisect(self._positions, key_position(key))
+        seen = set()
+        for offset in range(len(self._owners)):
+            owner = self._owners[(start + offset) % len(self._owners)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == self.size:
+                    return
+
+
+class AffinityRouter:
+    """Picks a replica per routing key with consistent hashing and bounded loads.
+
+    With ``policy="hash"`` a key goes to its owner on the ring unless that
+    replica already carries more than ``load_factor`` times the average
+    in-flight load, in which case it spills to the next replica on the ring
+    with room. Hot keys therefore cannot pile onto one replica, while each
+    key still has a stable home most of the time. ``policy="random"``
+    ignores the key, as a baseline.
+    """
+
+    def __init__(self, names: List[str], policy: str = "hash", load_factor: float = 1.25, vnodes: int = 64):
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy: {policy}")
+        if not names:
+            raise ValueError("Affinity routing needs at least one replica")
+        self.names = list(names)
+        self.policy = policy
+        self.load_factor = max(1.0, load_factor)
+        self.ring = HashRing(self.names, vnodes)
+        self.loads = [0] * len(self.names)
+        self.routed = [0] * len(self.names)
+        self.spilled = 0
+
+    def route(self, key: bytes) -> int:
+        """Choose the replica for a key and count it as in flight there."""
+        if self.policy == "random":
+            replica, route = random.randrange(len(self.names)), "random"
+        else:
+            capacity = math.ceil(self.load_factor * (sum(self.loads) + 1) / len(self.names))
+            route = "affinity"
+            for replica in self.ring.candidates(key):
+                if self.loads[replica] < capacity:
+                    break
+                route = "spill"
+            if route == "spill":
+                self.spilled += 1
+        self.loads[replica] += 1
+        self.routed[replica] += 1
+        ROUTED_TEXTS.labels(self.names[replica], route).inc()
+        return replica
+
+    def release(self, replica: int, count: int = 1) -> None:
+        """Mark ``count`` texts on a replica as no longer in flight."""
+        self.loads[replica] -= count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe routing so far."""
+        return {
+            "policy": self.policy,
+            "load_factor": self.load_factor,
+            "spilled": self.spilled,
+            "replicas": {
+                name: {"in_flight": load, "routed": routed}
+                for name, load, routed in zip(self.names, self.loads, self.routed)
+            }
+        }
+
+
+class AffinityTransport(EmbeddingsTransport):
+    """Spreads texts over several embeddings replicas by their normalized text.
+
+    Every text is routed by the key its cache entry uses (model name plus
+    normalized text), so repeats of a text reach the same replica and hit
+    that replica's result cache, and each replica caches a disjoint share of
+    the corpus instead of a copy of the same hot entries. A batch is split
+    into one sub-batch per replica, sent concurrently and put back in order.
+    """
+
+    def __init__(self, transports: List[EmbeddingsTransport], router: AffinityRouter):
+        """Initialize the transport with one transport per replica, in the router's order."""
+        if len(transports) != len(router.names):
+            raise ValueError("Need one transport per routed replica")
+        self.transports = transports
+        self.router = router
+        self.accepts_token_ids = all(transport.accepts_token_ids for transport in transports)
+
+    async def start(self) -> None:
+        """Start every replica's transport."""
+        for transport in self.transports:
+            await transport.start()
+
+    async def close(self) -> None:
+        """Close every replica's transport."""
+        for transport in self.transports:
+            await transport.close()
+
+    async def embed(
+        self,
+        texts: List[str],
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> np.ndarray:
+        """Embed each text on its replica and reassemble the results in input order."""
+        keys = [cache_key(model_name, text) for text in texts]
+        return await self._scatter(
+            keys,
+            lambda transport, indices: transport.embed([texts[i] for i in indices], model_name, batch_size, dtype)
+        )
+
+    async def embed_tokens(
+        self,
+        ids: List[List[int]],
+        fingerprint: str,
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> np.ndarray:
+        """Embed pre-tokenized texts on their replicas, routed by a hash of the ids."""
+        keys = [token_key(model_name, row) for row in ids]
+        return await self._scatter(
+            keys,
+            lambda transport, indices: transport.embed_tokens(
+                [ids[i] for i in indices], fingerprint, model_name, batch_size, dtype
+            )
+        )
+
+    async def _scatter(
+        self,
+        keys: List[bytes],
+        send: Callable[[EmbeddingsTransport, List[int]], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        """Send each input to the replica its key routes to and gather the rows back in order."""
+        groups: Dict[int, List[int]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(self.router.route(key), []).append(i)
+
+        async def call(replica: int, indices: List[int]) -> np.ndarray:
+            try:
+                return await send(self.transports[replica], indices)
+            finally:
+                self.router.release(replica, len(indices))
+
+        if len(groups) == 1:
+            replica, indices = next(iter(groups.items()))
+            return await call(replica, indices)
+        parts = await asyncio.gather(*(call(replica, indices) for replica, indices in groups.items()))
+        vectors = np.empty((len(keys), parts[0].shape[1]), dtype=parts[0].dtype)
+        for indices, part in zip(groups.values(), parts):
+            vectors[indices] = part
+        return vectors
+
+    async def health_check(self) -> bool:
+        """Healthy while at least one replica is."""
+        results = await asyncio.gather(
+            *(transport.health_check() for transport in self.transports), return_exceptions=True
+        )
+        return any(result is True for result in results)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.router.get_stats()
@@ -0,0 +1,297 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import numpy as np
+from src.shared.cache import cache_key
+from src.shared.deadline import DEADLINE_HEADER, header_value, remaining
+from src.shared.models import EmbeddingRequest, BatchEmbeddingRequest
+from src.shared.logs import REQUEST_ID_HEADER, current_request_id
+from src.shared.metrics import parse_server_timing, record_stage
+from src.shared.tokenization import TOKENIZER_HEADER, TokenizerMismatchError
+from src.shared.wire import (
+    NDJSON_MEDIA_TYPE, TOKEN_IDS_MEDIA_TYPE, decode_vectors, content_type, encode_token_ids, quantize
+)
+from src.shared.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+async def segments(texts: AsyncIterator[str], size: int) -> AsyncIterator[List[str]]:
+    """Group a stream of texts into lists of at most ``size``."""
+    segment: List[str] = []
+    async for text in texts:
+        segment.append(text)
+        if len(segment) >= size:
+            yield segment
+            segment = []
+    if segment:
+        yield segment
+
+
+class EmbeddingsTransport:
+    """How EmbeddingsClient reaches the embeddings service."""
+
+    # Whether ``embed_tokens`` can send pre-tokenized input
+    accepts_token_ids = False
+
+    async def start(self) -> None:
+        """Acquire any long-lived resources."""
+
+    async def close(self) -> None:
+        """Release long-lived resources."""
+
+    async def embed(
+        self,
+        texts: List[str],
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> np.ndarray:
+        """Return a (len(texts) x dimension) array of embeddings."""
+        raise NotImplementedError
+
+    async def embed_tokens(
+        self,
+        ids: List[List[int]],
+        fingerprint: str,
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> np.ndarray:
+        """Embed texts tokenized by the tokenizer with ``fingerprint``.
+
+        Raises :class:`TokenizerMismatchError` if the service's tokenizer
+        for the model is a different one.
+        """
+        raise NotImplementedError
+
+    async def embed_stream(
+        self,
+        texts: AsyncIterator[str],
+        model_name: str,
+        segment_size: int = 1024
+    ) -> AsyncIterator[np.ndarray]:
+        """Yield one embedding per text, in order, holding at most ``segment_size`` texts at a time."""
+        async for segment in segments(texts, segment_size):
+            for vector in await self.embed(segment, model_name):
+                yield vector
+
+    async def health_check(self) -> bool:
+        """Check if the embeddings service is reachable and healthy."""
+        raise NotImplementedError
+
+
+class HttpTransport(EmbeddingsTransport):
+    """Calls the embeddings service over HTTP using the binary wire format.
+
+    One pooled ``httpx.AsyncClient`` is kept for the transport's lifetime.
+    """
+
+    accepts_token_ids = True
+
+    def __init__(
+        self,
+        base_url: str,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False
+    ):
+        """Initialize the HTTP transport."""
+        self.base_url = base_url
+        self.limits = limits or httpx.Limits()
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """Open the pooled HTTP client."""
+        self._get_client()
+
+    async def close(self) -> None:
+        """Close the pooled HTTP client and its keep-alive connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            http2 = self.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+                    http2 = False
+            self._client = httpx.AsyncClient(limits=self.limits, http2=http2)
+        return self._client
+
+    async def embed(
+        self,
+        texts: List[str],
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> np.ndarray:
+        """POST to /embed (one text) or /embed/batch and decode the binary response.
+
+        The current request's remaining deadline, if any, caps the timeout
+        and is forwarded so the service can drop the work once it expires.
+        """
+        if len(texts) == 1:
+            path = "/embed"
+            payload: Dict[str, Any] = EmbeddingRequest(text=texts[0], model_name=model_name).model_dump()
+            timeout = 30.0
+        else:
+            path = "/embed/batch"
+            payload = BatchEmbeddingRequest(texts=texts, model_name=model_name, batch_size=batch_size).model_dump()
+            timeout = 300.0
+
+        response = await self._post(path, {"Accept": content_type(dtype)}, timeout, json=payload)
+        return decode_vectors(response.content)
+
+    async def embed_tokens(
+        self,
+        ids: List[List[int]],
+        fingerprint: str,
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> np.ndarray:
+        """POST int32 token ids to /embed/tokens and decode the binary response."""
+        headers = {
+            "Accept": content_type(dtype),
+            "Content-Type": TOKEN_IDS_MEDIA_TYPE,
+            TOKENIZER_HEADER: fingerprint
+        }
+        params: Dict[str, Any] = {"model_name": model_name}
+        if batch_size:
+            params["batch_size"] = batch_size
+        response = await self._post(
+            "/embed/tokens", headers, 30.0 if len(ids) == 1 else 300.0, content=encode_token_ids(ids), params=params
+        )
+        return decode_vectors(response.content)
+
+    async def _post(self, path: str, headers: Dict[str, str], timeout: float, **kwargs: Any) -> httpx.Response:
+        """POST to the embeddings service within the current request's deadline."""
+        budget = remaining()
+        if budget is not None:
+            timeout = min(timeout, max(budget, 0.001))
+            headers[DEADLINE_HEADER] = header_value(budget)
+        request_id = current_request_id()
+        if request_id:
+            headers[REQUEST_ID_HEADER] = request_id
+        response = await self._get_client().post(
+            f"{self.base_url}{path}",
+            headers=headers,
+            timeout=timeout,
+            **kwargs
+        )
+        if response.status_code == 409 and TOKENIZER_HEADER in response.headers:
+            raise TokenizerMismatchError(response.json().get("detail", "Tokenizer mismatch"))
+        response.raise_for_status()
+        
+        # Surface the embeddings service's own stage breakdown in ours
+        for stage, seconds in parse_server_timing(response.headers.get("Server-Timing", "")).items():
+            record_stage(f"embeddings-{stage}", seconds)
+        return response
+
+    async def embed_stream(
+        self,
+        texts: AsyncIterator[str],
+        model_name: str,
+        segment_size: int = 1024
+    ) -> AsyncIterator[np.ndarray]:
+        """Stream texts through /embed/stream, one request per segment.
+
+        httpx sends the whole request body before reading the response, so
+        each request carries a bounded segment of lines while the service
+        streams results back as they are computed.
+        """
+        async for segment in segments(texts, segment_size):
+            body = b"".join(json.dumps(text).encode("utf-8") + b"\n" for text in segment)
+            async with self._get_client().stream(
+                "POST",
+                f"{self.base_url}/embed/stream",
+                params={"model_name": model_name},
+                content=body,
+                headers={"Content-Type": NDJSON_MEDIA_TYPE, "Accept": NDJSON_MEDIA_TYPE},
+                timeout=300.0
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    if "error" in item:
+                        raise ValueError(f"Embeddings stream failed on line {item['index']}: {item['error']}")
+                    yield np.asarray(item["embedding"], dtype=np.float32)
+
+    async def health_check(self) -> bool:
+        """GET /health on the embeddings service."""
+        response = await self._get_client().get(f"{self.base_url}/health", timeout=5.0)
+        return response.status_code == 200
+
+
+class RayHandleTransport(EmbeddingsTransport):
+    """Calls the embeddings deployment in-process through a Ray Serve handle.
+
+    This skips the Serve HTTP proxy and JSON entirely: texts go in as
+    Python objects and the NumPy result comes back through the object store.
+
+    With ``affinity_shards`` set, texts are hashed by their normalized text
+    into that many shards and each shard is sent as a Serve multiplexed
+    model ID. Serve keeps sending a shard to the replicas that already
+    served it, and falls back to other replicas when those are saturated,
+    so repeats of a text usually hit the same replica's result cache.
+    """
+
+    def __init__(self, handle: Any, affinity_shards: int = 0):
+        """Initialize the transport around an embeddings DeploymentHandle."""
+        self.handle = handle
+        self.affinity_shards = affinity_shards
+
+    async def _call(self, method: str, *args: Any, shard: Optional[str] = None) -> Any:
+        """Invoke a deployment method (routed by ``shard``, if given) and await its result."""
+        import ray
+
+        handle = self.handle.options(multiplexed_model_id=shard) if shard else self.handle
+        result = await getattr(handle, method).remote(*args)
+        # Older handle APIs resolve to an ObjectRef rather than the value
+        if isinstance(result, ray.ObjectRef):
+            result = await result
+        return result
+
+    async def embed(
+        self,
+        texts: List[str],
+        model_name: str,
+        batch_size: Optional[int] = None,
+        dtype: str = "float32"
+    ) -> np.ndarray:
+        """Call ``embed_array`` on the embeddings deployment, once per affinity shard.
+
+        The request's remaining deadline and its ID go along, as the HTTP
+        transport sends them in headers.
+        """
+        context = (remaining(), current_request_id())
+        if self.affinity_shards <= 0:
+            vectors = await self._call("embed_array", texts, model_name, batch_size, *context)
+            return quantize(vectors, dtype)[0]
+
+        shards: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            shard = int.from_bytes(cache_key(model_name, text)[:8], "big") % self.affinity_shards
+            shards.setdefault(f"shard-{shard}", []).append(i)
+        parts = await asyncio.gather(*(
+            self._call("embed_array", [texts[i] for i in indices], model_name, batch_size, *context, shard=shard)
+            for shard, indices in shards.items()
+        ))
+        vectors = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        for indices, part in zip(shards.values(), parts):
+            vectors[indices] = part
+        return quantize(vectors, dtype)[0]
+
+    async def health_check(self) -> bool:
+        """Call ``health_check`` on the embeddings deployment."""
+        return bool(await self._call("health_check"))
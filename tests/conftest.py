@@ -0,0 +1,25 @@
+import asyncio
+import os
+
+import pytest
+
+# The services read these at import time: use the deterministic stub model
+# without its simulated inference latency, and finish startup before serving
+os.environ.setdefault("EMBEDDINGS_STUB_MODEL", "true")
+os.environ.setdefault("EMBEDDINGS_STUB_BATCH_MS", "0")
+os.environ.setdefault("EMBEDDINGS_STUB_PER_TEXT_MS", "0")
+os.environ.setdefault("EMBEDDINGS_BLOCKING_STARTUP", "true")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture(scope="session")
+def generator():
+    """A stub-model generator shared by the tests (it holds no per-test state)."""
+    from src.embeddings_service.generator import EmbeddingGenerator
+
+    return EmbeddingGenerator("stub-model")
+
+
+def run(coroutine):
+    """Run a coroutine to completion on a fresh event loop."""
+    return asyncio.run(coroutine)
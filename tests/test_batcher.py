@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.embeddings_service.batcher import EmbeddingBatcher
+from src.embeddings_service.executor import InferenceExecutor, InferenceOverloadedError
+from src.embeddings_service.scheduler import PriorityScheduler
+from src.shared.deadline import DeadlineExceededError, set_deadline
+
+from conftest import run
+
+
+class CountingExecutor(InferenceExecutor):
+    """Records the size of every batch that reaches the model."""
+
+    def __init__(self, generator):
+        super().__init__(generator)
+        self.batches = []
+
+    async def run(self, texts, batch_size=None, timings=None):
+        self.batches.append(len(texts))
+        return await super().run(texts, batch_size, timings)
+
+
+def test_concurrent_requests_share_batches(generator):
+    executor = CountingExecutor(generator)
+    batcher = EmbeddingBatcher(executor, max_batch_size=8, max_wait_ms=20.0)
+    texts = [f"text number {i}" for i in range(20)]
+
+    async def main():
+        try:
+            return await asyncio.gather(*(batcher.submit(text) for text in texts))
+        finally:
+            await batcher.stop()
+
+    results = run(main())
+
+    assert sum(executor.batches) == len(texts)
+    assert max(executor.batches) <= 8
+    assert len(executor.batches) < len(texts)
+    # Every caller gets its own row back
+    np.testing.assert_allclose(np.stack(results), generator.generate_embeddings_batch(texts), rtol=1e-6)
+    assert batcher.get_stats()["items"] == len(texts)
+
+
+def test_single_request_flushes_after_max_wait(generator):
+    batcher = EmbeddingBatcher(InferenceExecutor(generator), max_batch_size=32, max_wait_ms=1.0)
+
+    async def main():
+        try:
+            return await asyncio.wait_for(batcher.submit("alone"), 5.0)
+        finally:
+            await batcher.stop()
+
+    assert run(main()).shape == (generator.get_dimension(),)
+
+
+def test_full_queue_sheds_load(generator):
+    scheduler = PriorityScheduler(slots=1)
+    batcher = EmbeddingBatcher(InferenceExecutor(generator), max_batch_size=1, max_queue_size=2, scheduler=scheduler)
+
+    async def main():
+        # With the only inference slot taken, one batch waits for it and two texts fill the queue
+        await scheduler.acquire("interactive")
+        waiting = [asyncio.ensure_future(batcher.submit(text)) for text in ("one", "two", "three")]
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(InferenceOverloadedError):
+                await batcher.submit("four")
+        finally:
+            scheduler.release()
+            assert len(await asyncio.gather(*waiting)) == 3
+            await batcher.stop()
+
+    run(main())
+
+
+def test_expired_requests_are_dropped_before_inference(generator):
+    executor = CountingExecutor(generator)
+    batcher = EmbeddingBatcher(executor, max_batch_size=8, max_wait_ms=10.0)
+
+    async def main():
+        set_deadline(0.0)
+        try:
+            with pytest.raises(DeadlineExceededError):
+                await batcher.submit("too late")
+        finally:
+            await batcher.stop()
+
+    run(main())
+    assert executor.batches == []